@@ -0,0 +1,214 @@
+"""Внутрипроцессная замена брокера RabbitMQ для бенчмарков.
+
+Имитирует задержку установки соединения (TCP + AMQP handshake) и
+задержку подтверждения публикации, не требуя запущенного брокера.
+Очереди поддерживают доставку с учетом prefetch, ack/nack (в том числе
+multiple) и возврат неподтвержденных сообщений при разрыве соединения.
+"""
+import asyncio
+from collections import deque, namedtuple
+from pamqp.commands import Basic
+
+
+class StubExchange:
+    def __init__(self, broker: "StubBroker"):
+        self.broker = broker
+
+    async def publish(self, message, routing_key: str, **kwargs):
+        await asyncio.sleep(self.broker.confirm_delay)
+        self.broker.messages.append((routing_key, message.body))
+        if routing_key in self.broker.queues:
+            self.broker.queues[routing_key].put(message.body, message.message_id, headers=message.headers)
+        return Basic.Ack()
+
+
+StubEnvelope = namedtuple("StubEnvelope", "body message_id headers")
+
+
+class StubIncomingMessage:
+    def __init__(self, channel: "StubChannel", delivery_tag: int, envelope: "StubEnvelope", redelivered: bool):
+        self.channel = channel
+        self.delivery_tag = delivery_tag
+        self.body = envelope.body
+        self.message_id = envelope.message_id
+        self.headers = envelope.headers
+        self.redelivered = redelivered
+
+    async def ack(self, multiple: bool = False):
+        self.channel.settle(self.delivery_tag, multiple, requeue=None)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        self.channel.settle(self.delivery_tag, multiple, requeue=requeue)
+
+
+class StubQueue:
+    def __init__(self, broker: "StubBroker", name: str):
+        self.broker = broker
+        self.name = name
+        self.ready = deque()
+        self.consumers = {}
+
+    def put(self, body: bytes, message_id: str = None, redelivered: bool = False, headers: dict = None):
+        self.ready.append((StubEnvelope(body, message_id, headers or {}), redelivered))
+        self.dispatch()
+
+    def dispatch(self):
+        """Раздать готовые сообщения потребителям, пока у них не исчерпан prefetch"""
+        progress = True
+        while self.ready and progress:
+            progress = False
+            for channel, callback in list(self.consumers.values()):
+                if not self.ready:
+                    break
+                if channel.prefetch_count and len(channel.unacked) >= channel.prefetch_count:
+                    continue
+                envelope, redelivered = self.ready.popleft()
+                channel.deliver(self, callback, envelope, redelivered)
+                progress = True
+
+
+class StubChannelQueue:
+    """Очередь, объявленная на канале: consume/cancel привязаны к каналу"""
+
+    def __init__(self, channel: "StubChannel", queue: StubQueue):
+        self.channel = channel
+        self.queue = queue
+        self.name = queue.name
+
+    async def consume(self, callback, no_ack: bool = False, **kwargs) -> str:
+        self.channel.consumer_seq += 1
+        tag = f"ctag-{id(self.channel)}-{self.channel.consumer_seq}"
+        self.queue.consumers[tag] = (self.channel, callback)
+        self.queue.dispatch()
+        return tag
+
+    async def cancel(self, consumer_tag: str, **kwargs):
+        self.queue.consumers.pop(consumer_tag, None)
+
+
+class StubChannel:
+    def __init__(self, broker: "StubBroker"):
+        self.broker = broker
+        self.default_exchange = StubExchange(broker)
+        self.prefetch_count = 0
+        self.consumer_seq = 0
+        self.next_tag = 0
+        self.unacked = {}
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs):
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name: str, durable: bool = False, **kwargs):
+        return StubChannelQueue(self, self.broker.queue(name))
+
+    def deliver(self, queue: StubQueue, callback, envelope: "StubEnvelope", redelivered: bool):
+        self.next_tag += 1
+        self.unacked[self.next_tag] = (queue, envelope)
+        message = StubIncomingMessage(self, self.next_tag, envelope, redelivered)
+        asyncio.get_running_loop().create_task(callback(message))
+
+    def settle(self, delivery_tag: int, multiple: bool, requeue):
+        """ack (requeue=None) или nack одного сообщения либо всех до delivery_tag включительно"""
+        if delivery_tag not in self.unacked:
+            raise RuntimeError(f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}")
+        tags = [tag for tag in self.unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+        queues = set()
+        for tag in tags:
+            queue, envelope = self.unacked.pop(tag)
+            queues.add(queue)
+            if requeue is None:
+                self.broker.acked += 1
+            elif requeue:
+                queue.ready.append((envelope, True))
+            else:
+                self.broker.dead_lettered.append(envelope.body)
+        for queue in queues:
+            queue.dispatch()
+
+    def drop(self):
+        """Соединение разорвано: подписки снимаются, неподтвержденные сообщения возвращаются в очередь"""
+        for queue in self.broker.queues.values():
+            for tag, (channel, _) in list(queue.consumers.items()):
+                if channel is self:
+                    del queue.consumers[tag]
+        for queue, envelope in self.unacked.values():
+            queue.ready.append((envelope, True))
+        self.unacked.clear()
+        for queue in self.broker.queues.values():
+            queue.dispatch()
+
+    async def close(self):
+        self.drop()
+
+
+class StubCallbacks(list):
+    def add(self, callback):
+        self.append(callback)
+
+
+class StubConnection:
+    def __init__(self, broker: "StubBroker"):
+        self.broker = broker
+        self.channels = []
+        self.close_callbacks = StubCallbacks()
+        self.is_closed = False
+
+    async def channel(self, publisher_confirms: bool = True):
+        channel = StubChannel(self.broker)
+        self.channels.append(channel)
+        return channel
+
+    def drop(self, exc: Exception = None):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for channel in self.channels:
+            channel.drop()
+        for callback in self.close_callbacks:
+            callback(self, exc)
+
+    async def close(self):
+        self.drop()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class StubBroker:
+    """Брокер-заглушка; connect совместим по сигнатуре с aio_pika.connect_robust"""
+
+    def __init__(self, handshake_delay: float = 0.005, confirm_delay: float = 0.0005):
+        self.handshake_delay = handshake_delay
+        self.confirm_delay = confirm_delay
+        self.connections = 0
+        self.messages = []
+        self.queues = {}
+        self.acked = 0
+        self.dead_lettered = []
+        self.open_connections = []
+        # Число следующих подключений, которые завершатся ошибкой (имитация недоступного брокера)
+        self.refuse_connections = 0
+
+    async def connect(self, url: str = ""):
+        await asyncio.sleep(self.handshake_delay)
+        if self.refuse_connections:
+            self.refuse_connections -= 1
+            raise ConnectionError("Connection refused")
+        self.connections += 1
+        connection = StubConnection(self)
+        self.open_connections = [c for c in self.open_connections if not c.is_closed] + [connection]
+        return connection
+
+    def queue(self, name: str) -> StubQueue:
+        if name not in self.queues:
+            self.queues[name] = StubQueue(self, name)
+        return self.queues[name]
+
+    def drop_connections(self):
+        """Разорвать все открытые соединения, как при перезапуске брокера"""
+        for connection in self.open_connections:
+            connection.drop(ConnectionError("Connection reset by broker"))
+        self.open_connections = []
@@ -0,0 +1,63 @@
+"""Каталог товаров: время сборки и загрузки файла, поиск в секунду, память.
+
+    python -m benchmarks.bench_catalog --sizes 200000 2000000
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+from uuid import UUID
+
+from cart_service.app.catalog import CatalogSnapshot, Product, write_catalog
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def bench(size: int, lookups: int):
+    rng = random.Random(size)
+    products = [
+        Product(UUID(int=rng.getrandbits(128)), f"Товар {i}", rng.randint(100, 99999) / 100)
+        for i in range(size)
+    ]
+    path = os.path.join(tempfile.mkdtemp(), "catalog.bin")
+
+    started = time.perf_counter()
+    write_catalog(path, products)
+    build = time.perf_counter() - started
+    probe_ids = [rng.choice(products).id for _ in range(lookups)]
+    del products
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    snapshot = CatalogSnapshot.open(path)
+    load = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for product_id in probe_ids:
+        snapshot.get(product_id)
+    single = lookups / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(0, lookups, 100):
+        snapshot.get_many(probe_ids[i:i + 100])
+    bulk = lookups / (time.perf_counter() - started)
+    rss_after = rss_mb()
+
+    print(f"{size:>9} SKUs: file {os.path.getsize(path) / 2 ** 20:7.1f} MB, build {build:6.2f} s, "
+          f"load {load * 1000:6.3f} ms, get {single:9.0f}/s, get_many(100) {bulk:9.0f}/s, "
+          f"RSS +{rss_after - rss_before:5.1f} MB after {lookups} lookups")
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200000, 2000000])
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.lookups)
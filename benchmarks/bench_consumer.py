@@ -0,0 +1,56 @@
+"""Пропускная способность потребителя: по одному сообщению, пул обработчиков и пачки.
+
+Обработчик имитирует ввод-вывод задержкой --handler-ms (на сообщение или на пачку).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_consumer --messages 2000 --handler-ms 2
+"""
+import argparse
+import asyncio
+import time
+
+from prescription_service.app.consumer import Consumer
+from benchmarks.amqp_stub import StubBroker
+
+
+async def bench(messages: int, handler_ms: float, **kwargs) -> tuple:
+    broker = StubBroker(handshake_delay=0, confirm_delay=0)
+    queue = broker.queue("bench")
+
+    async def handler(message_or_batch):
+        await asyncio.sleep(handler_ms / 1000)
+
+    consumer = Consumer("bench", handler, connect=broker.connect, **kwargs)
+    consumer.start()
+    started = time.perf_counter()
+    for i in range(messages):
+        queue.put(str(i).encode())
+    while broker.acked < messages:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    await consumer.stop()
+    return elapsed, consumer.stats.snapshot()
+
+
+async def main(args):
+    scenarios = [
+        ("one at a time (prefetch=1)", dict(prefetch=1, concurrency=1)),
+        (f"pool (prefetch={args.prefetch}, concurrency={args.concurrency})",
+         dict(prefetch=args.prefetch, concurrency=args.concurrency)),
+        (f"batches of {args.batch_size}",
+         dict(prefetch=args.prefetch, concurrency=args.concurrency, batch_size=args.batch_size)),
+    ]
+    for name, kwargs in scenarios:
+        elapsed, stats = await bench(args.messages, args.handler_ms, **kwargs)
+        print(f"{name:40s} {args.messages / elapsed:10.0f} msg/s, "
+              f"{stats['batches']} handler calls, handler avg {stats['handler_avg_ms']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--handler-ms", type=float, default=2.0)
+    parser.add_argument("--prefetch", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""Накладные расходы метрик: ASGI-middleware на запрос, события движка на SQL-запрос, выгрузка /metrics.
+
+Приложение вызывается напрямую как ASGI (без HTTP-клиента), чтобы разница
+не тонула в шуме транспорта.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_metrics --requests 5000 --statements 5000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from cart_service.app import metrics
+
+# Лучший из нескольких прогонов: меньше шума от планировщика и GC
+ROUNDS = 5
+
+
+def build_app(instrumented: bool):
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+async def asgi_request_seconds(app, requests: int) -> float:
+    """Среднее время одного запроса при прямом вызове ASGI-приложения"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/api/items/{i}", "raw_path": f"/api/items/{i}".encode(),
+            "root_path": "", "query_string": b"", "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+        }
+
+    for i in range(200):
+        await app(scope(i), receive, send)
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        for i in range(requests):
+            await app(scope(i), receive, send)
+        best = min(best, (time.perf_counter() - started) / requests)
+    return best
+
+
+async def middleware_only_seconds(requests: int) -> float:
+    """Собственная стоимость MetricsMiddleware поверх пустого ASGI-приложения"""
+    class Route:
+        path = "/api/items/{item_id}"
+
+    async def empty_app(scope, receive, send):
+        scope["route"] = Route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    results = []
+    for app in (empty_app, metrics.MetricsMiddleware(empty_app)):
+        best = float("inf")
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            for _ in range(requests):
+                await app({"type": "http", "method": "GET"}, None, send)
+            best = min(best, (time.perf_counter() - started) / requests)
+        results.append(best)
+    return results[1] - results[0]
+
+
+def sql_statement_seconds(instrumented: bool, statements: int) -> float:
+    engine = create_engine("sqlite://")
+    if instrumented:
+        metrics.instrument_engine(engine, "bench")
+    with engine.connect() as connection:
+        query = text("SELECT 1")
+        for _ in range(200):
+            connection.execute(query)
+        best = float("inf")
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            for _ in range(statements):
+                connection.execute(query)
+            best = min(best, (time.perf_counter() - started) / statements)
+        return best
+
+
+def main(args):
+    plain = asyncio.run(asgi_request_seconds(build_app(False), args.requests))
+    instrumented = asyncio.run(asgi_request_seconds(build_app(True), args.requests))
+    print(f"ASGI request:   {plain * 1e6:8.1f} us plain, {instrumented * 1e6:8.1f} us instrumented, "
+          f"overhead {(instrumented - plain) * 1e6:6.1f} us ({(instrumented / plain - 1) * 100:+.1f}%)")
+    own = asyncio.run(middleware_only_seconds(args.requests))
+    print(f"middleware own cost: {own * 1e6:6.1f} us per request")
+
+    plain = sql_statement_seconds(False, args.statements)
+    instrumented = sql_statement_seconds(True, args.statements)
+    print(f"SQL statement:  {plain * 1e6:8.1f} us plain, {instrumented * 1e6:8.1f} us instrumented, "
+          f"overhead {(instrumented - plain) * 1e6:6.1f} us")
+
+    started = time.perf_counter()
+    body = metrics.render()
+    print(f"/metrics render: {(time.perf_counter() - started) * 1000:.2f} ms, {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--statements", type=int, default=5000)
+    main(parser.parse_args())
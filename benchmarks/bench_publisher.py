@@ -0,0 +1,73 @@
+"""Сравнение публикации «соединение на сообщение» и долгоживущего Publisher.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_publisher --messages 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aio_pika
+
+from cart_service.app.rabbitmq import Publisher
+from benchmarks.amqp_stub import StubBroker
+
+
+async def bench_connection_per_message(broker: StubBroker, messages: int, concurrency: int) -> float:
+    """Прежний путь: connect + channel + publish + close на каждое сообщение"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            connection = await broker.connect()
+            async with connection:
+                channel = await connection.channel()
+                await channel.default_exchange.publish(
+                    aio_pika.Message(body=json.dumps({"n": i}).encode()),
+                    routing_key="cart_cleared"
+                )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    return time.perf_counter() - started
+
+
+async def bench_publisher(broker: StubBroker, messages: int, concurrency: int, batch_size: int) -> tuple:
+    publisher = Publisher(batch_size=batch_size, flush_interval=0.005, connect=broker.connect)
+    await publisher.start()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            await publisher.publish("cart_cleared", {"n": i})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+    await publisher.stop()
+    return elapsed, publisher.stats.snapshot()
+
+
+async def main(args):
+    legacy_broker = StubBroker(args.handshake_ms / 1000, args.confirm_ms / 1000)
+    legacy = await bench_connection_per_message(legacy_broker, args.messages, args.concurrency)
+
+    pooled_broker = StubBroker(args.handshake_ms / 1000, args.confirm_ms / 1000)
+    pooled, stats = await bench_publisher(pooled_broker, args.messages, args.concurrency, args.batch_size)
+
+    print(f"connection per message: {args.messages / legacy:10.0f} msg/s, "
+          f"{legacy_broker.connections} connections")
+    print(f"pooled publisher:       {args.messages / pooled:10.0f} msg/s, "
+          f"{pooled_broker.connections} connections")
+    print(f"publisher stats: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--handshake-ms", type=float, default=5.0)
+    parser.add_argument("--confirm-ms", type=float, default=0.5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,162 @@
+"""Сериализация ответов: Pydantic-модель + response_model против словаря + orjson.
+
+Три варианта одного маршрута:
+  legacy    - маршрут собирает Pydantic-модель, FastAPI валидирует ее повторно (как было);
+  validated - маршрут отдает словарь, response_model проверяет его один раз (FAST_SERIALIZATION=0);
+  fast      - словарь сразу в JSON-байты через orjson (по умолчанию).
+Данные - большая корзина и рецепт с 50 лекарствами; строки из базы заменены
+простыми объектами, приложение вызывается напрямую как ASGI.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_serialization --cart-items 200 --medications 50 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from fastapi import FastAPI
+
+# Модули сервисов создают движок при импорте; база в бенчмарке не используется
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from cart_service.app import schemas as cart_schemas
+from cart_service.app.routes import build_cart_response
+from prescription_service.app import schemas as prescription_schemas
+from prescription_service.app import models as prescription_models
+from prescription_service.app.serialization import JSONBytesResponse
+
+# Лучший из нескольких прогонов: меньше шума от планировщика и GC
+ROUNDS = 5
+
+
+def cart_rows(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        SimpleNamespace(id=uuid4(), product_id=uuid4(), name=f"Товар {i}", quantity=i % 10 + 1,
+                        price=99.5 + i, added_at=now)
+        for i in range(count)
+    ]
+
+
+def prescription_row(medications: int):
+    now = datetime.utcnow()
+    return SimpleNamespace(
+        id=uuid4(), user_id=uuid4(), doctor_name="Доктор Иванов", clinic_name="Городская поликлиника",
+        issue_date=now, expiry_date=now + timedelta(days=90),
+        medications=[
+            {"product_id": str(uuid4()), "product_name": f"Лекарство {i}", "dosage": "500 мг", "quantity": 1}
+            for i in range(medications)
+        ],
+        image_url=None, status=prescription_models.PrescriptionStatus.APPROVED, verified_by=uuid4(),
+        verified_at=now, notes=None, created_at=now
+    )
+
+
+def legacy_cart(user_id, rows):
+    items = [
+        cart_schemas.CartItemResponse(id=row.id, product_id=row.product_id, name=row.name, quantity=row.quantity,
+                                      price=row.price, total_price=row.price * row.quantity, added_at=row.added_at)
+        for row in rows
+    ]
+    return cart_schemas.CartResponse(user_id=user_id, items=items,
+                                     total_price=round(sum(item.total_price for item in items), 2))
+
+
+def prescription_content(row) -> dict:
+    return {
+        "id": row.id, "user_id": row.user_id, "doctor_name": row.doctor_name, "clinic_name": row.clinic_name,
+        "issue_date": row.issue_date, "expiry_date": row.expiry_date, "medications": row.medications,
+        "image_url": row.image_url, "status": row.status, "verified_by": row.verified_by,
+        "verified_at": row.verified_at, "notes": row.notes, "created_at": row.created_at
+    }
+
+
+def legacy_prescription(row):
+    content = prescription_content(row)
+    content["medications"] = [prescription_schemas.MedicationResponse(**med) for med in row.medications]
+    return prescription_schemas.PrescriptionResponse(**content)
+
+
+def build_app(cart_items: int, medications: int) -> FastAPI:
+    app = FastAPI()
+    user_id, rows = uuid4(), cart_rows(cart_items)
+    prescription = prescription_row(medications)
+
+    @app.get("/legacy/cart", response_model=cart_schemas.CartResponse)
+    async def cart_legacy():
+        return legacy_cart(user_id, rows)
+
+    @app.get("/validated/cart", response_model=cart_schemas.CartResponse)
+    async def cart_validated():
+        return build_cart_response(user_id, rows)
+
+    @app.get("/fast/cart", response_model=cart_schemas.CartResponse)
+    async def cart_fast():
+        return JSONBytesResponse(build_cart_response(user_id, rows))
+
+    @app.get("/legacy/prescription", response_model=prescription_schemas.PrescriptionResponse)
+    async def prescription_legacy():
+        return legacy_prescription(prescription)
+
+    @app.get("/validated/prescription", response_model=prescription_schemas.PrescriptionResponse)
+    async def prescription_validated():
+        return prescription_content(prescription)
+
+    @app.get("/fast/prescription", response_model=prescription_schemas.PrescriptionResponse)
+    async def prescription_fast():
+        return JSONBytesResponse(prescription_content(prescription))
+
+    return app
+
+
+async def request_seconds(app, path: str, requests: int):
+    """Среднее время запроса и размер тела при прямом вызове ASGI-приложения"""
+    body = bytearray()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+    }
+    for _ in range(20):
+        await app(dict(scope), receive, send)
+    size = len(body) // 20
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        best = min(best, (time.perf_counter() - started) / requests)
+    return best, size
+
+
+def main(args):
+    app = build_app(args.cart_items, args.medications)
+    for resource, label in (("cart", f"cart, {args.cart_items} items"),
+                            ("prescription", f"prescription, {args.medications} medications")):
+        print(label)
+        legacy = None
+        for mode in ("legacy", "validated", "fast"):
+            seconds, size = asyncio.run(request_seconds(app, f"/{mode}/{resource}", args.requests))
+            legacy = legacy or seconds
+            print(f"  {mode:9s} {seconds * 1e6:9.1f} us/request  {legacy / seconds:5.2f}x  {size} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cart-items", type=int, default=200)
+    parser.add_argument("--medications", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,354 @@
+"""Нагрузочный прогон обоих сервисов: смешанная нагрузка, p50/p95/p99 и RPS по эндпоинтам.
+
+По умолчанию оба приложения запускаются в этом же процессе поверх
+httpx.ASGITransport (со своими startup/shutdown), каждое со своей временной
+SQLite, схема создается миграциями. RabbitMQ заменяется benchmarks.amqp_stub:
+cart_cleared из корзины доходит до потребителя сервиса рецептов, а
+prescription_verified - до проекции допуска к рецептурным товарам в корзине.
+Для Postgres укажите --cart-db/--prescription-db, для уже запущенных
+сервисов (например, docker-compose) --cart-url/--prescription-url.
+
+Запуск из корня репозитория:
+    python -m benchmarks.load run --requests 5000 --concurrency 50 --output before.json
+    python -m benchmarks.load compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import httpx
+
+from benchmarks.amqp_stub import StubBroker
+
+# Вес операции в смеси по умолчанию
+DEFAULT_MIX = {
+    "cart_add": 30,
+    "cart_get": 30,
+    "cart_clear": 5,
+    "prescription_upload": 10,
+    "prescription_verify": 10,
+    "prescription_get": 15,
+}
+
+ENDPOINTS = {
+    "cart_add": ("POST", "/api/cart/items"),
+    "cart_get": ("GET", "/api/cart"),
+    "cart_clear": ("DELETE", "/api/cart/clear"),
+    "prescription_upload": ("POST", "/api/prescriptions"),
+    "prescription_verify": ("PATCH", "/api/prescriptions/{id}/verify"),
+    "prescription_get": ("GET", "/api/prescriptions/{id}"),
+}
+
+
+def parse_mix(value: str) -> dict:
+    """cart_add=30,cart_get=30,... -> веса операций"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, expected one of {sorted(ENDPOINTS)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Процентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Workload:
+    """Состояние виртуальных пользователей и сами операции"""
+
+    def __init__(self, cart_client: httpx.AsyncClient, prescription_client: httpx.AsyncClient,
+                 users: int, product_ids: list, rng: random.Random):
+        self.cart = cart_client
+        self.prescriptions = prescription_client
+        self.users = [uuid4() for _ in range(users)]
+        self.product_ids = product_ids
+        self.rng = rng
+        self.pending = []
+        self.uploaded = []
+        self.pharmacist = uuid4()
+
+    def prescription_payload(self, user_id) -> dict:
+        return {
+            "user_id": str(user_id),
+            "doctor_name": "Доктор Иванов",
+            "clinic_name": "Городская поликлиника",
+            "issue_date": str(date.today()),
+            "expiry_date": str(date.today() + timedelta(days=90)),
+            "medications": [{
+                "product_id": str(self.rng.choice(self.product_ids)),
+                "product_name": "Аспирин",
+                "dosage": "500 мг",
+                "quantity": 1
+            }]
+        }
+
+    async def cart_add(self):
+        return await self.cart.post(
+            "/api/cart/items", params={"user_id": str(self.rng.choice(self.users))},
+            json={"product_id": str(self.rng.choice(self.product_ids)), "quantity": 1}
+        )
+
+    async def cart_get(self):
+        return await self.cart.get("/api/cart", params={"user_id": str(self.rng.choice(self.users))})
+
+    async def cart_clear(self):
+        return await self.cart.delete("/api/cart/clear", params={"user_id": str(self.rng.choice(self.users))})
+
+    async def prescription_upload(self):
+        response = await self.prescriptions.post(
+            "/api/prescriptions", json=self.prescription_payload(self.rng.choice(self.users))
+        )
+        if response.status_code == 200:
+            prescription_id = response.json()["id"]
+            self.pending.append(prescription_id)
+            self.uploaded.append(prescription_id)
+        return response
+
+    async def prescription_verify(self):
+        if not self.pending:
+            return await self.prescription_upload()
+        prescription_id = self.pending.pop(self.rng.randrange(len(self.pending)))
+        return await self.prescriptions.patch(
+            f"/api/prescriptions/{prescription_id}/verify",
+            json={"status": self.rng.choice(["approved", "rejected"]), "verified_by": str(self.pharmacist)}
+        )
+
+    async def prescription_get(self):
+        if not self.uploaded:
+            return await self.prescription_upload()
+        return await self.prescriptions.get(f"/api/prescriptions/{self.rng.choice(self.uploaded)}")
+
+
+async def drive(workload: Workload, mix: dict, requests: int, concurrency: int, record: bool) -> tuple:
+    """Выполнить requests операций в concurrency параллельных потоках. Возвращает (замеры, длительность)"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            name = workload.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = (await getattr(workload, name)()).status_code
+            except Exception as e:
+                print(f"{name} failed: {e!r}")
+                status = 0
+            if record:
+                samples[name].append((time.perf_counter() - started, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    endpoints = {}
+    all_latencies = []
+    for name, measured in samples.items():
+        if not measured:
+            continue
+        latencies = sorted(latency * 1000 for latency, _ in measured)
+        all_latencies.extend(latencies)
+        method, path = ENDPOINTS[name]
+        endpoints[name] = {
+            "method": method,
+            "path": path,
+            "count": len(measured),
+            # 4xx - отказ бизнес-логики (например, лимит количества), 5xx и сетевые ошибки - сбой
+            "rejected": sum(1 for _, status in measured if 400 <= status < 500),
+            "errors": sum(1 for _, status in measured if status == 0 or status >= 500),
+            "rps": round(len(measured) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(latencies[-1], 3),
+        }
+    all_latencies.sort()
+    total = {
+        "count": len(all_latencies),
+        "elapsed_sec": round(elapsed, 3),
+        "rps": round(len(all_latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(all_latencies, 50), 3),
+        "p95_ms": round(percentile(all_latencies, 95), 3),
+        "p99_ms": round(percentile(all_latencies, 99), 3),
+    }
+    return {"total": total, "endpoints": endpoints}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def in_process_apps(stack: AsyncExitStack, cart_db: str, prescription_db: str, broker: StubBroker) -> tuple:
+    """Импорт и запуск обоих приложений в этом процессе.
+
+    Модули database читают DATABASE_URL при импорте, поэтому переменная
+    выставляется перед импортом каждого сервиса.
+    """
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["DATABASE_URL"] = cart_db
+    from cart_service.app import main as cart_main, migrate as cart_migrate, rabbitmq as cart_rabbitmq
+    from cart_service.app import database as cart_database, catalog, eligibility as cart_eligibility
+    os.environ["DATABASE_URL"] = prescription_db
+    from prescription_service.app import main as prescription_main, migrate as prescription_migrate
+    from prescription_service.app import rabbitmq as prescription_rabbitmq, database as prescription_database
+
+    cart_migrate.upgrade(cart_db)
+    prescription_migrate.upgrade(prescription_db)
+
+    # Все AMQP-соединения идут в брокер-заглушку
+    cart_rabbitmq.publisher._connect = broker.connect
+    prescription_rabbitmq.publisher._connect = broker.connect
+    prescription_rabbitmq.cart_cleared_consumer._connect = broker.connect
+    cart_eligibility.prescription_verified_consumer._connect = broker.connect
+    broker.queue("cart_cleared")
+    broker.queue("prescription_verified")
+
+    stack.push_async_callback(cart_database.async_engine.dispose)
+    stack.push_async_callback(prescription_database.async_engine.dispose)
+    await stack.enter_async_context(cart_main.app.router.lifespan_context(cart_main.app))
+    await stack.enter_async_context(prescription_main.app.router.lifespan_context(prescription_main.app))
+
+    cart_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=cart_main.app), base_url="http://cart")
+    prescription_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=prescription_main.app),
+                                            base_url="http://prescription")
+    product_ids = [product.id for product in catalog.SEED_PRODUCTS]
+    return cart_client, prescription_client, product_ids
+
+
+async def run(args):
+    broker = StubBroker(handshake_delay=0, confirm_delay=args.confirm_ms / 1000)
+    workdir = tempfile.mkdtemp(prefix="load-")
+    cart_db = args.cart_db or "sqlite:///" + os.path.join(workdir, "cart.db")
+    prescription_db = args.prescription_db or "sqlite:///" + os.path.join(workdir, "prescription.db")
+
+    async with AsyncExitStack() as stack:
+        if args.cart_url and args.prescription_url:
+            cart_client = httpx.AsyncClient(base_url=args.cart_url, timeout=30)
+            prescription_client = httpx.AsyncClient(base_url=args.prescription_url, timeout=30)
+            from cart_service.app.catalog import SEED_PRODUCTS
+            product_ids = [product.id for product in SEED_PRODUCTS]
+            target = {"cart": args.cart_url, "prescription": args.prescription_url}
+        else:
+            cart_client, prescription_client, product_ids = await in_process_apps(
+                stack, cart_db, prescription_db, broker
+            )
+            target = {"cart": cart_db, "prescription": prescription_db}
+        stack.push_async_callback(cart_client.aclose)
+        stack.push_async_callback(prescription_client.aclose)
+
+        workload = Workload(cart_client, prescription_client, args.users, product_ids, random.Random(args.seed))
+        if args.warmup:
+            await drive(workload, args.mix, args.warmup, args.concurrency, record=False)
+        samples, elapsed = await drive(workload, args.mix, args.requests, args.concurrency, record=True)
+
+    report = summarize(samples, elapsed)
+    report["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "target": target,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "seed": args.seed,
+        "mix": args.mix,
+        "amqp_messages": len(broker.messages),
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+
+
+def print_report(report: dict):
+    print(f"{'operation':22s} {'count':>7s} {'rej':>5s} {'err':>5s} {'rps':>9s} "
+          f"{'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for name, stats in sorted(report["endpoints"].items()):
+        print(f"{name:22s} {stats['count']:7d} {stats['rejected']:5d} {stats['errors']:5d} {stats['rps']:9.1f} "
+              f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} {stats['max_ms']:9.2f}")
+    total = report["total"]
+    print(f"{'total':22s} {total['count']:7d} {'':5s} {'':5s} {total['rps']:9.1f} "
+          f"{total['p50_ms']:9.2f} {total['p95_ms']:9.2f} {total['p99_ms']:9.2f}")
+
+
+def compare(old_path: str, new_path: str):
+    """Разница двух отчетов по p50/p95/p99 и RPS"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def delta(before, after):
+        if not before:
+            return "     n/a"
+        return f"{(after - before) / before * 100:+7.1f}%"
+
+    print(f"{old['meta'].get('commit') or old_path} -> {new['meta'].get('commit') or new_path}")
+    rows = [(name, old["endpoints"].get(name), new["endpoints"].get(name))
+            for name in sorted(set(old["endpoints"]) | set(new["endpoints"]))]
+    rows.append(("total", old["total"], new["total"]))
+    for name, before, after in rows:
+        if not before or not after:
+            print(f"{name:22s} only in {'new' if after else 'old'} report")
+            continue
+        print(f"{name:22s} " + "  ".join(
+            f"{metric} {before[metric]:.2f}->{after[metric]:.2f} ({delta(before[metric], after[metric]).strip()})"
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "rps")
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--requests", type=int, default=2000)
+    run_parser.add_argument("--warmup", type=int, default=100)
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--users", type=int, default=200)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    run_parser.add_argument("--confirm-ms", type=float, default=0.5)
+    run_parser.add_argument("--cart-db", default="")
+    run_parser.add_argument("--prescription-db", default="")
+    run_parser.add_argument("--cart-url", default="")
+    run_parser.add_argument("--prescription-url", default="")
+    run_parser.add_argument("--output", default="")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args.old, args.new)
+    else:
+        asyncio.run(run(args))
@@ -0,0 +1,136 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+CART_CACHE_SIZE = int(os.getenv("CART_CACHE_SIZE", "10000"))
+CART_CACHE_TTL = float(os.getenv("CART_CACHE_TTL", "30"))
+# Ответ реплики может не содержать последнюю запись (отставание), поэтому живет недолго.
+# CART_REPLICA_CACHE_TTL плюс отставание реплик не должны превышать READ_YOUR_WRITES_SECONDS:
+# тогда клиент, вышедший из окна read-your-writes, не получит из кэша корзину до своей записи.
+# 0 - ответы реплик не кэшируются
+CART_REPLICA_CACHE_TTL = float(os.getenv("CART_REPLICA_CACHE_TTL", "2"))
+
+
+class CartCache(ABC):
+    """Интерфейс кэша корзин по user_id.
+
+    Чтение идет через токен: begin_read берется до запроса в базу, и set
+    сохраняет значение, только если с тех пор ключ не инвалидировали.
+    Так параллельная запись не может оставить в кэше устаревшую корзину.
+
+    Ответы реплик (from_replica) хранятся с коротким TTL и не отдаются читателям
+    с allow_replica=False - клиентам, которые только что писали.
+    """
+
+    @abstractmethod
+    async def get(self, key, allow_replica: bool = True) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def begin_read(self, key) -> int:
+        ...
+
+    @abstractmethod
+    async def set(self, key, value, token: int, from_replica: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, key):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "version", "from_replica")
+
+    def __init__(self, value, expires_at: float, version: int, from_replica: bool = False):
+        self.value = value
+        self.expires_at = expires_at
+        self.version = version
+        self.from_replica = from_replica
+
+
+class LRUCartCache(CartCache):
+    """Кэш в памяти процесса: LRU с ограничением размера и TTL"""
+
+    def __init__(self, maxsize: int = CART_CACHE_SIZE, ttl: float = CART_CACHE_TTL,
+                 replica_ttl: float = CART_REPLICA_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.replica_ttl = replica_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._version = 0
+        # Максимальная версия вытесненной инвалидации: ключ пропал из кэша,
+        # но читатели, начавшие раньше, не должны записать свое значение
+        self._evicted_version = 0
+        self.hits = 0
+        self.replica_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, key, allow_replica: bool = True) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry.value is None or (entry.from_replica and not allow_replica):
+            self.misses += 1
+            return None
+        if entry.expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if entry.from_replica:
+            self.replica_hits += 1
+        return entry.value
+
+    async def begin_read(self, key) -> int:
+        return self._version
+
+    async def set(self, key, value, token: int, from_replica: bool = False) -> bool:
+        ttl = self.replica_ttl if from_replica else self.ttl
+        entry = self._entries.get(key)
+        if ttl <= 0 or (entry is not None and entry.version > token) or self._evicted_version > token:
+            return False
+        self._version += 1
+        self._store(key, _Entry(value, self._clock() + ttl, self._version, from_replica))
+        return True
+
+    async def invalidate(self, key):
+        # Вместо удаления оставляем метку с новой версией, чтобы отсечь запоздавшие set
+        self._version += 1
+        self.invalidations += 1
+        self._store(key, _Entry(None, 0.0, self._version))
+
+    def _store(self, key, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            _, evicted = self._entries.popitem(last=False)
+            if evicted.value is None:
+                self._evicted_version = max(self._evicted_version, evicted.version)
+            else:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "replica_hits": self.replica_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+cart_cache = LRUCartCache()
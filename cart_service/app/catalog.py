@@ -0,0 +1,253 @@
+"""Каталог товаров в компактном бинарном файле, отображаемом в память.
+
+Формат (little-endian):
+    заголовок   magic b"CTLG", версия u16, резерв u16, число товаров u32
+    fanout      65536 x u32: число ключей с первыми двумя байтами <= i
+    ключи       n x 16 байт UUID, отсортированы
+    записи      n x 16 байт: цена в копейках i64, смещение имени u32, длина имени u16, флаги u8
+    имена       UTF-8, подряд
+
+Файл открывается через mmap без разбора содержимого, поэтому загрузка не
+зависит от числа товаров, а в памяти остаются только реально прочитанные
+страницы. Поиск: fanout сужает диапазон до нескольких ключей, дальше
+бинарный поиск по байтам UUID.
+
+Сборка файла из CSV (product_id,name,price,requires_prescription):
+    python -m app.catalog build products.csv catalog.bin
+"""
+import csv
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+from uuid import UUID
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", "")
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "5"))
+
+MAGIC = b"CTLG"
+VERSION = 1
+FLAG_PRESCRIPTION = 0x01
+
+_HEADER = struct.Struct("<4sHHI")
+_FANOUT_ENTRY = struct.Struct("<I")
+_RECORD = struct.Struct("<qIHBx")
+_KEY_SIZE = 16
+_FANOUT_SIZE = 65536
+_FANOUT_OFFSET = _HEADER.size
+_KEYS_OFFSET = _FANOUT_OFFSET + _FANOUT_SIZE * _FANOUT_ENTRY.size
+
+
+class Product(NamedTuple):
+    id: UUID
+    name: str
+    price: float
+    requires_prescription: bool = False
+
+
+# Стартовый набор, пока не указан CATALOG_PATH
+SEED_PRODUCTS = [
+    Product(UUID("5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"), "Аспирин", 150.00),
+    Product(UUID("a1b2c3d4-e5f6-47a8-9b0c-1d2e3f4a5b6c"), "Ношпа", 280.00),
+    Product(UUID("b2c3d4e5-f6a7-48b9-9c0d-2e3f4a5b6c7d"), "Парацетамол", 90.00),
+    Product(UUID("c3d4e5f6-a7b8-49c0-8d1e-3f4a5b6c7d8e"), "Ибупрофен", 120.00),
+]
+
+
+class CatalogFormatError(ValueError):
+    pass
+
+
+def encode_catalog(products: Iterable[Product]) -> bytes:
+    """Сериализация каталога в бинарный формат"""
+    products = sorted(products, key=lambda product: product.id.bytes)
+    fanout = [0] * _FANOUT_SIZE
+    keys = bytearray()
+    records = bytearray()
+    names = bytearray()
+    previous = None
+
+    for product in products:
+        key = product.id.bytes
+        if key == previous:
+            raise CatalogFormatError(f"Duplicate product id {product.id}")
+        previous = key
+        name = product.name.encode()
+        fanout[(key[0] << 8) | key[1]] += 1
+        keys += key
+        records += _RECORD.pack(
+            round(product.price * 100), len(names), len(name),
+            FLAG_PRESCRIPTION if product.requires_prescription else 0
+        )
+        names += name
+
+    total = 0
+    for prefix in range(_FANOUT_SIZE):
+        total += fanout[prefix]
+        fanout[prefix] = total
+
+    return b"".join((
+        _HEADER.pack(MAGIC, VERSION, 0, len(products)),
+        struct.pack(f"<{_FANOUT_SIZE}I", *fanout),
+        bytes(keys),
+        bytes(records),
+        bytes(names),
+    ))
+
+
+def write_catalog(path: str, products: Iterable[Product]):
+    """Атомарная запись: временный файл в том же каталоге и os.replace"""
+    data = encode_catalog(products)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".catalog-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога поверх mmap или bytes"""
+
+    def __init__(self, buffer, source: str = ""):
+        if len(buffer) < _KEYS_OFFSET:
+            raise CatalogFormatError("Catalog file is truncated")
+        magic, version, _, count = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise CatalogFormatError("Unknown catalog format")
+        self._records_offset = _KEYS_OFFSET + count * _KEY_SIZE
+        self._names_offset = self._records_offset + count * _RECORD.size
+        if len(buffer) < self._names_offset:
+            raise CatalogFormatError("Catalog file is truncated")
+        self._buffer = buffer
+        self.count = count
+        self.source = source
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key: bytes) -> int:
+        buffer = self._buffer
+        prefix = (key[0] << 8) | key[1]
+        lo = _FANOUT_ENTRY.unpack_from(buffer, _FANOUT_OFFSET + (prefix - 1) * 4)[0] if prefix else 0
+        hi = _FANOUT_ENTRY.unpack_from(buffer, _FANOUT_OFFSET + prefix * 4)[0]
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            offset = _KEYS_OFFSET + mid * _KEY_SIZE
+            probe = buffer[offset:offset + _KEY_SIZE]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _product(self, product_id: UUID, index: int) -> Product:
+        price, name_offset, name_length, flags = _RECORD.unpack_from(
+            self._buffer, self._records_offset + index * _RECORD.size
+        )
+        start = self._names_offset + name_offset
+        name = self._buffer[start:start + name_length].decode()
+        return Product(product_id, name, price / 100, bool(flags & FLAG_PRESCRIPTION))
+
+    def get(self, product_id: UUID) -> Optional[Product]:
+        index = self._find(product_id.bytes)
+        return self._product(product_id, index) if index >= 0 else None
+
+    def get_many(self, product_ids: Iterable[UUID]) -> Dict[UUID, Product]:
+        result = {}
+        for product_id in set(product_ids):
+            index = self._find(product_id.bytes)
+            if index >= 0:
+                result[product_id] = self._product(product_id, index)
+        return result
+
+    @classmethod
+    def open(cls, path: str) -> "CatalogSnapshot":
+        with open(path, "rb") as f:
+            # Отображение остается действительным после закрытия файла
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+
+class ProductCatalog:
+    """Каталог с горячей перезагрузкой: новый снимок подменяет старый одной операцией присваивания"""
+
+    def __init__(self, path: str = CATALOG_PATH, reload_interval: float = CATALOG_RELOAD_INTERVAL,
+                 clock=time.monotonic):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._clock = clock
+        self._file_state = None
+        self._checked_at = clock()
+        self.reloads = 0
+        self._snapshot = CatalogSnapshot(encode_catalog(SEED_PRODUCTS), source="seed")
+        if path:
+            self.reload()
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def reload(self) -> bool:
+        """Перечитать файл, если он изменился. Битый файл не заменяет рабочий снимок"""
+        self._checked_at = self._clock()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        file_state = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if file_state == self._file_state:
+            return False
+        try:
+            snapshot = CatalogSnapshot.open(self.path)
+        except (CatalogFormatError, ValueError, OSError) as e:
+            print(f"Catalog reload failed: {e}")
+            return False
+        self._snapshot = snapshot
+        self._file_state = file_state
+        self.reloads += 1
+        return True
+
+    def _maybe_reload(self):
+        if self.path and self._clock() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def get(self, product_id: UUID) -> Optional[Product]:
+        self._maybe_reload()
+        return self._snapshot.get(product_id)
+
+    def get_many(self, product_ids: Iterable[UUID]) -> Dict[UUID, Product]:
+        self._maybe_reload()
+        return self._snapshot.get_many(product_ids)
+
+
+def read_csv(path: str) -> list:
+    products = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            products.append(Product(
+                UUID(row["product_id"]),
+                row["name"],
+                float(row["price"]),
+                row.get("requires_prescription", "").strip().lower() in ("1", "true", "yes")
+            ))
+    return products
+
+
+catalog = ProductCatalog()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("Usage: python -m app.catalog build <products.csv> <catalog.bin>")
+        sys.exit(2)
+    write_catalog(sys.argv[3], read_csv(sys.argv[2]))
@@ -0,0 +1,274 @@
+"""Допуск к рецептурным товарам: локальная проекция событий prescription_verified.
+
+prescription_service публикует prescription_verified после проверки рецепта.
+Потребитель очереди prescription_verified_consumer пишет лекарства подтвержденных рецептов в
+prescription_grants, а EligibilityIndex держит в памяти
+(user_id, product_id) -> {prescription_id: (действует по, количество)}, поэтому
+проверка в add_to_cart - поиск в словаре без HTTP-вызова и без запроса в базу.
+
+Подтверждение рецепта окончательно, поэтому таблица только дополняется, а
+повторное событие или строка снимка ничего не меняют. Каждый процесс сервиса
+держит свой индекс: сообщение из очереди получает один процесс и сразу применяет
+к своему индексу, остальные догоняют по таблице раз в ELIGIBILITY_REFRESH_INTERVAL
+по возрастающему seq (с перекрытием ELIGIBILITY_REFRESH_OVERLAP строк: seq
+параллельных транзакций фиксируется не по порядку).
+
+Холодный старт: индекс читается из таблицы. Пустую таблицу (новая база) можно
+заполнить снимком подтвержденных рецептов - выгрузкой prescription_service:
+    python -m app.eligibility rebuild "http://prescription_service/api/prescriptions/export?status=approved"
+    python -m app.eligibility rebuild approved.ndjson
+С ELIGIBILITY_SNAPSHOT_URL то же делается при старте, если таблица пуста.
+
+Расход рецепта заказами в этом сервисе не ведется: остаток - сумма количеств
+действующих подтвержденных рецептов, и количество товара в корзине не может его превышать.
+"""
+import argparse
+import asyncio
+import json
+import os
+import urllib.request
+from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, database
+from .catalog import Product
+from .consumer import Consumer
+from .dedup import Deduplicator
+from .sweeper import Sweeper
+
+ELIGIBILITY_ENFORCED = os.getenv("ELIGIBILITY_ENFORCED", "1") != "0"
+ELIGIBILITY_REFRESH_INTERVAL = float(os.getenv("ELIGIBILITY_REFRESH_INTERVAL", "1"))
+# Перекрытие должно покрывать seq транзакций, еще не зафиксированных при прошлом чтении:
+# это пачки потребителя (до 50 событий по несколько лекарств), а не вся таблица.
+# Каждый опрос перечитывает не больше этого числа строк по первичному ключу
+ELIGIBILITY_REFRESH_OVERLAP = int(os.getenv("ELIGIBILITY_REFRESH_OVERLAP", "200"))
+ELIGIBILITY_SNAPSHOT_URL = os.getenv("ELIGIBILITY_SNAPSHOT_URL", "")
+ELIGIBILITY_BATCH_SIZE = 1000
+APPROVED = "approved"
+
+
+class PrescriptionRequired(ValueError):
+    pass
+
+
+def grant_rows(record: dict, today: Optional[date] = None) -> list:
+    """Строки prescription_grants из события prescription_verified или строки выгрузки рецептов.
+    Неподтвержденные и просроченные рецепты строк не дают"""
+    if record.get("status") != APPROVED:
+        return []
+    expires_at = datetime.fromisoformat(record["expiry_date"])
+    # Рецепт действует до конца дня expiry_date, как и в prescription_service
+    if expires_at.date() < (today or datetime.now().date()):
+        return []
+    prescription_id = UUID(record.get("prescription_id") or record["id"])
+    verified_at = datetime.fromisoformat(record["verified_at"]) if record.get("verified_at") else datetime.utcnow()
+
+    # Один товар может встретиться в рецепте несколько раз (разные дозировки)
+    quantities = {}
+    for med in record["medications"]:
+        product_id = UUID(med["product_id"])
+        quantities[product_id] = quantities.get(product_id, 0) + med["quantity"]
+    return [
+        {"prescription_id": prescription_id, "user_id": UUID(record["user_id"]), "product_id": product_id,
+         "quantity": quantity, "expires_at": expires_at, "verified_at": verified_at}
+        for product_id, quantity in quantities.items()
+    ]
+
+
+def grants_insert(rows: list):
+    """INSERT строк проекции; уже записанные строки пропускаются"""
+    return database.dialect_insert(models.PrescriptionGrant).values(rows).on_conflict_do_nothing(
+        index_elements=[models.PrescriptionGrant.prescription_id, models.PrescriptionGrant.product_id]
+    )
+
+
+class EligibilityIndex:
+    """Подтвержденные действующие рецепты в памяти процесса"""
+
+    def __init__(self):
+        self._grants = {}
+        self.last_seq = 0
+        self.loaded = False
+
+    def __len__(self):
+        return sum(len(grants) for grants in self._grants.values())
+
+    def add(self, row):
+        """Добавить строку проекции (dict или строку таблицы); повторное добавление ничего не меняет"""
+        get = row.get if isinstance(row, dict) else lambda key: getattr(row, key)
+        grants = self._grants.setdefault((get("user_id"), get("product_id")), {})
+        grants[get("prescription_id")] = (get("expires_at").date(), get("quantity"))
+
+    def remaining(self, user_id: UUID, product_id: UUID, today: Optional[date] = None) -> int:
+        """Сколько единиц товара пользователь может держать в корзине по действующим рецептам"""
+        grants = self._grants.get((user_id, product_id))
+        if not grants:
+            return 0
+        today = today or datetime.now().date()
+        return sum(quantity for expires_on, quantity in grants.values() if expires_on >= today)
+
+    def prune(self, today: Optional[date] = None):
+        """Убрать просроченные рецепты"""
+        today = today or datetime.now().date()
+        for key in list(self._grants):
+            grants = {prescription_id: grant for prescription_id, grant in self._grants[key].items()
+                      if grant[0] >= today}
+            if grants:
+                self._grants[key] = grants
+            else:
+                del self._grants[key]
+
+    async def refresh(self, db: AsyncSession, batch_size: int = ELIGIBILITY_BATCH_SIZE,
+                      overlap: int = ELIGIBILITY_REFRESH_OVERLAP) -> int:
+        """Дочитать строки таблицы после last_seq; на первом вызове - всю таблицу (холодный старт)"""
+        grant = models.PrescriptionGrant
+        after = max(0, self.last_seq - overlap) if self.loaded else 0
+        read = 0
+        while True:
+            rows = (await db.execute(
+                select(grant).where(grant.seq > after).order_by(grant.seq).limit(batch_size)
+            )).scalars().all()
+            for row in rows:
+                self.add(row)
+            read += len(rows)
+            if rows:
+                self.last_seq = max(self.last_seq, rows[-1].seq)
+            if len(rows) < batch_size:
+                break
+            after = rows[-1].seq
+        await db.rollback()
+        self.loaded = True
+        return read
+
+
+index = EligibilityIndex()
+
+
+def check_eligibility(user_id: UUID, product: Product, quantity: int, eligibility_index: EligibilityIndex = None):
+    """Рецептурный товар можно держать в корзине только в пределах подтвержденных рецептов"""
+    if not ELIGIBILITY_ENFORCED or not product.requires_prescription:
+        return
+    remaining = (eligibility_index or index).remaining(user_id, product.id)
+    if quantity > remaining:
+        if remaining == 0:
+            raise PrescriptionRequired(f"Товар {product.name} отпускается только по подтвержденному рецепту")
+        raise PrescriptionRequired(f"По подтвержденным рецептам доступно не более {remaining} шт. товара {product.name}")
+
+
+async def apply_events(db: AsyncSession, records: list, eligibility_index: EligibilityIndex = None) -> int:
+    """Записать подтвержденные рецепты из событий в таблицу и индекс; вернуть число строк.
+    commit фиксирует и все, что уже записано в транзакции db (отметки Deduplicator)"""
+    rows = [row for record in records for row in grant_rows(record)]
+    if rows:
+        await db.execute(grants_insert(rows))
+    await db.commit()
+    # В индекс - только после commit: проверка не должна опережать проекцию в базе
+    for row in rows:
+        (eligibility_index or index).add(row)
+    return len(rows)
+
+
+async def process_prescription_verified_messages(messages: list, db: AsyncSession):
+    """Пачка событий о проверке рецептов: подтвержденные попадают в проекцию
+    в одной транзакции с отметками об обработке"""
+    records = [json.loads(msg.body.decode()) for msg in messages]
+    granted = await apply_events(db, records)
+    print(f"Received {len(records)} prescription verified messages, {granted} grants applied")
+
+
+prescription_verified_dedup = Deduplicator("prescription_verified")
+prescription_verified_consumer = Consumer(
+    "prescription_verified",
+    prescription_verified_dedup.wrap(process_prescription_verified_messages, with_session=True),
+    batch_size=50
+)
+
+
+async def delete_expired_grants(db: AsyncSession, batch_size: int, now: datetime) -> int:
+    """Удалить одну пачку строк просроченных рецептов; вернуть число удаленных"""
+    today = datetime.combine(now.date(), datetime.min.time())
+    grant = models.PrescriptionGrant
+    expired = select(grant.seq).where(grant.expires_at < today).order_by(grant.seq).limit(batch_size)
+    result = await db.execute(delete(grant).where(grant.seq.in_(expired)))
+    await db.commit()
+    return result.rowcount
+
+
+expired_grants_sweeper = Sweeper("expired_prescription_grants", delete_expired_grants)
+
+
+def read_snapshot(source: str):
+    """Строки выгрузки рецептов (NDJSON) из файла или по URL, без чтения целиком"""
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source) as response:
+            yield from response
+    else:
+        with open(source, "rb") as f:
+            yield from f
+
+
+def import_snapshot(source: str, batch_size: int = ELIGIBILITY_BATCH_SIZE) -> int:
+    """Заполнить prescription_grants из снимка подтвержденных рецептов; вернуть число строк"""
+    today = datetime.now().date()
+    imported = 0
+    rows = []
+    with database.SessionLocal() as db:
+        for line in read_snapshot(source):
+            if not line.strip():
+                continue
+            rows.extend(grant_rows(json.loads(line), today))
+            if len(rows) >= batch_size:
+                db.execute(grants_insert(rows))
+                db.commit()
+                imported += len(rows)
+                rows = []
+        if rows:
+            db.execute(grants_insert(rows))
+            db.commit()
+            imported += len(rows)
+    return imported
+
+
+async def warm_up(snapshot_url: str = ELIGIBILITY_SNAPSHOT_URL, session_factory=None):
+    """Холодный старт: пустую таблицу заполнить снимком (если указан), затем загрузить индекс"""
+    session_factory = session_factory or database.AsyncSessionLocal
+    async with session_factory() as db:
+        empty = (await db.execute(select(func.count()).select_from(models.PrescriptionGrant))).scalar() == 0
+        await db.rollback()
+        if empty and snapshot_url:
+            imported = await asyncio.to_thread(import_snapshot, snapshot_url)
+            print(f"Eligibility: imported {imported} grants from snapshot")
+        await index.refresh(db)
+    print(f"Eligibility: loaded {len(index)} grants")
+
+
+async def run_refresh(interval: float = ELIGIBILITY_REFRESH_INTERVAL, session_factory=None):
+    """Догонять таблицу записями, которые применили другие процессы сервиса"""
+    session_factory = session_factory or database.AsyncSessionLocal
+    last_prune = datetime.now().date()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await index.refresh(db)
+            if datetime.now().date() != last_prune:
+                last_prune = datetime.now().date()
+                index.prune()
+        except Exception as e:
+            print(f"Eligibility refresh error: {e}")
+
+
+def main(args):
+    imported = import_snapshot(args.source, args.batch_size)
+    print(f"Imported {imported} grants")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проекция подтвержденных рецептов")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="заполнить таблицу снимком выгрузки рецептов")
+    rebuild.add_argument("source", help="файл NDJSON или URL выгрузки prescription_service")
+    rebuild.add_argument("--batch-size", type=int, default=ELIGIBILITY_BATCH_SIZE)
+    main(parser.parse_args())
@@ -1,12 +1,83 @@
 from fastapi import FastAPI
-from . import models, database
+from fastapi.responses import PlainTextResponse
+import asyncio
+from . import rabbitmq, outbox, dedup, eligibility, metrics, database, retention, shards, replicas
+from .cache import cart_cache
 from .routes import router
 
-models.Base.metadata.create_all(bind=database.engine)
-
 app = FastAPI(title="Cart Service", version="1.0.0")
 app.include_router(router, prefix="/api")
+app.add_middleware(replicas.ConsistencyMiddleware)
+for shard in shards.router.shards.values():
+    replicas.track_commits(shard.async_engine)
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(database.async_engine, "async")
+    metrics.instrument_engine(database.engine, "sync")
+    for shard in shards.router.shards.values():
+        # Шард с DATABASE_URL использует уже замеряемые движки
+        if shard.async_engine is not database.async_engine:
+            metrics.instrument_engine(shard.async_engine, f"async@{shard.name}")
+        for index, replica in enumerate(shard.reads.replicas):
+            metrics.instrument_engine(replica.async_engine, f"replica{index}@{shard.name}")
+
+background_tasks = []
+
+@app.on_event("startup")
+async def startup_event():
+    """Открываем долгоживущее соединение с RabbitMQ, загружаем проекцию рецептов, запускаем потребителя,
+    ретрансляцию outbox и очистку брошенных корзин"""
+    await rabbitmq.publisher.start()
+    # Индекс загружается до потребителя: иначе события из очереди перемешаются с холодной загрузкой
+    await eligibility.warm_up()
+    eligibility.prescription_verified_consumer.start()
+    background_tasks.append(asyncio.create_task(eligibility.run_refresh()))
+    background_tasks.append(asyncio.create_task(outbox.relay.run()))
+    background_tasks.append(asyncio.create_task(dedup.run_cleanup()))
+    background_tasks.append(asyncio.create_task(eligibility.expired_grants_sweeper.run()))
+    for sweeper in retention.abandoned_carts_sweepers:
+        background_tasks.append(asyncio.create_task(sweeper.run()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Дообрабатываем полученные сообщения, останавливаем фоновые задачи, досылаем буфер и закрываем соединение"""
+    await eligibility.prescription_verified_consumer.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await rabbitmq.publisher.stop()
 
 @app.get("/")
 def read_root():
-    return {"message": "Cart Service is running"}
\ No newline at end of file
+    return {"message": "Cart Service is running"}
+
+@app.get("/stats/amqp")
+def amqp_stats():
+    return {
+        **rabbitmq.publisher.stats.snapshot(),
+        "consumers": {
+            eligibility.prescription_verified_consumer.queue_name: {
+                **eligibility.prescription_verified_consumer.stats.snapshot(),
+                "dedup": eligibility.prescription_verified_dedup.stats()
+            }
+        }
+    }
+
+@app.get("/stats/eligibility")
+def eligibility_stats():
+    return {"grants": len(eligibility.index), "last_seq": eligibility.index.last_seq}
+
+@app.get("/stats/cache")
+def cache_stats():
+    return cart_cache.stats()
+
+@app.get("/stats/sweeper")
+def sweeper_stats():
+    sweepers = [*retention.abandoned_carts_sweepers, eligibility.expired_grants_sweeper]
+    return {sweeper.name: sweeper.stats.snapshot() for sweeper in sweepers}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
\ No newline at end of file
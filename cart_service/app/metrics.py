@@ -0,0 +1,189 @@
+"""Метрики Prometheus (prometheus_client).
+
+HTTP: гистограмма длительности запроса по маршруту и коду ответа, число
+SQL-запросов и время в базе на запрос (через события движка SQLAlchemy и
+contextvar текущего запроса). База: длительность запросов и состояние пула.
+AMQP: задержка и исход публикации, задержка доставки до потребителя и
+длительность обработчика. Фоновая очистка: строки и длительность пачек.
+
+Несколько процессов (uvicorn --workers): PROMETHEUS_MULTIPROC_DIR - пустой
+каталог, общий для процессов; /metrics тогда суммирует их значения.
+Замер накладных расходов - benchmarks/bench_metrics.py. Отключение: METRICS_ENABLED=0.
+"""
+import contextvars
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Свой реестр, а не глобальный prometheus_client.REGISTRY: в одном процессе
+# (тесты, benchmarks.load) живут оба сервиса с одинаковыми именами метрик
+REGISTRY = CollectorRegistry()
+
+
+def render(registry: CollectorRegistry = REGISTRY) -> bytes:
+    """Выгрузка в текстовом формате; в многопроцессном режиме - сумма по всем процессам"""
+    if registry is REGISTRY and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ("method", "route"),
+    buckets=COUNT_BUCKETS, registry=REGISTRY
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in the database per HTTP request", ("method", "route"),
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+DB_STATEMENT_SECONDS = Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time", ("engine",), buckets=DB_BUCKETS,
+    registry=REGISTRY
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured connection pool size", ("engine",),
+                     multiprocess_mode="livesum", registry=REGISTRY)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out of the pool", ("engine",),
+                            multiprocess_mode="livesum", registry=REGISTRY)
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ("engine",),
+                         multiprocess_mode="livesum", registry=REGISTRY)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read sessions by target: primary, replica or primary after a recent write", ("target",),
+    registry=REGISTRY
+)
+AMQP_PUBLISH_SECONDS = Histogram(
+    "amqp_publish_duration_seconds", "Time from publish() to broker confirm", ("routing_key",),
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+AMQP_PUBLISHED = Counter("amqp_published_total", "Published messages by outcome", ("routing_key", "outcome"),
+                         registry=REGISTRY)
+AMQP_CONSUMER_LAG_SECONDS = Histogram(
+    "amqp_consumer_lag_seconds", "Time from publish to delivery to the consumer", ("queue",),
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+AMQP_CONSUMER_HANDLER_SECONDS = Histogram(
+    "amqp_consumer_handler_duration_seconds", "Consumer handler duration per message or batch", ("queue",),
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+AMQP_CONSUMED = Counter("amqp_consumed_total", "Consumed messages by outcome", ("queue", "outcome"),
+                        registry=REGISTRY)
+AMQP_CONSUMER_IN_FLIGHT = Gauge(
+    "amqp_consumer_in_flight", "Messages received by the consumer and not yet settled", ("queue",),
+    multiprocess_mode="livesum", registry=REGISTRY
+)
+SWEEPER_ROWS = Counter("sweeper_rows_total", "Rows removed or archived by the maintenance sweeper", ("sweeper",),
+                       registry=REGISTRY)
+SWEEPER_BATCH_SECONDS = Histogram(
+    "sweeper_batch_duration_seconds", "Duration of one sweeper batch transaction", ("sweeper",),
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+
+
+class RequestDbStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+_request_db_stats = contextvars.ContextVar("request_db_stats", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запроса по шаблону маршрута и коду ответа, SQL-запросы и время в базе"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestDbStats()
+        token = _request_db_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db_stats.reset(token)
+            # Шаблон пути (/api/prescriptions/{prescription_id}), а не сам путь: число рядов ограничено
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+            HTTP_REQUEST_DB_STATEMENTS.labels(method, route).observe(stats.statements)
+            HTTP_REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
+
+
+def instrument_engine(engine, name: str):
+    """Замер SQL-запросов через события движка и состояния пула при выдаче и возврате соединений"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    statement_seconds = DB_STATEMENT_SECONDS.labels(name)
+
+    # Время начала храним на контексте выполнения: дешевле, чем стек в conn.info.
+    # context бывает None для служебных запросов движка, их не замеряем
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "_metrics_started_at", None)
+        if started_at is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        statement_seconds.observe(elapsed)
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.seconds += elapsed
+
+    pool = sync_engine.pool
+    if not hasattr(pool, "overflow"):
+        return
+    size = pool.size()
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    overflow = DB_POOL_OVERFLOW.labels(name)
+    DB_POOL_SIZE.labels(name).set(size)
+    opened = 0
+
+    # Значения пула ведутся по событиям, а не читаются при выгрузке: так они доступны
+    # и в многопроцессном режиме, где выгрузка идет не в процессе с пулом
+    def on_connect(*args):
+        nonlocal opened
+        opened += 1
+        overflow.set(max(0, opened - size))
+
+    def on_close(*args):
+        nonlocal opened
+        opened -= 1
+        overflow.set(max(0, opened - size))
+
+    event.listen(pool, "connect", on_connect)
+    event.listen(pool, "close", on_close)
+    event.listen(pool, "detach", on_close)
+    event.listen(pool, "checkout", lambda *args: checked_out.inc())
+    event.listen(pool, "checkin", lambda *args: checked_out.dec())
@@ -0,0 +1,88 @@
+"""Версионированные миграции схемы (Alembic). Запускаются отдельным шагом до старта приложения.
+
+    python -m app.migrate upgrade             # применить все миграции (ко всем шардам CART_SHARDS)
+    python -m app.migrate check               # код 1, если модели разошлись с миграциями хотя бы в одном шарде
+    python -m app.migrate revision "message"  # заготовка миграции по разнице с моделями
+"""
+import os
+import sys
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, pool
+from . import database, models, shards
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Оба сервиса могут жить в одной базе, поэтому таблица версий у каждого своя
+VERSION_TABLE = "cart_alembic_version"
+# Ревизия, соответствующая схеме, которую раньше создавал create_all
+BASELINE_REVISION = "0001"
+BASELINE_TABLE = "carts"
+
+
+def include_name(name, type_, parent_names):
+    """Сравниваем только свои таблицы: таблицы другого сервиса в общей базе не считаются расхождением"""
+    if type_ == "table":
+        return name in models.Base.metadata.tables
+    return True
+
+
+def get_config(url: str = None) -> Config:
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("sqlalchemy.url", (url or database.DATABASE_URL).replace("%", "%%"))
+    config.attributes["target_metadata"] = models.Base.metadata
+    config.attributes["version_table"] = VERSION_TABLE
+    config.attributes["include_name"] = include_name
+    return config
+
+
+def upgrade(url: str = None, revision: str = "head"):
+    config = get_config(url)
+    engine = create_engine(url or database.DATABASE_URL, poolclass=pool.NullPool)
+    inspector = inspect(engine)
+    # База создана через create_all до появления миграций: считаем ее базовой ревизией
+    if not inspector.has_table(VERSION_TABLE) and inspector.has_table(BASELINE_TABLE):
+        command.stamp(config, BASELINE_REVISION)
+    engine.dispose()
+    command.upgrade(config, revision)
+
+
+def check(url: str = None) -> list:
+    """Разница между моделями и схемой базы, к которой применены все миграции"""
+    engine = create_engine(url or database.DATABASE_URL, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as connection:
+            context = MigrationContext.configure(connection, opts={
+                "include_name": include_name,
+                "version_table": VERSION_TABLE,
+                # SQLite не хранит типы столбцов, сравнивать их имеет смысл только в Postgres
+                "compare_type": connection.dialect.name == "postgresql",
+                "compare_server_default": False,
+            })
+            return compare_metadata(context, models.Base.metadata)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    action = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    shard_urls = {name: shard.url for name, shard in shards.router.shards.items()}
+    if action == "upgrade":
+        for name, url in shard_urls.items():
+            print(f"Upgrading shard {name}")
+            upgrade(url, revision=sys.argv[2] if len(sys.argv) > 2 else "head")
+    elif action == "check":
+        failed = False
+        for name, url in shard_urls.items():
+            diff = check(url)
+            for change in diff:
+                print(f"{name}: {change}")
+            failed = failed or bool(diff)
+        sys.exit(1 if failed else 0)
+    elif action == "revision":
+        command.revision(get_config(), message=" ".join(sys.argv[2:]), autogenerate=True)
+    else:
+        print("Usage: python -m app.migrate [upgrade [revision]|check|revision <message>]")
+        sys.exit(2)
@@ -0,0 +1,41 @@
+"""Таблица outbox и денормализованные итоги корзины
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "cart_outbox",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("routing_key", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    # Константный server_default: в Postgres 11+ столбец добавляется без перезаписи таблицы
+    with op.batch_alter_table("carts") as batch:
+        batch.add_column(sa.Column("item_count", sa.Integer(), nullable=False, server_default="0"))
+        batch.add_column(sa.Column("total_price", sa.Float(), nullable=False, server_default="0"))
+    # Итоги для уже существующих корзин
+    op.execute(
+        "UPDATE carts SET "
+        "item_count = (SELECT COALESCE(SUM(quantity), 0) FROM cart_items WHERE cart_items.cart_id = carts.id), "
+        "total_price = (SELECT COALESCE(SUM(price * quantity), 0) FROM cart_items WHERE cart_items.cart_id = carts.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("carts") as batch:
+        batch.drop_column("total_price")
+        batch.drop_column("item_count")
+    op.drop_table("cart_outbox")
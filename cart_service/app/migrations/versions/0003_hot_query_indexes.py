@@ -0,0 +1,42 @@
+"""Уникальные индексы для поиска корзины по user_id и позиции по (cart_id, product_id)
+
+В Postgres индексы строятся CONCURRENTLY вне транзакции, без блокировки записи,
+и затем превращаются в ограничения через ADD CONSTRAINT ... USING INDEX.
+Перед применением дубликаты корзин и позиций должны быть устранены.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+UNIQUE_INDEXES = [
+    ("uq_carts_user_id", "carts", ["user_id"]),
+    ("uq_cart_items_cart_product", "cart_items", ["cart_id", "product_id"]),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        for name, table, columns in UNIQUE_INDEXES:
+            with op.batch_alter_table(table) as batch:
+                batch.create_unique_constraint(name, columns)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in UNIQUE_INDEXES:
+            op.create_index(name, table, columns, unique=True,
+                            postgresql_concurrently=True, if_not_exists=True)
+    for name, table, _ in UNIQUE_INDEXES:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+
+def downgrade():
+    for name, table, _ in reversed(UNIQUE_INDEXES):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(name, type_="unique")
@@ -0,0 +1,25 @@
+"""Индекс carts.updated_at для поиска брошенных корзин
+
+Строится CONCURRENTLY, без блокировки записи в корзины.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_carts_updated_at", "carts", ["updated_at"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_carts_updated_at", table_name="carts", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,48 @@
+"""Проекция подтвержденных рецептов и таблица дедупликации потребителя
+
+Миграции применяются ко всем шардам CART_SHARDS, но eligibility и dedup работают
+только с базой по умолчанию (database.DATABASE_URL): копии таблиц на остальных
+шардах намеренно не используются. Они остаются, чтобы схема всех шардов совпадала
+с моделями и migrate check не находил расхождений.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "cart_processed_messages",
+        sa.Column("consumer", sa.String(64), primary_key=True),
+        sa.Column("message_id", sa.String(128), primary_key=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_cart_processed_messages_processed_at", "cart_processed_messages", ["processed_at"])
+    op.create_table(
+        "prescription_grants",
+        sa.Column("seq", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("prescription_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("product_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("verified_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("prescription_id", "product_id", name="uq_prescription_grants_prescription_product"),
+    )
+    op.create_index("ix_prescription_grants_expires_at", "prescription_grants", ["expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_prescription_grants_expires_at", table_name="prescription_grants")
+    op.drop_table("prescription_grants")
+    op.drop_index("ix_cart_processed_messages_processed_at", table_name="cart_processed_messages")
+    op.drop_table("cart_processed_messages")
@@ -1,16 +1,27 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, Float, DateTime, ForeignKey, JSON, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
 from .database import Base
 
+# Предел количества одного товара в корзине: маршруты и перенос корзин между шардами
+MAX_ITEM_QUANTITY = 10
+
 
 class Cart(Base):
     __tablename__ = "carts"
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_carts_user_id"),
+        # Поиск брошенных корзин фоновой очисткой
+        Index("ix_carts_updated_at", "updated_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False)
+    # Денормализованные итоги: число единиц товара и сумма, обновляются в транзакции каждого изменения
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_price = Column(Float, nullable=False, default=0.0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -19,6 +30,9 @@ class Cart(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        UniqueConstraint("cart_id", "product_id", name="uq_cart_items_cart_product"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     cart_id = Column(UUID(as_uuid=True), ForeignKey("carts.id"), nullable=False)
@@ -28,4 +42,43 @@ class CartItem(Base):
     price = Column(Float, nullable=False)
     added_at = Column(DateTime, default=datetime.utcnow)
 
-    cart = relationship("Cart", back_populates="items")
\ No newline at end of file
+    cart = relationship("Cart", back_populates="items")
+
+
+class OutboxEvent(Base):
+    """Событие, записанное в одной транзакции с бизнес-изменением и ожидающее отправки в RabbitMQ"""
+    __tablename__ = "cart_outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    routing_key = Column(String, nullable=False)
+    payload = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ProcessedMessage(Base):
+    """Id уже обработанных сообщений для отсечения повторных доставок; строки старше TTL удаляются"""
+    __tablename__ = "cart_processed_messages"
+    __table_args__ = (
+        Index("ix_cart_processed_messages_processed_at", "processed_at"),
+    )
+
+    consumer = Column(String(64), primary_key=True)
+    message_id = Column(String(128), primary_key=True)
+    processed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PrescriptionGrant(Base):
+    """Лекарство подтвержденного рецепта из события prescription_verified (проекция app.eligibility).
+    Таблица только дополняется; seq - порядок добавления для догоняющего чтения индексом"""
+    __tablename__ = "prescription_grants"
+    __table_args__ = (
+        UniqueConstraint("prescription_id", "product_id", name="uq_prescription_grants_prescription_product"),
+        Index("ix_prescription_grants_expires_at", "expires_at"),
+    )
+
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    prescription_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    product_id = Column(UUID(as_uuid=True), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    verified_at = Column(DateTime, nullable=False)
@@ -0,0 +1,76 @@
+"""Онлайн-перенос корзин между шардами после изменения CART_SHARDS.
+
+Порядок добавления шарда:
+  1. Применить миграции к новой базе, добавить ее в CART_SHARDS, а прежний
+     список имен указать в CART_SHARDS_PREVIOUS и выкатить сервис. С этого
+     момента запрос пользователя сам переносит его корзину к новому владельцу.
+  2. Перенести остальные корзины в фоне:
+         python -m app.reshard plan     # сколько корзин и куда переедет
+         python -m app.reshard run      # перенос пачками с ограничением скорости
+  3. Убрать CART_SHARDS_PREVIOUS и выкатить сервис еще раз, затем повторить run:
+     он подберет корзины, записанные репликами со старой конфигурацией.
+
+Корзины просматриваются во всех шардах, а не только в прежних, поэтому повторный
+запуск безопасен и доводит до конца прерванный перенос.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from sqlalchemy import select
+from . import models, shards
+
+RESHARD_BATCH_SIZE = 500
+
+
+async def misplaced_carts(router: shards.ShardRouter, shard: shards.Shard, batch_size: int = RESHARD_BATCH_SIZE):
+    """Пачки user_id корзин шарда, которые по текущему кольцу принадлежат другому шарду"""
+    last_user_id = None
+    while True:
+        query = select(models.Cart.user_id).order_by(models.Cart.user_id).limit(batch_size)
+        if last_user_id is not None:
+            query = query.where(models.Cart.user_id > last_user_id)
+        async with shard.session_factory() as db:
+            user_ids = (await db.execute(query)).scalars().all()
+        if not user_ids:
+            return
+        last_user_id = user_ids[-1]
+        misplaced = [user_id for user_id in user_ids if router.shard_for(user_id) is not shard]
+        if misplaced:
+            yield misplaced
+
+
+async def reshard(router: shards.ShardRouter, batch_size: int = RESHARD_BATCH_SIZE,
+                  max_carts_per_second: float = 0, dry_run: bool = False) -> Counter:
+    """Перенести все корзины к владельцам по текущему кольцу; вернуть число корзин по парам (откуда, куда)"""
+    moved = Counter()
+    for shard in router.shards.values():
+        async for user_ids in misplaced_carts(router, shard, batch_size):
+            started = time.perf_counter()
+            for user_id in user_ids:
+                target = router.shard_for(user_id)
+                # Корзину мог уже перенести запрос пользователя
+                if dry_run or await shards.move_cart(shard, target, user_id):
+                    moved[shard.name, target.name] += 1
+            if max_carts_per_second > 0:
+                delay = len(user_ids) / max_carts_per_second - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+    return moved
+
+
+def main(args):
+    moved = asyncio.run(reshard(shards.router, args.batch_size, args.max_carts_per_second,
+                                dry_run=args.action == "plan"))
+    verb = "would move" if args.action == "plan" else "moved"
+    for (source, target), count in sorted(moved.items()):
+        print(f"{source} -> {target}: {verb} {count} carts")
+    print(f"Total: {verb} {sum(moved.values())} carts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос корзин между шардами")
+    parser.add_argument("action", choices=["plan", "run"])
+    parser.add_argument("--batch-size", type=int, default=RESHARD_BATCH_SIZE)
+    parser.add_argument("--max-carts-per-second", type=float, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,57 @@
+"""Удаление брошенных корзин: корзины без изменений дольше CART_ABANDONED_AFTER_DAYS.
+
+Каждая пачка - одна короткая транзакция: блокировка корзин (SKIP LOCKED, чтобы
+не ждать корзины, которые сейчас меняет пользователь), удаление позиций и
+корзин и одно событие carts_abandoned на всю пачку. Очистка идет в каждом шарде отдельно.
+"""
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, outbox, shards
+from .cache import cart_cache
+from .sweeper import Sweeper
+
+CART_ABANDONED_AFTER_DAYS = float(os.getenv("CART_ABANDONED_AFTER_DAYS", "30"))
+
+
+async def delete_abandoned_carts(db: AsyncSession, batch_size: int, now: datetime,
+                                 abandoned_after_days: float = CART_ABANDONED_AFTER_DAYS) -> int:
+    """Удалить одну пачку брошенных корзин; вернуть число удаленных корзин"""
+    cutoff = now - timedelta(days=abandoned_after_days)
+    cart_ids = (await db.execute(
+        select(models.Cart.id)
+        .where(models.Cart.updated_at < cutoff)
+        .order_by(models.Cart.updated_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    if not cart_ids:
+        await db.rollback()
+        return 0
+
+    await db.execute(delete(models.CartItem).where(models.CartItem.cart_id.in_(cart_ids)))
+    deleted = (await db.execute(
+        delete(models.Cart).where(models.Cart.id.in_(cart_ids)).returning(models.Cart.id, models.Cart.user_id)
+    )).all()
+    outbox.add_event(db, "carts_abandoned", {
+        "carts": [{"cart_id": str(row.id), "user_id": str(row.user_id)} for row in deleted],
+        "removed_at": now.isoformat()
+    })
+    await db.commit()
+    outbox.relay.notify()
+
+    for row in deleted:
+        await cart_cache.invalidate(row.user_id)
+    return len(deleted)
+
+
+def sweeper_name(shard: str) -> str:
+    return "abandoned_carts" if shard == shards.DEFAULT_SHARD else f"abandoned_carts@{shard}"
+
+
+# У каждого шарда своя очистка: пачка - транзакция в одной базе
+abandoned_carts_sweepers = [
+    Sweeper(sweeper_name(shard.name), delete_abandoned_carts, session_factory=shard.session_factory)
+    for shard in shards.router.shards.values()
+]
@@ -1,32 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from uuid import UUID
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import case, select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID, uuid4
 from datetime import datetime
-import asyncio
-from . import models, schemas, database, rabbitmq
+from typing import Optional
+from . import models, schemas, database, outbox, totals, shards, replicas
+from .eligibility import check_eligibility, PrescriptionRequired
+from .cache import cart_cache
+from .serialization import respond
+from .catalog import catalog, Product
+from .models import MAX_ITEM_QUANTITY
+
+CART_BATCH_MAX_ITEMS = int(os.getenv("CART_BATCH_MAX_ITEMS", "100"))
 
 router = APIRouter()
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
+async def get_db(user_id: UUID = Query(...)):
+    """Сессия шарда, которому принадлежит корзина пользователя"""
+    shard = await shards.router.resolve(user_id)
+    async with shard.session_factory() as db:
+        yield db
+
+
+async def get_read_db(request: Request, user_id: UUID = Query(...)):
+    """Сессия для чтения в шарде пользователя: реплика, если клиент не писал в последние READ_YOUR_WRITES_SECONDS"""
+    shard = await shards.router.resolve(user_id)
+    async with shard.reads.session(replicas.read_token(request)) as db:
         yield db
-    finally:
-        db.close()
 
 
-# Mock data for products (в реальной системе это был бы отдельный сервис каталога)
-PRODUCTS_DATA = {
-    "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0": {"name": "Аспирин", "price": 150.00},
-    "a1b2c3d4-e5f6-47a8-9b0c-1d2e3f4a5b6c": {"name": "Ношпа", "price": 280.00},
-    "b2c3d4e5-f6g7-48b9-9c0d-2e3f4a5b6c7d": {"name": "Парацетамол", "price": 90.00},
-    "c3d4e5f6-g7h8-49c0-0d1e-3f4a5b6c7d8e": {"name": "Ибупрофен", "price": 120.00}
-}
+def cart_item_content(item, total_price: float) -> dict:
+    """Позиция корзины в форме schemas.CartItemResponse"""
+    return {
+        "id": item.id,
+        "product_id": item.product_id,
+        "name": item.name,
+        "quantity": item.quantity,
+        "price": item.price,
+        "total_price": total_price,
+        "added_at": item.added_at
+    }
+
+
+def build_cart_response(user_id: UUID, cart_items) -> dict:
+    """Сборка ответа с корзиной и общей стоимостью в форме schemas.CartResponse"""
+    items = []
+    total_price = 0.0
+
+    for item in cart_items:
+        item_total = item.price * item.quantity
+        items.append(cart_item_content(item, item_total))
+        total_price += item_total
+
+    return {
+        "user_id": user_id,
+        "items": items,
+        "total_price": round(total_price, 2)
+    }
 
 
 @router.post("/cart/items", response_model=schemas.CartItemResponse)
-def add_to_cart(item: schemas.CartItemCreate, user_id: UUID = Query(...), db: Session = Depends(get_db)):
+async def add_to_cart(item: schemas.CartItemCreate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
     """Добавить товар в корзину"""
 
     # Вложенные функции для бизнес-логики
@@ -34,16 +70,16 @@ def add_to_cart(item: schemas.CartItemCreate, user_id: UUID = Query(...), db: Se
         """Валидация количества товара"""
         if quantity <= 0:
             raise ValueError("Количество должно быть положительным")
-        if quantity > 10:
-            raise ValueError("Нельзя добавить более 10 единиц одного товара")
+        if quantity > MAX_ITEM_QUANTITY:
+            raise ValueError(f"Нельзя добавить более {MAX_ITEM_QUANTITY} единиц одного товара")
         return True
 
-    def get_product_info(product_id: UUID) -> dict:
+    def get_product_info(product_id: UUID) -> Product:
         """Получение информации о товаре"""
-        product_str = str(product_id)
-        if product_str not in PRODUCTS_DATA:
+        product = catalog.get(product_id)
+        if product is None:
             raise ValueError("Товар не найден в каталоге")
-        return PRODUCTS_DATA[product_str]
+        return product
 
     def calculate_total_price(price: float, quantity: int) -> float:
         """Расчет общей стоимости"""
@@ -53,68 +89,230 @@ def add_to_cart(item: schemas.CartItemCreate, user_id: UUID = Query(...), db: Se
     try:
         validate_quantity(item.quantity)
         product_info = get_product_info(item.product_id)
+        # Без рецепта отказываем сразу, не обращаясь к базе
+        check_eligibility(user_id, product_info, item.quantity)
+        now = datetime.utcnow()
 
-        # Находим или создаем корзину пользователя
-        cart = db.query(models.Cart).filter(models.Cart.user_id == user_id).first()
-        if not cart:
-            cart = models.Cart(user_id=user_id)
-            db.add(cart)
-            db.commit()
-            db.refresh(cart)
-
-        # Проверяем, есть ли уже этот товар в корзине
-        existing_item = db.query(models.CartItem).filter(
-            models.CartItem.cart_id == cart.id,
-            models.CartItem.product_id == item.product_id
-        ).first()
-
-        if existing_item:
-            # Обновляем количество
-            new_quantity = existing_item.quantity + item.quantity
-            validate_quantity(new_quantity)
-            existing_item.quantity = new_quantity
-            cart_item = existing_item
-        else:
-            # Добавляем новый товар
-            cart_item = models.CartItem(
-                cart_id=cart.id,
-                product_id=item.product_id,
-                name=product_info["name"],
-                quantity=item.quantity,
-                price=product_info["price"]
-            )
-            db.add(cart_item)
-
-        db.commit()
-        db.refresh(cart_item)
-
-        # Формируем ответ
-        response = schemas.CartItemResponse(
-            id=cart_item.id,
-            product_id=cart_item.product_id,
-            name=cart_item.name,
-            quantity=cart_item.quantity,
-            price=cart_item.price,
-            total_price=calculate_total_price(cart_item.price, cart_item.quantity),
-            added_at=cart_item.added_at
+        # Находим или создаем корзину пользователя одним атомарным upsert
+        cart_insert = database.dialect_insert(models.Cart).values(
+            id=uuid4(), user_id=user_id, created_at=now, updated_at=now
+        )
+        cart_id = (await db.execute(
+            cart_insert.on_conflict_do_update(
+                index_elements=[models.Cart.user_id],
+                set_={"updated_at": now}
+            ).returning(models.Cart.id)
+        )).scalar_one()
+
+        # Добавляем товар или увеличиваем количество; лимит проверяется внутри того же запроса,
+        # поэтому параллельные добавления не могут превысить его
+        item_insert = database.dialect_insert(models.CartItem).values(
+            id=uuid4(),
+            cart_id=cart_id,
+            product_id=item.product_id,
+            name=product_info.name,
+            quantity=item.quantity,
+            price=product_info.price,
+            added_at=now
         )
+        new_quantity = models.CartItem.quantity + item_insert.excluded.quantity
+        cart_item = (await db.execute(
+            item_insert.on_conflict_do_update(
+                index_elements=[models.CartItem.cart_id, models.CartItem.product_id],
+                set_={"quantity": new_quantity},
+                where=new_quantity <= MAX_ITEM_QUANTITY
+            ).returning(
+                models.CartItem.id,
+                models.CartItem.product_id,
+                models.CartItem.name,
+                models.CartItem.quantity,
+                models.CartItem.price,
+                models.CartItem.added_at
+            )
+        )).first()
+        if cart_item is None:
+            raise ValueError(f"Нельзя добавить более {MAX_ITEM_QUANTITY} единиц одного товара")
+        # Рецепт ограничивает итоговое количество в корзине, а не только добавляемое
+        check_eligibility(user_id, product_info, cart_item.quantity)
+
+        # Итоги корзины считаем по цене сохраненной позиции
+        await db.execute(totals.increment_totals(cart_id, item.quantity, cart_item.price * item.quantity))
+        await db.commit()
+        await cart_cache.invalidate(user_id)
+
+        return respond(cart_item_content(cart_item, calculate_total_price(cart_item.price, cart_item.quantity)))
+
+    except PrescriptionRequired as e:
+        await db.rollback()
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-        return response
+@router.post("/cart/items:batch", response_model=schemas.CartResponse)
+async def batch_update_cart(batch: schemas.CartBatchRequest, user_id: UUID = Query(...),
+                            db: AsyncSession = Depends(get_db)):
+    """Применить пачку изменений корзины в одной транзакции"""
+
+    def validate_operation(index: int, operation: schemas.CartBatchItem):
+        """Проверка одной операции до обращения к базе"""
+        if operation.op == schemas.CartBatchOperation.REMOVE:
+            return
+        if operation.product_id not in products:
+            raise ValueError(f"Операция {index}: товар не найден в каталоге")
+        if operation.quantity <= 0:
+            raise ValueError(f"Операция {index}: количество должно быть положительным")
+
+    def apply_operations(current: dict) -> dict:
+        """Итоговое количество по каждому товару; None - позиция удаляется"""
+        result = dict(current)
+        for index, operation in enumerate(batch.items):
+            if operation.op == schemas.CartBatchOperation.REMOVE:
+                result[operation.product_id] = None
+            elif operation.op == schemas.CartBatchOperation.SET:
+                result[operation.product_id] = operation.quantity
+            else:
+                result[operation.product_id] = (result.get(operation.product_id) or 0) + operation.quantity
+            if (result[operation.product_id] or 0) > MAX_ITEM_QUANTITY:
+                raise ValueError(
+                    f"Операция {index}: нельзя добавить более {MAX_ITEM_QUANTITY} единиц одного товара"
+                )
+        return result
 
+    try:
+        # До upsert корзины: пустая или слишком большая пачка не должна создавать корзину
+        if not batch.items:
+            raise ValueError("Пачка не содержит операций")
+        if len(batch.items) > CART_BATCH_MAX_ITEMS:
+            raise ValueError(f"В пачке не может быть более {CART_BATCH_MAX_ITEMS} операций")
+        product_ids = {operation.product_id for operation in batch.items}
+        products = catalog.get_many(product_ids)
+        for index, operation in enumerate(batch.items):
+            validate_operation(index, operation)
+        now = datetime.utcnow()
+
+        cart_insert = database.dialect_insert(models.Cart).values(
+            id=uuid4(), user_id=user_id, created_at=now, updated_at=now
+        )
+        cart_id = (await db.execute(
+            cart_insert.on_conflict_do_update(
+                index_elements=[models.Cart.user_id],
+                set_={"updated_at": now}
+            ).returning(models.Cart.id)
+        )).scalar_one()
+
+        # Текущие количества затронутых товаров блокируем до конца транзакции
+        current = dict((await db.execute(
+            select(models.CartItem.product_id, models.CartItem.quantity)
+            .where(models.CartItem.cart_id == cart_id, models.CartItem.product_id.in_(product_ids))
+            .with_for_update()
+        )).all()) if product_ids else {}
+        final = apply_operations(current)
+        for product_id, quantity in final.items():
+            # Уменьшать количество рецептурного товара можно всегда
+            if quantity is not None and quantity > (current.get(product_id) or 0):
+                check_eligibility(user_id, products[product_id], quantity)
+
+        removed = [product_id for product_id, quantity in final.items() if quantity is None and product_id in current]
+        if removed:
+            await db.execute(delete(models.CartItem).where(
+                models.CartItem.cart_id == cart_id, models.CartItem.product_id.in_(removed)
+            ))
+
+        def item_row(product_id, quantity):
+            return {
+                "id": uuid4(),
+                "cart_id": cart_id,
+                "product_id": product_id,
+                "name": products[product_id].name,
+                "quantity": quantity,
+                "price": products[product_id].price,
+                "added_at": now
+            }
+
+        # Новый товар, который пачка только добавляет, мог вставить параллельный запрос
+        # после нашего SELECT: его количество складываем, как в add_to_cart, а не перезаписываем
+        additive = {
+            operation.product_id for operation in batch.items
+            if operation.product_id not in current and final.get(operation.product_id) is not None
+        } - {operation.product_id for operation in batch.items if operation.op != schemas.CartBatchOperation.ADD}
+        upserts = [
+            item_row(product_id, quantity) for product_id, quantity in final.items()
+            if quantity is not None and quantity != current.get(product_id)
+        ]
+        if upserts:
+            items_insert = database.dialect_insert(models.CartItem).values(upserts)
+            new_quantity = items_insert.excluded.quantity
+            if additive:
+                new_quantity = case(
+                    (models.CartItem.product_id.in_(additive), models.CartItem.quantity + new_quantity),
+                    else_=new_quantity
+                )
+            written = dict((await db.execute(
+                items_insert.on_conflict_do_update(
+                    index_elements=[models.CartItem.cart_id, models.CartItem.product_id],
+                    set_={"quantity": new_quantity},
+                    where=new_quantity <= MAX_ITEM_QUANTITY
+                ).returning(models.CartItem.product_id, models.CartItem.quantity)
+            )).all())
+            if len(written) < len(upserts):
+                raise ValueError(f"Нельзя добавить более {MAX_ITEM_QUANTITY} единиц одного товара")
+            for product_id in additive:
+                if written[product_id] > final[product_id]:
+                    check_eligibility(user_id, products[product_id], written[product_id])
+        if removed or upserts:
+            await db.execute(totals.recompute_totals([cart_id]))
+
+        cart_items = (await db.execute(
+            select(models.CartItem).where(models.CartItem.cart_id == cart_id)
+        )).scalars().all()
+        await db.commit()
+        await cart_cache.invalidate(user_id)
+
+        return respond(build_cart_response(user_id, cart_items))
+
+    except PrescriptionRequired as e:
+        await db.rollback()
+        raise HTTPException(status_code=403, detail=str(e))
     except ValueError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def delete_cart_item(db: AsyncSession, item_id: UUID) -> Optional[UUID]:
+    """Удалить позицию и уменьшить итоги корзины; вернуть user_id корзины или None, если позиции нет"""
+    # DELETE ... RETURNING вместо чтения позиции перед удалением
+    deleted = (await db.execute(
+        delete(models.CartItem)
+        .where(models.CartItem.id == item_id)
+        .returning(models.CartItem.cart_id, models.CartItem.quantity, models.CartItem.price)
+    )).first()
+    if not deleted:
+        return None
+
+    user_id = (await db.execute(
+        totals.increment_totals(deleted.cart_id, -deleted.quantity, -deleted.price * deleted.quantity)
+        .returning(models.Cart.user_id)
+    )).scalar_one()
+    await db.commit()
+    return user_id
+
+
 @router.delete("/cart/items/{item_id}")
-def remove_from_cart(item_id: UUID, db: Session = Depends(get_db)):
+async def remove_from_cart(item_id: UUID, user_id: Optional[UUID] = Query(None)):
     """Удалить товар из корзины"""
-    cart_item = db.query(models.CartItem).filter(models.CartItem.id == item_id).first()
-    if not cart_item:
+    # Без user_id шард позиции неизвестен: ищем по всем шардам
+    candidates = [await shards.router.resolve(user_id)] if user_id else list(shards.router.shards.values())
+    owner = None
+    for shard in candidates:
+        async with shard.session_factory() as db:
+            owner = await delete_cart_item(db, item_id)
+        if owner is not None:
+            break
+    if owner is None:
         raise HTTPException(status_code=404, detail="Товар не найден в корзине")
-
-    db.delete(cart_item)
-    db.commit()
+    await cart_cache.invalidate(owner)
 
     return {
         "message": "Товар удален из корзины",
@@ -123,54 +321,74 @@ def remove_from_cart(item_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.delete("/cart/clear")
-def clear_cart(user_id: UUID = Query(...), db: Session = Depends(get_db)):
+async def clear_cart(user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
     """Очистить корзину"""
-    cart = db.query(models.Cart).filter(models.Cart.user_id == user_id).first()
-    if not cart:
+    # Обнуляем итоги и получаем id корзины одним UPDATE ... RETURNING
+    cart_id = (await db.execute(
+        update(models.Cart)
+        .where(models.Cart.user_id == user_id)
+        .values(item_count=0, total_price=0.0)
+        .returning(models.Cart.id)
+        .execution_options(synchronize_session=False)
+    )).scalar()
+    if cart_id is None:
         raise HTTPException(status_code=404, detail="Корзина не найдена")
 
-    # Удаляем все товары из корзины
-    db.query(models.CartItem).filter(models.CartItem.cart_id == cart.id).delete()
-    db.commit()
+    cleared_at = datetime.utcnow()
 
-    # Отправляем сообщение о очистке корзины
-    asyncio.create_task(rabbitmq.send_cart_cleared_message({
+    # Удаляем все товары из корзины и в той же транзакции записываем событие в outbox
+    await db.execute(delete(models.CartItem).where(models.CartItem.cart_id == cart_id))
+    outbox.add_event(db, "cart_cleared", {
         "user_id": str(user_id),
-        "cleared_at": datetime.utcnow().isoformat()
-    }))
+        "cleared_at": cleared_at.isoformat()
+    })
+    await db.commit()
+    await cart_cache.invalidate(user_id)
+    outbox.relay.notify()
 
     return {
         "message": "Корзина очищена",
-        "cleared_at": datetime.utcnow()
+        "cleared_at": cleared_at
     }
 
 
 @router.get("/cart", response_model=schemas.CartResponse)
-def get_cart(user_id: UUID = Query(...), db: Session = Depends(get_db)):
+async def get_cart(user_id: UUID = Query(...), db: AsyncSession = Depends(get_read_db)):
     """Просмотреть корзину"""
-    cart = db.query(models.Cart).filter(models.Cart.user_id == user_id).first()
-    if not cart:
-        # Возвращаем пустую корзину
-        return schemas.CartResponse(user_id=user_id, items=[], total_price=0.0)
-
-    items = []
-    total_price = 0.0
-
-    for item in cart.items:
-        item_total = item.price * item.quantity
-        items.append(schemas.CartItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            name=item.name,
-            quantity=item.quantity,
-            price=item.price,
-            total_price=item_total,
-            added_at=item.added_at
-        ))
-        total_price += item_total
-
-    return schemas.CartResponse(
-        user_id=user_id,
-        items=items,
-        total_price=round(total_price, 2)
-    )
\ No newline at end of file
+    # Клиент, который только что писал, читает основную базу и не должен получить ответ реплики
+    primary = db.info["primary"]
+    cached = await cart_cache.get(user_id, allow_replica=not primary)
+    if cached is not None:
+        return respond(cached)
+
+    # Токен берем до чтения из базы: если корзину изменят параллельно, ответ не попадет в кэш
+    token = await cart_cache.begin_read(user_id)
+
+    # Один запрос: позиции через join с корзиной. Нет корзины или она пуста - ответ одинаковый
+    cart_items = (await db.execute(
+        select(models.CartItem)
+        .join(models.Cart, models.CartItem.cart_id == models.Cart.id)
+        .where(models.Cart.user_id == user_id)
+    )).scalars().all()
+    response = build_cart_response(user_id, cart_items)
+
+    # Ответ отстающей реплики может пережить инвалидацию после записи, поэтому
+    # кэшируется только на CART_REPLICA_CACHE_TTL
+    await cart_cache.set(user_id, response, token, from_replica=not primary)
+    return respond(response)
+
+
+@router.get("/cart/summary", response_model=schemas.CartSummaryResponse)
+async def get_cart_summary(user_id: UUID = Query(...), db: AsyncSession = Depends(get_read_db)):
+    """Число товаров и сумма корзины без загрузки позиций"""
+    row = (await db.execute(
+        select(models.Cart.item_count, models.Cart.total_price).where(models.Cart.user_id == user_id)
+    )).first()
+    if not row:
+        return respond({"user_id": user_id, "item_count": 0, "total_price": 0.0})
+
+    return respond({
+        "user_id": user_id,
+        "item_count": row.item_count,
+        "total_price": round(row.total_price, 2)
+    })
\ No newline at end of file
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
 from typing import List, Optional
+from enum import Enum
 
 
 class CartItemBase(BaseModel):
@@ -13,6 +14,22 @@ class CartItemCreate(CartItemBase):
     pass
 
 
+class CartBatchOperation(str, Enum):
+    ADD = "add"
+    SET = "set"
+    REMOVE = "remove"
+
+
+class CartBatchItem(BaseModel):
+    op: CartBatchOperation = CartBatchOperation.ADD
+    product_id: UUID
+    quantity: int = 0
+
+
+class CartBatchRequest(BaseModel):
+    items: List[CartBatchItem]
+
+
 class CartItemResponse(BaseModel):
     id: UUID
     product_id: UUID
@@ -35,6 +52,12 @@ class CartResponse(BaseModel):
         from_attributes = True
 
 
+class CartSummaryResponse(BaseModel):
+    user_id: UUID
+    item_count: int
+    total_price: float
+
+
 class ClearCartResponse(BaseModel):
     message: str = "Корзина очищена"
     cleared_at: datetime
\ No newline at end of file
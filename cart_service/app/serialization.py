@@ -0,0 +1,30 @@
+"""Быстрая сериализация ответов: строки из базы сразу в JSON-байты через orjson.
+
+Раньше маршрут собирал Pydantic-модель вручную, а FastAPI еще раз валидировал
+ее через response_model и сериализовал - на больших корзинах и рецептах это
+основная доля CPU. Теперь маршрут собирает словарь из уже проверенных базой
+значений, а respond отдает его готовым Response: response_model остается для
+OpenAPI, соответствие схеме проверяется в тестах (tests/unit/test_serialization.py).
+Замер - benchmarks/bench_serialization.py. Отключение: FAST_SERIALIZATION=0,
+тогда словарь один раз проходит через response_model.
+"""
+import os
+import orjson
+from fastapi import Response
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1") != "0"
+
+
+class JSONBytesResponse(Response):
+    """JSON-ответ через orjson: UUID, datetime и Enum сериализуются без jsonable_encoder"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def respond(content, status_code: int = 200):
+    """Ответ маршрута: в быстром режиме сразу байты, иначе словарь для проверки через response_model"""
+    if FAST_SERIALIZATION:
+        return JSONBytesResponse(content, status_code=status_code)
+    return content
@@ -0,0 +1,183 @@
+"""Шардирование корзин по user_id между несколькими базами.
+
+Владелец корзины выбирается консистентным хешированием user_id по кольцу шардов
+с виртуальными узлами: при добавлении шарда переезжает примерно 1/N корзин.
+
+    CART_SHARDS="s0=postgresql://...,s1=postgresql://..."   # по умолчанию один шард DATABASE_URL
+    CART_SHARDS="s0=postgresql://primary0|postgresql://replica0,..."  # реплики шарда для чтения через |
+    CART_SHARDS_PREVIOUS="s0"                                # имена шардов прежнего кольца на время решардинга
+
+Во время решардинга маршрут сначала переносит корзину пользователя со старого
+шарда (move_cart), а фоновый перенос остальных делает app.reshard.
+"""
+import bisect
+import hashlib
+import os
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import create_engine, select, delete, case
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from . import models, database, totals, replicas
+
+CART_SHARDS = os.getenv("CART_SHARDS", "")
+CART_SHARDS_PREVIOUS = os.getenv("CART_SHARDS_PREVIOUS", "")
+CART_SHARD_VNODES = int(os.getenv("CART_SHARD_VNODES", "128"))
+DEFAULT_SHARD = "default"
+
+
+def parse_shards(value: str) -> dict:
+    """'s0=url0,s1=url1' -> {'s0': 'url0', 's1': 'url1'}; пустая строка - один шард DATABASE_URL
+    с репликами из DATABASE_REPLICA_URLS"""
+    if not value.strip():
+        return {DEFAULT_SHARD: "|".join([database.DATABASE_URL] + replicas.parse_urls(replicas.DATABASE_REPLICA_URLS))}
+    result = {}
+    for entry in value.split(","):
+        name, separator, url = entry.strip().partition("=")
+        if not separator or not name or not url:
+            raise ValueError(f"Некорректное описание шарда: {entry}")
+        if name in result:
+            raise ValueError(f"Шард {name} указан дважды")
+        result[name] = url
+    return result
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Кольцо консистентного хеширования с виртуальными узлами"""
+
+    def __init__(self, nodes, vnodes: int = CART_SHARD_VNODES):
+        if not nodes:
+            raise ValueError("Кольцо шардов не может быть пустым")
+        points = sorted((_hash(f"{node}#{i}".encode()), node) for node in nodes for i in range(vnodes))
+        self.nodes = list(nodes)
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: UUID) -> str:
+        index = bisect.bisect(self._keys, _hash(key.bytes)) % len(self._keys)
+        return self._nodes[index]
+
+
+class Shard:
+    """База одного шарда и ее реплики для чтения; шард с DATABASE_URL использует движки из database"""
+
+    def __init__(self, name: str, url: str):
+        url, *replica_urls = url.split("|")
+        self.name = name
+        self.url = url
+        if url == database.DATABASE_URL:
+            self.engine = database.engine
+            self.async_engine = database.async_engine
+            self.session_factory = database.AsyncSessionLocal
+        else:
+            self.engine = create_engine(url)
+            self.async_engine = create_async_engine(database.to_async_url(url))
+            self.session_factory = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.sync_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.reads = replicas.ReplicaSet(self.session_factory, replica_urls)
+
+
+class ShardRouter:
+    """Выбор шарда по user_id по текущему кольцу и, во время решардинга, по прежнему"""
+
+    def __init__(self, urls: dict, previous=None, vnodes: int = CART_SHARD_VNODES):
+        self.shards = {name: Shard(name, url) for name, url in urls.items()}
+        self.ring = HashRing(list(self.shards), vnodes)
+        self.previous_ring = None
+        if previous:
+            unknown = set(previous) - set(self.shards)
+            if unknown:
+                raise ValueError(f"Шарды прежнего кольца не описаны в CART_SHARDS: {', '.join(sorted(unknown))}")
+            self.previous_ring = HashRing(list(previous), vnodes)
+
+    def shard_for(self, user_id: UUID) -> Shard:
+        return self.shards[self.ring.node_for(user_id)]
+
+    def previous_shard_for(self, user_id: UUID) -> Optional[Shard]:
+        if self.previous_ring is None:
+            return None
+        return self.shards[self.previous_ring.node_for(user_id)]
+
+    async def resolve(self, user_id: UUID) -> Shard:
+        """Шард для запроса пользователя. Во время решардинга корзина сначала переносится
+        к новому владельцу, поэтому запись никогда не идет мимо уже перенесенных данных.
+        Блокировка и перенос - только если корзина еще на прежнем шарде: обычный запрос
+        (и чтение, и уже перенесенная корзина) обходится одним SELECT без FOR UPDATE"""
+        shard = self.shard_for(user_id)
+        previous = self.previous_shard_for(user_id)
+        if previous is not None and previous is not shard and await has_cart(previous, user_id):
+            await move_cart(previous, shard, user_id)
+        return shard
+
+
+async def has_cart(shard: Shard, user_id: UUID) -> bool:
+    """Есть ли корзина пользователя в основной базе шарда (реплика могла бы отстать)"""
+    async with shard.session_factory() as db:
+        return (await db.execute(
+            select(models.Cart.id).where(models.Cart.user_id == user_id)
+        )).first() is not None
+
+
+async def move_cart(source: Shard, target: Shard, user_id: UUID) -> bool:
+    """Перенести корзину пользователя с source на target; False, если на source корзины нет.
+
+    Корзина на source заблокирована до конца переноса. Сначала фиксируется копия
+    на target, затем удаление на source, поэтому после сбоя между ними повтор
+    безопасен: позиция с тем же id перезаписывается, а не складывается. Если на
+    target уже есть корзина (запись от реплики с новой конфигурацией), позиции
+    объединяются сложением количеств, но не больше MAX_ITEM_QUANTITY.
+    """
+    async with source.session_factory() as src:
+        cart = (await src.execute(
+            select(models.Cart).where(models.Cart.user_id == user_id).with_for_update()
+        )).scalars().first()
+        if cart is None:
+            await src.rollback()
+            return False
+        items = (await src.execute(
+            select(models.CartItem).where(models.CartItem.cart_id == cart.id)
+        )).scalars().all()
+
+        async with target.session_factory() as dst:
+            cart_insert = database.dialect_insert(models.Cart, target.async_engine).values(
+                id=cart.id, user_id=cart.user_id, created_at=cart.created_at, updated_at=cart.updated_at
+            )
+            target_cart_id = (await dst.execute(
+                cart_insert.on_conflict_do_update(
+                    index_elements=[models.Cart.user_id],
+                    set_={"updated_at": cart.updated_at}
+                ).returning(models.Cart.id)
+            )).scalar_one()
+            if items:
+                items_insert = database.dialect_insert(models.CartItem, target.async_engine).values([
+                    {"id": item.id, "cart_id": target_cart_id, "product_id": item.product_id, "name": item.name,
+                     "quantity": item.quantity, "price": item.price, "added_at": item.added_at}
+                    for item in items
+                ])
+                merged = models.CartItem.quantity + items_insert.excluded.quantity
+                await dst.execute(items_insert.on_conflict_do_update(
+                    index_elements=[models.CartItem.cart_id, models.CartItem.product_id],
+                    set_={"quantity": case(
+                        (models.CartItem.id == items_insert.excluded.id, items_insert.excluded.quantity),
+                        (merged > models.MAX_ITEM_QUANTITY, models.MAX_ITEM_QUANTITY),
+                        else_=merged
+                    )}
+                ))
+            await dst.execute(totals.recompute_totals([target_cart_id]))
+            await dst.commit()
+
+        await src.execute(delete(models.CartItem).where(models.CartItem.cart_id == cart.id))
+        await src.execute(delete(models.Cart).where(models.Cart.id == cart.id))
+        await src.commit()
+    return True
+
+
+def _previous_names(value: str) -> list:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+router = ShardRouter(parse_shards(CART_SHARDS), _previous_names(CART_SHARDS_PREVIOUS))
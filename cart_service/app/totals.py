@@ -0,0 +1,91 @@
+"""Денормализованные итоги корзины (item_count, total_price) и их проверка.
+
+    python -m app.totals check     # вывести корзины с расхождениями во всех шардах CART_SHARDS
+    python -m app.totals rebuild   # пересчитать итоги всех корзин всех шардов пачками
+"""
+import os
+import sys
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from . import models
+
+TOTALS_BATCH_SIZE = int(os.getenv("TOTALS_BATCH_SIZE", "1000"))
+PRICE_TOLERANCE = 0.005
+
+
+def actual_item_count():
+    return select(func.coalesce(func.sum(models.CartItem.quantity), 0)).where(
+        models.CartItem.cart_id == models.Cart.id
+    ).scalar_subquery()
+
+
+def actual_total_price():
+    return select(func.coalesce(func.sum(models.CartItem.price * models.CartItem.quantity), 0.0)).where(
+        models.CartItem.cart_id == models.Cart.id
+    ).scalar_subquery()
+
+
+def increment_totals(cart_id, quantity: int, amount: float):
+    """UPDATE с приращением итогов для одной корзины"""
+    return (
+        update(models.Cart)
+        .where(models.Cart.id == cart_id)
+        .values(item_count=models.Cart.item_count + quantity, total_price=models.Cart.total_price + amount)
+    )
+
+
+def recompute_totals(cart_ids=None):
+    """Один UPDATE, пересчитывающий итоги по позициям для указанных (или всех) корзин"""
+    statement = update(models.Cart).values(item_count=actual_item_count(), total_price=actual_total_price())
+    if cart_ids is not None:
+        statement = statement.where(models.Cart.id.in_(cart_ids))
+    return statement.execution_options(synchronize_session=False)
+
+
+def find_inconsistent_carts(db: Session, limit: int = 100) -> list:
+    """Корзины, у которых сохраненные итоги расходятся с позициями"""
+    item_count = actual_item_count()
+    total_price = actual_total_price()
+    return db.execute(
+        select(models.Cart.id, models.Cart.item_count, item_count, models.Cart.total_price, total_price)
+        .where((models.Cart.item_count != item_count)
+               | (func.abs(models.Cart.total_price - total_price) > PRICE_TOLERANCE))
+        .limit(limit)
+    ).all()
+
+
+def rebuild_all_totals(db: Session, batch_size: int = TOTALS_BATCH_SIZE) -> int:
+    """Пересчитать итоги всех корзин пачками по id, каждая пачка - отдельная короткая транзакция"""
+    rebuilt = 0
+    last_id = None
+    while True:
+        query = select(models.Cart.id).order_by(models.Cart.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(models.Cart.id > last_id)
+        cart_ids = db.execute(query).scalars().all()
+        if not cart_ids:
+            return rebuilt
+        db.execute(recompute_totals(cart_ids))
+        db.commit()
+        rebuilt += len(cart_ids)
+        last_id = cart_ids[-1]
+
+
+if __name__ == "__main__":
+    # Импорт здесь: shards сам использует totals
+    from .shards import router
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command not in ("check", "rebuild"):
+        print("Usage: python -m app.totals [check|rebuild]")
+        sys.exit(2)
+    inconsistent = False
+    for name, shard in router.shards.items():
+        with shard.sync_session_factory() as session:
+            if command == "rebuild":
+                print(f"{name}: rebuilt totals for {rebuild_all_totals(session)} carts")
+            else:
+                rows = find_inconsistent_carts(session)
+                for row in rows:
+                    print(f"{name}: {row[0]}: item_count {row[1]} != {row[2]} or total_price {row[3]} != {row[4]}")
+                inconsistent = inconsistent or bool(rows)
+    sys.exit(1 if inconsistent else 0)
@@ -0,0 +1,47 @@
+import contextlib
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "cart_test.db"))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from cart_service.app import database, models
+
+
+@pytest.fixture
+def db_session():
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    yield db
+    db.close()
+    models.Base.metadata.drop_all(bind=database.engine)
+
+
+@pytest.fixture
+def client(db_session):
+    from cart_service.app.main import app
+    # Без контекстного менеджера: события startup (подключение к RabbitMQ) не запускаются
+    return TestClient(app)
+
+
+@pytest.fixture
+def count_queries():
+    """Контекстный менеджер, собирающий SQL-запросы асинхронного движка (которым пользуются маршруты)"""
+
+    @contextlib.contextmanager
+    def recorder():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        sync_engine = database.async_engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    return recorder
@@ -0,0 +1,117 @@
+import asyncio
+from uuid import uuid4
+from cart_service.app.cache import LRUCartCache, cart_cache
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used_and_expires_by_ttl():
+    clock = FakeClock()
+    cache = LRUCartCache(maxsize=2, ttl=10, clock=clock)
+
+    async def scenario():
+        for key in ("a", "b"):
+            await cache.set(key, key.upper(), await cache.begin_read(key))
+        assert await cache.get("a") == "A"
+        await cache.set("c", "C", await cache.begin_read("c"))
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "A"
+
+        clock.now = 11
+        assert await cache.get("a") is None
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_replica_entries_expire_early_and_are_hidden_from_fresh_readers():
+    clock = FakeClock()
+    cache = LRUCartCache(maxsize=2, ttl=10, replica_ttl=2, clock=clock)
+
+    async def scenario():
+        await cache.set("a", "A", await cache.begin_read("a"), from_replica=True)
+        assert await cache.get("a") == "A"
+        assert await cache.get("a", allow_replica=False) is None
+        clock.now = 3
+        assert await cache.get("a") is None
+        # Ответ основной базы заменяет ответ реплики
+        await cache.set("a", "B", await cache.begin_read("a"), from_replica=True)
+        await cache.set("a", "C", await cache.begin_read("a"))
+        assert await cache.get("a", allow_replica=False) == "C"
+        disabled = LRUCartCache(replica_ttl=0)
+        assert not await disabled.set("a", "A", await disabled.begin_read("a"), from_replica=True)
+
+    asyncio.run(scenario())
+    assert cache.stats()["replica_hits"] == 1
+
+
+def test_set_is_skipped_when_key_was_invalidated_during_read():
+    cache = LRUCartCache(maxsize=2)
+
+    async def scenario():
+        token = await cache.begin_read("user")
+        await cache.invalidate("user")
+        assert await cache.set("user", "stale", token) is False
+        assert await cache.get("user") is None
+
+        # Метка инвалидации вытеснена, но запоздавший set все равно отсекается
+        token = await cache.begin_read("user")
+        await cache.invalidate("user")
+        for key in ("x", "y"):
+            await cache.set(key, key, await cache.begin_read(key))
+        assert await cache.set("user", "stale", token) is False
+
+    asyncio.run(scenario())
+
+
+def test_reads_after_writes_are_never_stale(client):
+    user_id = str(uuid4())
+
+    def cart():
+        return client.get(f"/api/cart?user_id={user_id}").json()
+
+    assert cart()["items"] == []
+    item_id = client.post(
+        f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1}
+    ).json()["id"]
+    assert [item["quantity"] for item in cart()["items"]] == [1]
+    assert [item["quantity"] for item in cart()["items"]] == [1]
+
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2})
+    assert [item["quantity"] for item in cart()["items"]] == [3]
+
+    client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "set", "product_id": PRODUCT_ID, "quantity": 5}
+    ]})
+    assert [item["quantity"] for item in cart()["items"]] == [5]
+
+    client.delete(f"/api/cart/items/{item_id}")
+    assert cart()["items"] == []
+
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+    cart()
+    client.delete(f"/api/cart/clear?user_id={user_id}")
+    assert cart()["items"] == []
+
+
+def test_repeated_reads_are_served_from_cache(client):
+    user_id = str(uuid4())
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+
+    hits_before = cart_cache.stats()["hits"]
+    for _ in range(3):
+        client.get(f"/api/cart?user_id={user_id}")
+    assert cart_cache.stats()["hits"] - hits_before == 2
+    assert client.get("/stats/cache").json()["hits"] >= 2
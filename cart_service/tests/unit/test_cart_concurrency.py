@@ -0,0 +1,87 @@
+import asyncio
+from uuid import UUID, uuid4
+import httpx
+from sqlalchemy import event
+from cart_service.app import database, models
+from cart_service.app.main import app
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+async def _parallel_adds(user_id: str, count: int, quantity: int = 1) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": quantity})
+            for _ in range(count)
+        ))
+    return [response.status_code for response in responses]
+
+
+async def _parallel_batches(user_id: str, count: int, quantity: int = 1) -> list:
+    transport = httpx.ASGITransport(app=app)
+    batch = {"items": [{"op": "add", "product_id": PRODUCT_ID, "quantity": quantity}]}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post(f"/api/cart/items:batch?user_id={user_id}", json=batch) for _ in range(count)
+        ))
+    return [response.status_code for response in responses]
+
+
+def test_parallel_adds_create_single_cart_and_item(db_session):
+    user_id = str(uuid4())
+
+    statuses = asyncio.run(_parallel_adds(user_id, 8))
+
+    assert statuses == [200] * 8
+    assert db_session.query(models.Cart).count() == 1
+    items = db_session.query(models.CartItem).all()
+    assert len(items) == 1
+    assert items[0].quantity == 8
+
+
+def test_parallel_adds_never_exceed_quantity_limit(db_session):
+    user_id = str(uuid4())
+
+    statuses = asyncio.run(_parallel_adds(user_id, 7, quantity=2))
+
+    assert statuses.count(200) == 5
+    assert statuses.count(400) == 2
+    assert db_session.query(models.CartItem).one().quantity == 10
+
+
+def test_parallel_batches_adding_new_product_sum_quantities(db_session):
+    user_id = str(uuid4())
+
+    statuses = asyncio.run(_parallel_batches(user_id, 6))
+
+    assert statuses == [200] * 6
+    assert db_session.query(models.CartItem).one().quantity == 6
+
+
+def test_batch_add_keeps_row_inserted_by_concurrent_request(client, db_session):
+    """Позиция появилась между SELECT ... FOR UPDATE пачки и ее upsert: количества складываются"""
+    user_id = uuid4()
+    sync_engine = database.async_engine.sync_engine
+    inserted = []
+
+    # SQLite сериализует записи, поэтому чужую вставку выполняем прямо перед upsert пачки
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO cart_items") and not inserted:
+            inserted.append(statement)
+            cursor.execute(
+                "INSERT INTO cart_items (id, cart_id, product_id, name, quantity, price) "
+                "SELECT ?, id, ?, 'Аспирин', 3, 150.0 FROM carts WHERE user_id = ?",
+                (uuid4().hex, UUID(PRODUCT_ID).hex, user_id.hex)
+            )
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.post(f"/api/cart/items:batch?user_id={user_id}",
+                               json={"items": [{"op": "add", "product_id": PRODUCT_ID, "quantity": 2}]})
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200
+    assert response.json()["items"][0]["quantity"] == 5
+    assert db_session.query(models.Cart).one().item_count == 5
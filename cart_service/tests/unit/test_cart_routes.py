@@ -0,0 +1,100 @@
+from uuid import uuid4
+from cart_service.app import models, routes
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+def test_add_and_get_cart(client):
+    user_id = str(uuid4())
+    response = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2})
+    assert response.status_code == 200
+    assert response.json()["total_price"] == 300.0
+
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+
+    cart = client.get(f"/api/cart?user_id={user_id}").json()
+    assert cart["user_id"] == user_id
+    assert len(cart["items"]) == 1
+    assert cart["items"][0]["quantity"] == 3
+    assert cart["total_price"] == 450.0
+
+
+def test_add_rejects_unknown_product_and_quantity_limit(client):
+    user_id = str(uuid4())
+    response = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": str(uuid4()), "quantity": 1})
+    assert response.status_code == 400
+
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 8})
+    response = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 3})
+    assert response.status_code == 400
+
+
+def test_remove_and_clear_cart(client, db_session):
+    user_id = str(uuid4())
+    item_id = client.post(
+        f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1}
+    ).json()["id"]
+
+    assert client.delete(f"/api/cart/items/{item_id}").status_code == 200
+    assert client.delete(f"/api/cart/items/{item_id}").status_code == 404
+
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+    assert client.delete(f"/api/cart/clear?user_id={user_id}").status_code == 200
+    assert client.get(f"/api/cart?user_id={user_id}").json()["items"] == []
+    assert db_session.query(models.OutboxEvent).count() == 1
+
+
+SECOND_PRODUCT_ID = "a1b2c3d4-e5f6-47a8-9b0c-1d2e3f4a5b6c"
+
+
+def test_batch_applies_adds_sets_and_removes_in_one_request(client):
+    user_id = str(uuid4())
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2})
+
+    response = client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "add", "product_id": SECOND_PRODUCT_ID, "quantity": 3},
+        {"op": "add", "product_id": PRODUCT_ID, "quantity": 1},
+        {"op": "set", "product_id": SECOND_PRODUCT_ID, "quantity": 1},
+    ]})
+    assert response.status_code == 200
+    quantities = {item["product_id"]: item["quantity"] for item in response.json()["items"]}
+    assert quantities == {PRODUCT_ID: 3, SECOND_PRODUCT_ID: 1}
+    assert response.json()["total_price"] == 730.0
+
+    response = client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "remove", "product_id": PRODUCT_ID},
+    ]})
+    assert [item["product_id"] for item in response.json()["items"]] == [SECOND_PRODUCT_ID]
+
+
+def test_batch_is_rejected_as_a_whole(client):
+    user_id = str(uuid4())
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 9})
+
+    response = client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "add", "product_id": SECOND_PRODUCT_ID, "quantity": 1},
+        {"op": "add", "product_id": PRODUCT_ID, "quantity": 2},
+    ]})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Операция 1")
+
+    response = client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "add", "product_id": str(uuid4()), "quantity": 1},
+    ]})
+    assert response.status_code == 400
+
+    items = client.get(f"/api/cart?user_id={user_id}").json()["items"]
+    assert [(item["product_id"], item["quantity"]) for item in items] == [(PRODUCT_ID, 9)]
+
+
+def test_batch_rejects_empty_and_oversized_requests(client, db_session, monkeypatch):
+    user_id = str(uuid4())
+    monkeypatch.setattr(routes, "CART_BATCH_MAX_ITEMS", 2)
+
+    response = client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": []})
+    assert response.status_code == 400
+    response = client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "add", "product_id": PRODUCT_ID, "quantity": 1},
+    ] * 3})
+    assert response.status_code == 400
+    assert db_session.query(models.Cart).count() == 0
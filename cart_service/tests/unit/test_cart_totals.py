@@ -0,0 +1,69 @@
+from uuid import uuid4
+from cart_service.app import models, totals
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+SECOND_PRODUCT_ID = "a1b2c3d4-e5f6-47a8-9b0c-1d2e3f4a5b6c"
+
+
+def summary(client, user_id):
+    return client.get(f"/api/cart/summary?user_id={user_id}").json()
+
+
+def assert_summary_matches_cart(client, user_id):
+    cart = client.get(f"/api/cart?user_id={user_id}").json()
+    data = summary(client, user_id)
+    assert data["item_count"] == sum(item["quantity"] for item in cart["items"])
+    assert data["total_price"] == cart["total_price"]
+
+
+def test_summary_follows_every_mutation(client, db_session):
+    user_id = str(uuid4())
+    assert summary(client, user_id) == {"user_id": user_id, "item_count": 0, "total_price": 0.0}
+
+    item_id = client.post(
+        f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2}
+    ).json()["id"]
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": SECOND_PRODUCT_ID, "quantity": 1})
+    assert summary(client, user_id)["item_count"] == 4
+    assert summary(client, user_id)["total_price"] == 730.0
+    assert_summary_matches_cart(client, user_id)
+
+    client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": [
+        {"op": "set", "product_id": SECOND_PRODUCT_ID, "quantity": 2},
+    ]})
+    assert_summary_matches_cart(client, user_id)
+
+    client.delete(f"/api/cart/items/{item_id}")
+    assert summary(client, user_id)["item_count"] == 2
+    assert_summary_matches_cart(client, user_id)
+
+    client.delete(f"/api/cart/clear?user_id={user_id}")
+    assert summary(client, user_id)["item_count"] == 0
+    assert summary(client, user_id)["total_price"] == 0.0
+
+    assert totals.find_inconsistent_carts(db_session) == []
+
+
+def test_rejected_add_does_not_change_totals(client):
+    user_id = str(uuid4())
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 9})
+    assert client.post(
+        f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2}
+    ).status_code == 400
+    assert summary(client, user_id)["item_count"] == 9
+
+
+def test_checker_finds_and_rebuilds_drifted_totals(client, db_session):
+    user_ids = [str(uuid4()) for _ in range(5)]
+    for user_id in user_ids:
+        client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2})
+
+    db_session.query(models.Cart).update({"item_count": 7, "total_price": 1.0})
+    db_session.commit()
+    assert len(totals.find_inconsistent_carts(db_session)) == 5
+
+    assert totals.rebuild_all_totals(db_session, batch_size=2) == 5
+    assert totals.find_inconsistent_carts(db_session) == []
+    for user_id in user_ids:
+        assert summary(client, user_id) == {"user_id": user_id, "item_count": 2, "total_price": 300.0}
@@ -0,0 +1,68 @@
+import random
+import pytest
+from uuid import UUID, uuid4
+from cart_service.app.catalog import (
+    CatalogFormatError, CatalogSnapshot, Product, ProductCatalog, encode_catalog, write_catalog
+)
+
+
+def random_products(count):
+    rng = random.Random(42)
+    return [
+        Product(UUID(int=rng.getrandbits(128)), f"Товар {i}", rng.randint(100, 99999) / 100, i % 7 == 0)
+        for i in range(count)
+    ]
+
+
+def test_snapshot_finds_every_product_and_rejects_unknown():
+    products = random_products(5000)
+    snapshot = CatalogSnapshot(encode_catalog(products))
+
+    assert len(snapshot) == 5000
+    for product in products:
+        assert snapshot.get(product.id) == product
+    assert snapshot.get(uuid4()) is None
+    assert snapshot.get(UUID(int=0)) is None
+    assert snapshot.get(UUID(int=2 ** 128 - 1)) is None
+
+
+def test_get_many_returns_only_known_products():
+    products = random_products(100)
+    snapshot = CatalogSnapshot(encode_catalog(products))
+    unknown = uuid4()
+
+    found = snapshot.get_many([products[0].id, products[1].id, products[0].id, unknown])
+    assert found == {products[0].id: products[0], products[1].id: products[1]}
+
+
+def test_duplicate_ids_are_rejected():
+    product = Product(uuid4(), "Аспирин", 150.0)
+    with pytest.raises(CatalogFormatError):
+        encode_catalog([product, product])
+
+
+def test_catalog_hot_reloads_changed_file_and_keeps_snapshot_on_corrupt_file(tmp_path):
+    path = str(tmp_path / "catalog.bin")
+    first, second = random_products(2)
+    write_catalog(path, [first])
+
+    now = [0.0]
+    catalog = ProductCatalog(path, reload_interval=1, clock=lambda: now[0])
+    assert catalog.get(first.id) == first
+    assert catalog.get(second.id) is None
+
+    write_catalog(path, [first, second])
+    assert catalog.get(second.id) is None
+    now[0] = 2
+    assert catalog.get(second.id) == second
+    assert catalog.reloads == 2
+
+    with open(path, "wb") as f:
+        f.write(b"garbage")
+    assert catalog.reload() is False
+    assert len(catalog) == 2
+
+
+def test_catalog_without_file_serves_seed_products():
+    catalog = ProductCatalog("")
+    assert catalog.get(UUID("5d0b0c9e-7aa9-4b15-84a9-20111a597ad0")).name == "Аспирин"
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+import pytest
+from benchmarks.amqp_stub import StubBroker
+from cart_service.app import database, eligibility, models, routes
+from cart_service.app.catalog import Product, ProductCatalog, write_catalog
+from cart_service.app.consumer import Consumer
+from cart_service.app.dedup import Deduplicator
+
+RX_PRODUCT = Product(UUID("d4e5f6a7-b8c9-40d1-9e2f-4a5b6c7d8e9f"), "Амоксициллин", 210.00, True)
+OTC_PRODUCT = Product(UUID("5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"), "Аспирин", 150.00)
+
+
+@pytest.fixture
+def rx_catalog(tmp_path, monkeypatch):
+    path = str(tmp_path / "catalog.bin")
+    write_catalog(path, [RX_PRODUCT, OTC_PRODUCT])
+    monkeypatch.setattr(routes, "catalog", ProductCatalog(path))
+
+
+@pytest.fixture
+def index(db_session, monkeypatch):
+    fresh = eligibility.EligibilityIndex()
+    monkeypatch.setattr(eligibility, "index", fresh)
+    return fresh
+
+
+def apply_events(records, eligibility_index=None):
+    async def scenario():
+        async with database.AsyncSessionLocal() as db:
+            return await eligibility.apply_events(db, records, eligibility_index)
+
+    return asyncio.run(scenario())
+
+
+def verified_event(user_id, quantity, status="approved", expiry_days=30, prescription_id=None):
+    return {
+        "prescription_id": str(prescription_id or uuid4()),
+        "user_id": str(user_id),
+        "status": status,
+        "expiry_date": (datetime.now() + timedelta(days=expiry_days)).replace(microsecond=0).isoformat(),
+        "verified_at": datetime.utcnow().isoformat(),
+        "medications": [{"product_id": str(RX_PRODUCT.id), "quantity": quantity}],
+    }
+
+
+def test_only_approved_unexpired_prescriptions_grant_quantity(index, db_session):
+    user_id = uuid4()
+    approved = verified_event(user_id, 2)
+    events = [approved, approved, verified_event(user_id, 5, status="rejected"),
+              verified_event(user_id, 7, expiry_days=-1), verified_event(user_id, 1)]
+    apply_events(events)
+
+    assert index.remaining(user_id, RX_PRODUCT.id) == 3
+    assert db_session.query(models.PrescriptionGrant).count() == 2
+    # После истечения рецепта остаток без него
+    assert index.remaining(user_id, RX_PRODUCT.id, today=datetime.now().date() + timedelta(days=31)) == 0
+
+
+def test_add_to_cart_requires_verified_prescription(client, rx_catalog, index):
+    user_id = uuid4()
+    url = f"/api/cart/items?user_id={user_id}"
+    assert client.post(url, json={"product_id": str(RX_PRODUCT.id), "quantity": 1}).status_code == 403
+    assert client.post(url, json={"product_id": str(OTC_PRODUCT.id), "quantity": 1}).status_code == 200
+
+    apply_events([verified_event(user_id, 3)])
+    assert client.post(url, json={"product_id": str(RX_PRODUCT.id), "quantity": 2}).status_code == 200
+    # Предел - итоговое количество в корзине
+    response = client.post(url, json={"product_id": str(RX_PRODUCT.id), "quantity": 2})
+    assert response.status_code == 403
+    assert client.post(url, json={"product_id": str(RX_PRODUCT.id), "quantity": 1}).status_code == 200
+
+    batch_url = f"/api/cart/items:batch?user_id={user_id}"
+    response = client.post(batch_url, json={"items": [{"op": "set", "product_id": str(RX_PRODUCT.id), "quantity": 4}]})
+    assert response.status_code == 403
+    response = client.post(batch_url, json={"items": [{"op": "set", "product_id": str(RX_PRODUCT.id), "quantity": 1}]})
+    assert response.status_code == 200
+
+
+def test_cold_start_imports_export_snapshot_and_refresh_catches_up(tmp_path, index, db_session):
+    user_id = uuid4()
+    # Строки выгрузки GET /api/prescriptions/export?status=approved
+    snapshot = tmp_path / "approved.ndjson"
+    rows = []
+    for quantity in (2, 3):
+        event = verified_event(user_id, quantity)
+        rows.append({**event, "id": event.pop("prescription_id")})
+    snapshot.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+    asyncio.run(eligibility.warm_up(str(snapshot)))
+    assert index.remaining(user_id, RX_PRODUCT.id) == 5
+
+    # Событие, примененное другим процессом, видно после refresh
+    other = eligibility.EligibilityIndex()
+    apply_events([verified_event(user_id, 1)], other)
+
+    async def refresh():
+        async with database.AsyncSessionLocal() as db:
+            return await index.refresh(db)
+
+    assert asyncio.run(refresh()) >= 1
+    assert index.remaining(user_id, RX_PRODUCT.id) == 6
+    # Повторный снимок ничего не добавляет
+    eligibility.import_snapshot(str(snapshot))
+    assert db_session.query(models.PrescriptionGrant).count() == 3
+
+
+def test_refresh_tracks_last_seq_when_rows_fill_whole_batches(index, db_session):
+    user_id = uuid4()
+    apply_events([verified_event(user_id, 1) for _ in range(3)])
+    last_seq = max(grant.seq for grant in db_session.query(models.PrescriptionGrant))
+
+    async def refresh(fresh):
+        async with database.AsyncSessionLocal() as db:
+            return await fresh.refresh(db, batch_size=3, overlap=0)
+
+    fresh = eligibility.EligibilityIndex()
+    assert asyncio.run(refresh(fresh)) == 3
+    assert fresh.last_seq == last_seq
+    # Без новых строк опрос ничего не перечитывает
+    assert asyncio.run(refresh(fresh)) == 0
+
+
+def test_consumer_applies_events_once(index, db_session):
+    user_id = uuid4()
+    body = json.dumps(verified_event(user_id, 2)).encode()
+
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        queue = broker.queue("prescription_verified")
+        dedup = Deduplicator("prescription_verified")
+        handler = dedup.wrap(eligibility.process_prescription_verified_messages, with_session=True)
+        consumer = Consumer("prescription_verified", handler, batch_size=10,
+                            connect=broker.connect, reconnect_min=0.001)
+        consumer.start()
+        for message_id in ("m1", "m1", "m2"):
+            queue.put(body, message_id)
+        deadline = asyncio.get_running_loop().time() + 5
+        while broker.acked + len(broker.dead_lettered) < 3:
+            assert asyncio.get_running_loop().time() < deadline
+            await asyncio.sleep(0.001)
+        await consumer.stop()
+        return dedup.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["processed"] == 2
+    assert index.remaining(user_id, RX_PRODUCT.id) == 2
@@ -0,0 +1,52 @@
+import re
+from uuid import uuid4
+from prometheus_client import CollectorRegistry
+from cart_service.app import metrics
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+def sample(text, name, **labels):
+    """Значение ряда из выгрузки в формате Prometheus"""
+    for line in text.splitlines():
+        match = re.fullmatch(rf'{re.escape(name)}\{{(.*)\}} (\S+)', line)
+        if match and all(f'{key}="{value}"' in match.group(1) for key, value in labels.items()):
+            return float(match.group(2))
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = CollectorRegistry()
+    histogram = metrics.Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.labels('/a"b').observe(value)
+
+    text = metrics.render(registry).decode()
+    route = '/a\\"b'
+    assert sample(text, "test_seconds_bucket", route=route, le="0.1") == 1
+    assert sample(text, "test_seconds_bucket", route=route, le="1.0") == 3
+    assert sample(text, "test_seconds_bucket", route=route, le="+Inf") == 4
+    assert sample(text, "test_seconds_count", route=route) == 4
+    assert "# TYPE test_seconds histogram" in text
+
+
+def test_requests_are_measured_by_route_template_with_db_statements(client):
+    user_id = str(uuid4())
+    before = client.get("/metrics").text
+    count_before = sample(before, "http_request_duration_seconds_count",
+                          method="POST", route="/api/cart/items", status="200") or 0
+
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+    client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": str(uuid4()), "quantity": 1})
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert sample(text, "http_request_duration_seconds_count",
+                  method="POST", route="/api/cart/items", status="200") == count_before + 1
+    assert sample(text, "http_request_duration_seconds_count",
+                  method="POST", route="/api/cart/items", status="400") >= 1
+    # Добавление в корзину: upsert корзины, upsert позиции, обновление итогов
+    assert sample(text, "http_request_db_statements_sum", method="POST", route="/api/cart/items") >= 3
+    assert sample(text, "db_statement_duration_seconds_count", engine="async") > 0
+    assert sample(text, "db_pool_checked_out", engine="async") == 0
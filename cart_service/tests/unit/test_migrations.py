@@ -0,0 +1,29 @@
+from alembic import command
+from sqlalchemy import create_engine, inspect
+from cart_service.app import migrate
+
+
+def test_models_match_migrations(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url)
+    assert migrate.check(url) == []
+
+
+def test_downgrade_and_upgrade_again(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url)
+    command.downgrade(migrate.get_config(url), "base")
+    assert inspect(create_engine(url)).get_table_names() == [migrate.VERSION_TABLE]
+    migrate.upgrade(url)
+    assert migrate.check(url) == []
+
+
+def test_database_created_before_migrations_is_adopted(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url, migrate.BASELINE_REVISION)
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP TABLE {migrate.VERSION_TABLE}")
+
+    migrate.upgrade(url)
+    assert migrate.check(url) == []
@@ -0,0 +1,86 @@
+import asyncio
+from uuid import uuid4
+from cart_service.app import database, models, outbox, routes
+
+
+class FakePublisher:
+    def __init__(self, fail_keys=()):
+        self.fail_keys = set(fail_keys)
+        self.published = []
+        self.message_ids = []
+
+    def publish(self, routing_key, message_data, message_id=None):
+        future = asyncio.get_running_loop().create_future()
+        self.message_ids.append(message_id)
+        if message_data["user_id"] in self.fail_keys:
+            future.set_exception(RuntimeError("nack"))
+        else:
+            self.published.append((routing_key, message_data))
+            future.set_result(True)
+        return future
+
+
+def _cart_with_item(db, user_id):
+    cart = models.Cart(user_id=user_id)
+    db.add(cart)
+    db.flush()
+    db.add(models.CartItem(cart_id=cart.id, product_id=uuid4(), name="Аспирин", quantity=1, price=150.0))
+    db.commit()
+
+
+def test_clear_cart_writes_outbox_event_in_same_transaction(db_session):
+    user_id = uuid4()
+    _cart_with_item(db_session, user_id)
+
+    async def clear():
+        async with database.AsyncSessionLocal() as db:
+            await routes.clear_cart(user_id=user_id, db=db)
+
+    asyncio.run(clear())
+
+    events = db_session.query(models.OutboxEvent).all()
+    assert len(events) == 1
+    assert events[0].routing_key == "cart_cleared"
+    assert events[0].payload["user_id"] == str(user_id)
+    assert db_session.query(models.CartItem).count() == 0
+
+
+def test_relay_deletes_only_confirmed_events(db_session):
+    ok_user, failing_user = str(uuid4()), str(uuid4())
+    for user_id in (ok_user, failing_user, ok_user):
+        outbox.add_event(db_session, "cart_cleared", {"user_id": user_id})
+    db_session.commit()
+
+    publisher = FakePublisher(fail_keys={failing_user})
+    relay = outbox.OutboxRelay(publisher, batch_size=10)
+    confirmed = asyncio.run(relay.relay_batch())
+
+    assert confirmed == 2
+    assert [payload["user_id"] for _, payload in publisher.published] == [ok_user, ok_user]
+    remaining = db_session.query(models.OutboxEvent).all()
+    assert [event.payload["user_id"] for event in remaining] == [failing_user]
+
+    # Повторная отправка несет тот же message_id, и потребитель отбросит дубль
+    publisher.fail_keys.clear()
+    assert asyncio.run(relay.relay_batch()) == 1
+    assert publisher.message_ids[-1] == publisher.message_ids[1] == f"cart_outbox:{remaining[0].id}"
+
+
+def test_relay_drains_backlog_in_batches(db_session):
+    for i in range(25):
+        outbox.add_event(db_session, "cart_cleared", {"user_id": str(i)})
+    db_session.commit()
+
+    publisher = FakePublisher()
+    relay = outbox.OutboxRelay(publisher, batch_size=10)
+
+    async def drain():
+        sizes = []
+        while True:
+            relayed = await relay.relay_batch()
+            if not relayed:
+                return sizes
+            sizes.append(relayed)
+
+    assert asyncio.run(drain()) == [10, 10, 5]
+    assert db_session.query(models.OutboxEvent).count() == 0
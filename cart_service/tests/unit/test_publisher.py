@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from pamqp.commands import Basic
+from cart_service.app.rabbitmq import Publisher
+
+
+class FakeExchange:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def publish(self, message, routing_key):
+        self.broker.published.append((routing_key, message.body))
+        self.broker.message_ids.append(message.message_id)
+        return Basic.Nack() if self.broker.nack else Basic.Ack()
+
+
+class FakeChannel:
+    def __init__(self, broker):
+        self.default_exchange = FakeExchange(broker)
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def channel(self, publisher_confirms=True):
+        self.broker.channels += 1
+        return FakeChannel(self.broker)
+
+    async def close(self):
+        pass
+
+
+class FakeBroker:
+    def __init__(self, nack=False):
+        self.nack = nack
+        self.connections = 0
+        self.channels = 0
+        self.published = []
+        self.message_ids = []
+
+    async def connect(self, url):
+        self.connections += 1
+        return FakeConnection(self)
+
+
+def test_publisher_uses_single_connection_and_channel_pool():
+    broker = FakeBroker()
+
+    async def scenario():
+        publisher = Publisher(pool_size=3, batch_size=10, flush_interval=0.01, connect=broker.connect)
+        await publisher.start()
+        await asyncio.gather(*(publisher.publish("cart_cleared", {"n": i}) for i in range(50)))
+        await publisher.stop()
+        return publisher.stats.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert broker.connections == 1
+    assert broker.channels == 3
+    assert len(broker.published) == 50
+    assert stats["published"] == 50
+    assert stats["batches"] >= 5
+    assert len(set(broker.message_ids)) == 50
+
+
+def test_publisher_keeps_explicit_message_id():
+    broker = FakeBroker()
+
+    async def scenario():
+        publisher = Publisher(flush_interval=0.01, connect=broker.connect)
+        await publisher.start()
+        await publisher.publish("cart_cleared", {"n": 1}, message_id="cart_outbox:42")
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    assert broker.message_ids == ["cart_outbox:42"]
+
+
+def test_publisher_flushes_by_time():
+    broker = FakeBroker()
+
+    async def scenario():
+        publisher = Publisher(batch_size=1000, flush_interval=0.01, connect=broker.connect)
+        await publisher.start()
+        await asyncio.wait_for(publisher.publish("cart_cleared", {"user_id": "u1"}), timeout=1)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    assert broker.published == [("cart_cleared", b'{"user_id": "u1"}')]
+
+
+def test_publisher_reports_nack_as_failure():
+    broker = FakeBroker(nack=True)
+
+    async def scenario():
+        publisher = Publisher(batch_size=1, flush_interval=0.01, connect=broker.connect)
+        await publisher.start()
+        with pytest.raises(RuntimeError):
+            await publisher.publish("cart_cleared", {"n": 1})
+        await publisher.stop()
+        return publisher.stats.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert stats["failed"] == 1
+    assert stats["published"] == 0
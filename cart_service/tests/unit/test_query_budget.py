@@ -0,0 +1,91 @@
+from uuid import uuid4
+import pytest
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+OTHER_PRODUCT_ID = "c3d4e5f6-a7b8-49c0-8d1e-3f4a5b6c7d8e"
+
+# Допустимое число SQL-запросов на эндпоинт. Рост числа запросов - регрессия (N+1),
+# бюджет поднимается только осознанно вместе с изменением маршрута
+QUERY_BUDGETS = {
+    "GET /api/cart": 1,
+    "GET /api/cart/summary": 1,
+    "POST /api/cart/items": 3,
+    # Не зависит от числа позиций в пачке: upsert корзины, чтение текущих количеств,
+    # один upsert позиций, пересчет итогов, чтение корзины для ответа
+    "POST /api/cart/items:batch": 5,
+    "DELETE /api/cart/items/{item_id}": 2,
+    "DELETE /api/cart/clear": 3,
+}
+
+
+def assert_budget(endpoint, statements):
+    budget = QUERY_BUDGETS[endpoint]
+    assert len(statements) <= budget, (
+        f"{endpoint}: {len(statements)} SQL statements, budget {budget}:\n" + "\n".join(statements)
+    )
+
+
+@pytest.fixture
+def filled_cart(client):
+    user_id = str(uuid4())
+    for product_id in (PRODUCT_ID, OTHER_PRODUCT_ID):
+        response = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": product_id, "quantity": 1})
+        assert response.status_code == 200
+    return user_id
+
+
+def test_read_endpoints_fit_budget(client, count_queries, filled_cart):
+    with count_queries() as statements:
+        # Запись сбросила кэш, поэтому корзина читается из базы
+        client.get(f"/api/cart?user_id={filled_cart}")
+    assert_budget("GET /api/cart", statements)
+
+    with count_queries() as statements:
+        client.get(f"/api/cart/summary?user_id={filled_cart}")
+    assert_budget("GET /api/cart/summary", statements)
+
+
+def test_read_of_large_cart_does_not_grow_with_items(client, count_queries):
+    user_id = str(uuid4())
+    items = [{"product_id": PRODUCT_ID, "quantity": 1}, {"product_id": OTHER_PRODUCT_ID, "quantity": 1}]
+    assert client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": items}).status_code == 200
+
+    with count_queries() as statements:
+        cart = client.get(f"/api/cart?user_id={user_id}").json()
+    assert len(cart["items"]) == 2
+    assert_budget("GET /api/cart", statements)
+
+
+def test_write_endpoints_fit_budget(client, count_queries, filled_cart):
+    user_id = str(uuid4())
+    with count_queries() as statements:
+        item = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1}).json()
+    assert_budget("POST /api/cart/items", statements)
+
+    with count_queries() as statements:
+        response = client.post(f"/api/cart/items:batch?user_id={user_id}",
+                               json={"items": [{"product_id": PRODUCT_ID, "quantity": 1},
+                                               {"product_id": OTHER_PRODUCT_ID, "quantity": 1}]})
+    assert response.status_code == 200
+    assert_budget("POST /api/cart/items:batch", statements)
+
+    with count_queries() as statements:
+        assert client.delete(f"/api/cart/items/{item['id']}").status_code == 200
+    assert_budget("DELETE /api/cart/items/{item_id}", statements)
+
+    with count_queries() as statements:
+        assert client.delete(f"/api/cart/clear?user_id={filled_cart}").status_code == 200
+    assert_budget("DELETE /api/cart/clear", statements)
+
+
+def test_remove_and_clear_keep_totals_and_404(client, filled_cart):
+    cart = client.get(f"/api/cart?user_id={filled_cart}").json()
+    response = client.delete(f"/api/cart/items/{cart['items'][0]['id']}")
+    assert response.status_code == 200
+
+    summary = client.get(f"/api/cart/summary?user_id={filled_cart}").json()
+    assert summary["item_count"] == 1
+    assert summary["total_price"] == cart["items"][1]["total_price"]
+
+    assert client.delete(f"/api/cart/items/{cart['items'][0]['id']}").status_code == 404
+    assert client.delete(f"/api/cart/clear?user_id={uuid4()}").status_code == 404
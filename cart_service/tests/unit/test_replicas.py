@@ -0,0 +1,56 @@
+import asyncio
+from uuid import uuid4
+import pytest
+from sqlalchemy import create_engine
+from cart_service.app import models, replicas, shards
+from cart_service.app.cache import cart_cache
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+@pytest.fixture
+def lagging_router(tmp_path, monkeypatch):
+    """Один шард с репликой, до которой изменения основной базы не доходят"""
+    primary, replica = f"sqlite:///{tmp_path / 'primary.db'}", f"sqlite:///{tmp_path / 'replica.db'}"
+    router = shards.ShardRouter({"s0": f"{primary}|{replica}"})
+    shard = router.shards["s0"]
+    models.Base.metadata.create_all(bind=shard.engine)
+    replica_engine = create_engine(replica)
+    models.Base.metadata.create_all(bind=replica_engine)
+    replica_engine.dispose()
+    replicas.track_commits(shard.async_engine)
+    monkeypatch.setattr(shards, "router", router)
+    yield router
+    shard.engine.dispose()
+    asyncio.run(shard.async_engine.dispose())
+    asyncio.run(shard.reads.replicas[0].async_engine.dispose())
+
+
+def test_parse_shards_splits_replicas(tmp_path):
+    router = shards.ShardRouter({"s0": f"sqlite:///{tmp_path / 'p.db'}|sqlite:///{tmp_path / 'r.db'}"})
+    shard = router.shards["s0"]
+    assert shard.url == f"sqlite:///{tmp_path / 'p.db'}"
+    assert [replica.url for replica in shard.reads.replicas] == [f"sqlite:///{tmp_path / 'r.db'}"]
+    asyncio.run(shard.async_engine.dispose())
+    asyncio.run(shard.reads.replicas[0].async_engine.dispose())
+
+
+def test_cart_reads_follow_writes_and_replica_reads_are_cached_briefly(client, lagging_router):
+    user_id = uuid4()
+    response = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 2})
+    assert response.status_code == 200
+    token = response.headers[replicas.CONSISTENCY_HEADER]
+    client.cookies.clear()
+
+    # Без токена - отстающая реплика; ее ответ кэшируется, но не отдается клиенту с токеном
+    assert client.get(f"/api/cart?user_id={user_id}").json()["items"] == []
+    assert client.get(f"/api/cart/summary?user_id={user_id}").json()["item_count"] == 0
+    assert asyncio.run(cart_cache.get(user_id))["items"] == []
+    assert asyncio.run(cart_cache.get(user_id, allow_replica=False)) is None
+
+    headers = {replicas.CONSISTENCY_HEADER: token}
+    assert len(client.get(f"/api/cart?user_id={user_id}", headers=headers).json()["items"]) == 1
+    assert client.get(f"/api/cart/summary?user_id={user_id}", headers=headers).json()["item_count"] == 2
+
+    # Ответ основной базы кэшируется и дальше отдается всем
+    assert len(client.get(f"/api/cart?user_id={user_id}").json()["items"]) == 1
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+import pytest
+from cart_service.app import metrics, models, retention, sweeper
+
+NOW = datetime(2026, 10, 18, 3, 0)
+
+
+def add_cart(db_session, updated_at, items=2):
+    cart = models.Cart(user_id=uuid4(), item_count=items, total_price=100.0 * items,
+                       created_at=updated_at, updated_at=updated_at)
+    db_session.add(cart)
+    db_session.flush()
+    db_session.add_all([
+        models.CartItem(cart_id=cart.id, product_id=uuid4(), name="Товар", quantity=1, price=100.0)
+        for _ in range(items)
+    ])
+    db_session.commit()
+    return cart
+
+
+def run_sweeper(**kwargs):
+    kwargs.setdefault("batch_size", 2)
+    kwargs.setdefault("max_rows_per_second", 0)
+    instance = sweeper.Sweeper("abandoned_carts", retention.delete_abandoned_carts, clock=lambda: NOW, **kwargs)
+    return instance, asyncio.run(instance.sweep_once())
+
+
+def test_abandoned_carts_are_deleted_in_batches_with_bulk_events(db_session):
+    abandoned = [str(add_cart(db_session, NOW - timedelta(days=40 + i)).user_id) for i in range(5)]
+    active_id = add_cart(db_session, NOW - timedelta(days=1)).id
+    rows_before = metrics.REGISTRY.get_sample_value("sweeper_rows_total", {"sweeper": "abandoned_carts"}) or 0
+
+    instance, swept = run_sweeper()
+
+    assert swept == 5
+    assert instance.stats.batches == 3
+    assert metrics.REGISTRY.get_sample_value("sweeper_rows_total", {"sweeper": "abandoned_carts"}) == rows_before + 5
+    db_session.expire_all()
+    assert [cart.id for cart in db_session.query(models.Cart)] == [active_id]
+    assert db_session.query(models.CartItem).count() == 2
+
+    events = db_session.query(models.OutboxEvent).order_by(models.OutboxEvent.id).all()
+    assert [event.routing_key for event in events] == ["carts_abandoned"] * 3
+    removed = [cart["user_id"] for event in events for cart in event.payload["carts"]]
+    assert sorted(removed) == sorted(abandoned)
+
+
+def test_rate_limit_spaces_out_batches(db_session):
+    for i in range(5):
+        add_cart(db_session, NOW - timedelta(days=40 + i), items=0)
+
+    started = time.perf_counter()
+    _, swept = run_sweeper(max_rows_per_second=50)
+    # Пауза после каждой полной пачки: 2 строки / 50 в секунду = 40 мс, две полные пачки
+    assert swept == 5
+    assert time.perf_counter() - started >= 0.08
+
+
+@pytest.mark.parametrize("window, hour, expected", [
+    ("", 12, True), ("1-6", 3, True), ("1-6", 6, False), ("22-4", 23, True), ("22-4", 2, True), ("22-4", 12, False),
+])
+def test_sweep_window(window, hour, expected):
+    assert sweeper.in_window(sweeper.parse_window(window), NOW.replace(hour=hour)) is expected
+
+
+def test_sweep_outside_window_does_nothing(db_session):
+    add_cart(db_session, NOW - timedelta(days=40))
+    _, swept = run_sweeper(window="12-14")
+    assert swept == 0
+    assert db_session.query(models.Cart).count() == 1
@@ -0,0 +1,42 @@
+from uuid import uuid4
+from cart_service.app import schemas, serialization
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+OTHER_PRODUCT_ID = "c3d4e5f6-a7b8-49c0-8d1e-3f4a5b6c7d8e"
+
+
+def fill_cart(client, user_id):
+    items = [{"product_id": PRODUCT_ID, "quantity": 2}, {"product_id": OTHER_PRODUCT_ID, "quantity": 3}]
+    return client.post(f"/api/cart/items:batch?user_id={user_id}", json={"items": items})
+
+
+def responses(client):
+    """Ответы быстрых маршрутов корзины вместе с их схемами"""
+    user_id = str(uuid4())
+    added = client.post(f"/api/cart/items?user_id={user_id}", json={"product_id": PRODUCT_ID, "quantity": 1})
+    return [
+        (schemas.CartItemResponse, added),
+        (schemas.CartResponse, fill_cart(client, user_id)),
+        (schemas.CartResponse, client.get(f"/api/cart?user_id={user_id}")),
+        # Второй запрос отдается из кэша
+        (schemas.CartResponse, client.get(f"/api/cart?user_id={user_id}")),
+        (schemas.CartResponse, client.get(f"/api/cart?user_id={uuid4()}")),
+        (schemas.CartSummaryResponse, client.get(f"/api/cart/summary?user_id={user_id}")),
+    ]
+
+
+def test_fast_responses_match_schema(client):
+    for schema, response in responses(client):
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        body = response.json()
+        # Проверка схемой и сериализация Pydantic не меняют ни одного значения
+        assert schema.model_validate(body).model_dump(mode="json") == body
+
+
+def test_validated_path_is_still_available(client, monkeypatch):
+    monkeypatch.setattr(serialization, "FAST_SERIALIZATION", False)
+    for schema, response in responses(client):
+        assert response.status_code == 200
+        body = response.json()
+        assert schema.model_validate(body).model_dump(mode="json") == body
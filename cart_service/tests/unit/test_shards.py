@@ -0,0 +1,175 @@
+import asyncio
+from collections import Counter
+from uuid import uuid4
+import pytest
+from cart_service.app import models, reshard, shards
+
+PRODUCT_ID = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+@pytest.fixture
+def make_router(tmp_path):
+    """Роутер поверх отдельных SQLite-баз в tmp_path; одна база на имя шарда во всех роутерах теста"""
+    created = []
+
+    def factory(names, previous=None):
+        router = shards.ShardRouter({name: f"sqlite:///{tmp_path / name}.db" for name in names}, previous)
+        for shard in router.shards.values():
+            models.Base.metadata.create_all(bind=shard.engine)
+        created.append(router)
+        return router
+
+    yield factory
+    for router in created:
+        for shard in router.shards.values():
+            shard.engine.dispose()
+            asyncio.run(shard.async_engine.dispose())
+
+
+def add_cart(shard, user_id, items):
+    """Корзина с позициями {product_id: quantity} напрямую в базе шарда"""
+    with shard.sync_session_factory() as db:
+        cart = models.Cart(user_id=user_id, item_count=sum(items.values()),
+                           total_price=100.0 * sum(items.values()))
+        db.add(cart)
+        db.flush()
+        db.add_all([models.CartItem(cart_id=cart.id, product_id=product_id, name="Товар", quantity=quantity,
+                                    price=100.0) for product_id, quantity in items.items()])
+        db.commit()
+
+
+def cart_contents(shard, user_id):
+    with shard.sync_session_factory() as db:
+        cart = db.query(models.Cart).filter(models.Cart.user_id == user_id).first()
+        if cart is None:
+            return None
+        return cart.item_count, {item.product_id: item.quantity for item in cart.items}
+
+
+def test_ring_moves_about_one_shard_share_when_growing():
+    keys = [uuid4() for _ in range(20000)]
+    before = shards.HashRing(["s0", "s1", "s2"])
+    after = shards.HashRing(["s0", "s1", "s2", "s3"])
+
+    owners = Counter(before.node_for(key) for key in keys)
+    assert min(owners.values()) > len(keys) / 3 * 0.8
+
+    moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+    assert 0.18 < len(moved) / len(keys) < 0.32
+    # Переезжают только корзины нового шарда
+    assert {after.node_for(key) for key in moved} == {"s3"}
+
+
+def test_parse_shards():
+    assert shards.parse_shards("") == {shards.DEFAULT_SHARD: shards.database.DATABASE_URL}
+    assert shards.parse_shards("a=sqlite:///a.db, b=sqlite:///b.db") == {"a": "sqlite:///a.db", "b": "sqlite:///b.db"}
+    with pytest.raises(ValueError):
+        shards.parse_shards("a=sqlite:///a.db,a=sqlite:///b.db")
+    with pytest.raises(ValueError):
+        shards.ShardRouter({"a": "sqlite://"}, previous=["b"])
+
+
+def test_move_cart_merges_and_is_safe_to_repeat(make_router):
+    router = make_router(["s0", "s1"])
+    source, target = router.shards["s0"], router.shards["s1"]
+    user_id, shared, only_source = uuid4(), uuid4(), uuid4()
+    add_cart(source, user_id, {shared: 2, only_source: 1})
+    # Реплика с новой конфигурацией уже успела создать корзину на новом шарде
+    add_cart(target, user_id, {shared: 3})
+
+    assert asyncio.run(shards.move_cart(source, target, user_id)) is True
+    assert cart_contents(source, user_id) is None
+    assert cart_contents(target, user_id) == (6, {shared: 5, only_source: 1})
+    assert asyncio.run(shards.move_cart(source, target, user_id)) is False
+
+
+def test_move_cart_merge_respects_quantity_limit(make_router):
+    router = make_router(["s0", "s1"])
+    source, target = router.shards["s0"], router.shards["s1"]
+    user_id, product_id = uuid4(), uuid4()
+    add_cart(source, user_id, {product_id: 7})
+    add_cart(target, user_id, {product_id: 6})
+
+    asyncio.run(shards.move_cart(source, target, user_id))
+    assert cart_contents(target, user_id) == (models.MAX_ITEM_QUANTITY, {product_id: models.MAX_ITEM_QUANTITY})
+
+
+def test_move_after_partial_copy_does_not_double_quantities(make_router):
+    router = make_router(["s0", "s1"])
+    source, target = router.shards["s0"], router.shards["s1"]
+    user_id, product_id = uuid4(), uuid4()
+    add_cart(source, user_id, {product_id: 2})
+    asyncio.run(shards.move_cart(source, target, user_id))
+
+    # Сбой после копии на target, но до удаления на source: на source остались те же строки
+    with target.sync_session_factory() as db:
+        cart = db.query(models.Cart).one()
+        item = db.query(models.CartItem).one()
+        rows = (models.Cart(id=cart.id, user_id=cart.user_id, item_count=2, total_price=200.0),
+                models.CartItem(id=item.id, cart_id=cart.id, product_id=product_id, name="Товар", quantity=2,
+                                price=100.0))
+    with source.sync_session_factory() as db:
+        db.add(rows[0])
+        db.flush()
+        db.add(rows[1])
+        db.commit()
+
+    asyncio.run(shards.move_cart(source, target, user_id))
+    assert cart_contents(target, user_id) == (2, {product_id: 2})
+
+
+def test_reshard_moves_every_cart_to_its_owner(make_router):
+    before = make_router(["s0", "s1"])
+    users = [uuid4() for _ in range(60)]
+    for user_id in users:
+        add_cart(before.shard_for(user_id), user_id, {uuid4(): 1})
+
+    after = make_router(["s0", "s1", "s2"], previous=["s0", "s1"])
+    planned = asyncio.run(reshard.reshard(after, batch_size=7, dry_run=True))
+    moved = asyncio.run(reshard.reshard(after, batch_size=7))
+
+    assert moved == planned
+    assert sum(moved.values()) == sum(1 for user_id in users if after.shard_for(user_id).name == "s2") > 0
+    for user_id in users:
+        owner = after.shard_for(user_id)
+        assert cart_contents(owner, user_id)[0] == 1
+        assert all(cart_contents(shard, user_id) is None for shard in after.shards.values() if shard is not owner)
+    assert sum(asyncio.run(reshard.reshard(after)).values()) == 0
+
+
+def test_requests_go_to_owner_shard_and_pull_cart_from_previous(client, make_router, monkeypatch):
+    router = make_router(["s0", "s1"], previous=["s0"])
+    monkeypatch.setattr(shards, "router", router)
+    moving = next(user_id for user_id in iter(uuid4, None) if router.shard_for(user_id).name == "s1")
+    add_cart(router.shards["s0"], moving, {uuid4(): 2})
+
+    cart = client.get(f"/api/cart?user_id={moving}").json()
+    assert len(cart["items"]) == 1
+    assert cart_contents(router.shards["s0"], moving) is None
+
+    response = client.post(f"/api/cart/items?user_id={moving}", json={"product_id": PRODUCT_ID, "quantity": 1})
+    assert response.status_code == 200
+    assert cart_contents(router.shards["s1"], moving)[0] == 3
+
+    # Без user_id позиция ищется по всем шардам
+    assert client.delete(f"/api/cart/items/{response.json()['id']}").status_code == 200
+    assert cart_contents(router.shards["s1"], moving)[0] == 2
+
+
+def test_requests_lock_previous_shard_only_when_cart_is_still_there(client, make_router, monkeypatch):
+    router = make_router(["s0", "s1"], previous=["s0"])
+    monkeypatch.setattr(shards, "router", router)
+    moves = []
+    move_cart = shards.move_cart
+
+    async def counting_move(source, target, user_id):
+        moves.append(user_id)
+        return await move_cart(source, target, user_id)
+
+    monkeypatch.setattr(shards, "move_cart", counting_move)
+    moved = next(user_id for user_id in iter(uuid4, None) if router.shard_for(user_id).name == "s1")
+    add_cart(router.shards["s1"], moved, {uuid4(): 1})
+
+    for _ in range(3):
+        assert len(client.get(f"/api/cart?user_id={moved}").json()["items"]) == 1
+    assert moves == []
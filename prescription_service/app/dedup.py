@@ -0,0 +1,134 @@
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, database
+
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "100000"))
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", str(24 * 3600)))
+DEDUP_CLEANUP_INTERVAL = float(os.getenv("DEDUP_CLEANUP_INTERVAL", "300"))
+DEDUP_CLEANUP_BATCH = int(os.getenv("DEDUP_CLEANUP_BATCH", "5000"))
+
+
+class Deduplicator:
+    """Отсечение повторных доставок по message_id.
+
+    Перед таблицей стоит LRU ограниченного размера: недавний дубль отсекается
+    за O(1) без запроса в базу. Таблица ловит дубли после перезапуска и
+    вытеснения из LRU; отметка пишется в одной транзакции с обработкой.
+    """
+
+    def __init__(self, consumer: str, cache_size: int = DEDUP_CACHE_SIZE, session_factory=None):
+        self.consumer = consumer
+        self.cache_size = cache_size
+        self.session_factory = session_factory or database.AsyncSessionLocal
+        self._recent = OrderedDict()
+        self.duplicates_memory = 0
+        self.duplicates_db = 0
+        self.processed = 0
+
+    def _is_recent(self, message_id: str) -> bool:
+        if message_id in self._recent:
+            self._recent.move_to_end(message_id)
+            return True
+        return False
+
+    def remember(self, message_ids):
+        """Запомнить id после commit: в LRU попадают только зафиксированные отметки"""
+        for message_id in message_ids:
+            self._recent[message_id] = None
+            self._recent.move_to_end(message_id)
+        while len(self._recent) > self.cache_size:
+            self._recent.popitem(last=False)
+
+    async def claim(self, db: AsyncSession, message_ids) -> set:
+        """Отметить сообщения обработанными в транзакции db; вернуть id, которые встретились впервые"""
+        candidates = []
+        for message_id in dict.fromkeys(message_ids):
+            if self._is_recent(message_id):
+                self.duplicates_memory += 1
+            else:
+                candidates.append(message_id)
+        if not candidates:
+            return set()
+
+        now = datetime.utcnow()
+        table = models.ProcessedMessage.__table__
+        result = await db.execute(
+            database.dialect_insert(table)
+            .values([{"consumer": self.consumer, "message_id": message_id, "processed_at": now}
+                     for message_id in candidates])
+            .on_conflict_do_nothing()
+            .returning(table.c.message_id)
+        )
+        fresh = set(result.scalars())
+        self.duplicates_db += len(candidates) - len(fresh)
+        return fresh
+
+    def wrap(self, handler, with_session: bool = False):
+        """Обернуть обработчик Consumer: дубли подтверждаются без вызова handler.
+        Сообщения без message_id обрабатываются всегда. С with_session handler получает
+        вторым аргументом сессию с отметками и пишет свои изменения в той же транзакции"""
+
+        async def handle(message_or_batch):
+            batched = isinstance(message_or_batch, list)
+            batch = message_or_batch if batched else [message_or_batch]
+            async with self.session_factory() as db:
+                fresh = await self.claim(db, [message.message_id for message in batch if message.message_id])
+                todo = []
+                for message in batch:
+                    if not message.message_id:
+                        todo.append(message)
+                    elif message.message_id in fresh:
+                        # Дубль внутри одной пачки обрабатываем один раз
+                        fresh.discard(message.message_id)
+                        todo.append(message)
+                if todo:
+                    payload = todo if batched else todo[0]
+                    await (handler(payload, db) if with_session else handler(payload))
+                await db.commit()
+            self.processed += len(todo)
+            self.remember(message.message_id for message in todo if message.message_id)
+
+        return handle
+
+    def stats(self) -> dict:
+        return {
+            "cache_size": len(self._recent),
+            "cache_maxsize": self.cache_size,
+            "processed": self.processed,
+            "duplicates_memory": self.duplicates_memory,
+            "duplicates_db": self.duplicates_db,
+        }
+
+
+async def delete_expired(db: AsyncSession, ttl: float = DEDUP_TTL, batch_size: int = DEDUP_CLEANUP_BATCH) -> int:
+    """Удалить одну пачку отметок старше TTL; короткие транзакции не держат блокировки долго"""
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    processed = models.ProcessedMessage
+    expired = (
+        select(processed.consumer, processed.message_id)
+        .where(processed.processed_at < cutoff)
+        .limit(batch_size)
+    )
+    result = await db.execute(
+        delete(processed).where(tuple_(processed.consumer, processed.message_id).in_(expired))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def run_cleanup(interval: float = DEDUP_CLEANUP_INTERVAL, ttl: float = DEDUP_TTL,
+                      batch_size: int = DEDUP_CLEANUP_BATCH, session_factory=None):
+    """Периодическая очистка таблицы отметок по TTL"""
+    session_factory = session_factory or database.AsyncSessionLocal
+    while True:
+        try:
+            async with session_factory() as db:
+                while await delete_expired(db, ttl, batch_size) >= batch_size:
+                    pass
+        except Exception as e:
+            print(f"Dedup cleanup error: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,260 @@
+"""Массовый импорт рецептов от клиник.
+
+Поток NDJSON (строка - рецепт в форме PrescriptionCreate) или CSV (строка
+заголовка с колонками user_id, doctor_name, clinic_name, issue_date,
+expiry_date, medications - JSON-массив лекарств, необязательная image_url)
+разбирается по строкам без чтения тела целиком; запись CSV занимает несколько
+строк, если перевод строки стоит внутри кавычек. Строки проверяются теми же
+проверками, что POST /api/prescriptions (app.validation), и пишутся пачками по
+IMPORT_CHUNK_SIZE: на пачку один multi-row INSERT рецептов, один - лекарств,
+один - событий prescription_uploaded в outbox и один commit. Ошибочная строка
+попадает в отчет с номером и не прерывает импорт.
+
+    python -m app.importer prescriptions.ndjson
+    python -m app.importer prescriptions.csv --format csv
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import uuid
+from datetime import datetime, time
+from pydantic import ValidationError
+from sqlalchemy import insert
+from . import models, schemas, database, outbox, validation
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ("user_id", "doctor_name", "clinic_name", "issue_date", "expiry_date", "medications")
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+    "text/csv": "csv",
+}
+
+
+def format_from_content_type(content_type: str) -> str:
+    """Формат импорта по Content-Type запроса"""
+    fmt = CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower())
+    if fmt is None:
+        raise ValueError(f"Неподдерживаемый формат импорта: {content_type or 'не указан'}")
+    return fmt
+
+
+def error_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc'])) or 'row'}: {item['msg']}" for item in error.errors())
+
+
+async def split_lines(chunks):
+    """(номер строки, байты) из потока кусков, включая пустые строки"""
+    tail = b""
+    number = 0
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            number += 1
+            yield number, line
+    if tail:
+        yield number + 1, tail
+
+
+async def read_lines(chunks):
+    """(номер строки, байты) из потока кусков; пустые строки пропускаются"""
+    async for number, line in split_lines(chunks):
+        if line.strip():
+            yield number, line
+
+
+async def read_csv_records(chunks):
+    """(номер первой строки, байты записи) из потока CSV.
+
+    Перевод строки внутри кавычек не завершает запись: строки копятся, пока число
+    кавычек в записи нечетное. Байт '"' не встречается внутри многобайтных
+    символов UTF-8, поэтому считать его можно до декодирования
+    """
+    parts, quotes, start = [], 0, 0
+    async for number, line in split_lines(chunks):
+        if not parts:
+            if not line.strip():
+                continue
+            start = number
+        parts.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield start, b"\n".join(parts)
+            parts, quotes = [], 0
+    if parts:
+        yield start, b"\n".join(parts)
+
+
+async def read_batches(lines, size: int):
+    batch = []
+    async for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_ndjson(batch):
+    """[(номер, байты)] -> [(номер, PrescriptionCreate или текст ошибки)]"""
+    parsed = []
+    for number, line in batch:
+        try:
+            parsed.append((number, schemas.PrescriptionCreate.model_validate_json(line)))
+        except ValidationError as e:
+            parsed.append((number, error_message(e)))
+    return parsed
+
+
+class CsvParser:
+    """Разбор CSV по пачкам записей; первая запись потока - заголовок"""
+
+    def __init__(self):
+        self.header = None
+
+    def __call__(self, batch):
+        if self.header is None:
+            try:
+                self.header = next(csv.reader([batch[0][1].decode("utf-8-sig")]))
+            except UnicodeDecodeError:
+                raise ValueError("Заголовок CSV не в кодировке UTF-8")
+            missing = [column for column in CSV_COLUMNS if column not in self.header]
+            if missing:
+                raise ValueError(f"В заголовке CSV нет колонок: {', '.join(missing)}")
+            batch = batch[1:]
+
+        parsed, decoded = [], []
+        for number, record in batch:
+            try:
+                decoded.append((number, record.decode("utf-8")))
+            except UnicodeDecodeError:
+                parsed.append((number, "Строка не в кодировке UTF-8"))
+        for (number, _), values in zip(decoded, csv.reader(text for _, text in decoded)):
+            if len(values) != len(self.header):
+                parsed.append((number, f"Ожидается {len(self.header)} колонок, получено {len(values)}"))
+                continue
+            record = dict(zip(self.header, values))
+            try:
+                record["medications"] = json.loads(record["medications"] or "[]")
+            except json.JSONDecodeError:
+                parsed.append((number, "medications: некорректный JSON"))
+                continue
+            record["image_url"] = record.get("image_url") or None
+            try:
+                parsed.append((number, schemas.PrescriptionCreate.model_validate(record)))
+            except ValidationError as e:
+                parsed.append((number, error_message(e)))
+        return parsed
+
+
+async def write_chunk(db, prescriptions: list, now: datetime):
+    """Записать пачку проверенных рецептов, их лекарства и события prescription_uploaded"""
+    rows, medication_rows, events = [], [], []
+    for prescription in prescriptions:
+        prescription_id = uuid.uuid4()
+        expiry_date = datetime.combine(prescription.expiry_date, time.min)
+        medications = [med.model_dump(mode="json") for med in prescription.medications]
+        rows.append({
+            "id": prescription_id,
+            "user_id": prescription.user_id,
+            "doctor_name": prescription.doctor_name,
+            "clinic_name": prescription.clinic_name,
+            "issue_date": datetime.combine(prescription.issue_date, time.min),
+            "expiry_date": expiry_date,
+            "medications": medications,
+            "image_url": prescription.image_url,
+            "status": models.PrescriptionStatus.PENDING,
+            "created_at": now,
+            "updated_at": now,
+        })
+        medication_rows.extend(
+            {
+                "prescription_id": prescription_id,
+                "user_id": prescription.user_id,
+                "product_id": med.product_id,
+                "quantity": med.quantity,
+                "status": models.PrescriptionStatus.PENDING,
+                "expiry_date": expiry_date,
+            }
+            for med in prescription.medications
+        )
+        events.append({
+            "prescription_id": str(prescription_id),
+            "user_id": str(prescription.user_id),
+            "doctor_name": prescription.doctor_name,
+            "uploaded_at": now.isoformat()
+        })
+
+    # Core по таблицам, а не ORM bulk insert: без разбора строк под сущности
+    await db.execute(insert(models.Prescription.__table__), rows)
+    await db.execute(insert(models.PrescriptionMedication.__table__), medication_rows)
+    await outbox.add_events(db, "prescription_uploaded", events)
+    await db.commit()
+    outbox.relay.notify()
+
+
+async def import_prescriptions(chunks, fmt: str, session_factory=None,
+                               chunk_size: int = IMPORT_CHUNK_SIZE, max_errors: int = IMPORT_MAX_ERRORS) -> dict:
+    """Импортировать поток кусков NDJSON или CSV; вернуть отчет в форме schemas.PrescriptionImportReport.
+
+    Пачка фиксируется отдельной транзакцией: после сбоя уже записанные пачки остаются
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неподдерживаемый формат импорта: {fmt}")
+    if fmt == "ndjson":
+        parse, records = parse_ndjson, read_lines(chunks)
+    else:
+        parse, records = CsvParser(), read_csv_records(chunks)
+    session_factory = session_factory or database.AsyncSessionLocal
+    report = {"imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    async with session_factory() as db:
+        async for batch in read_batches(records, chunk_size):
+            parsed = parse(batch)
+            errors = [(number, item) for number, item in parsed if isinstance(item, str)]
+            valid, invalid = validation.validate_batch(
+                [(number, item) for number, item in parsed if not isinstance(item, str)]
+            )
+            errors.extend(invalid)
+            if valid:
+                await write_chunk(db, [prescription for _, prescription in valid], datetime.utcnow())
+
+            report["imported"] += len(valid)
+            report["failed"] += len(errors)
+            for number, error in sorted(errors):
+                if len(report["errors"]) >= max_errors:
+                    report["errors_truncated"] = True
+                    break
+                report["errors"].append({"line": number, "error": error})
+    return report
+
+
+async def read_file(path: str, chunk_size: int = 1024 * 1024):
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def main(args):
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    report = asyncio.run(import_prescriptions(read_file(args.path), fmt, chunk_size=args.chunk_size))
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    if report["errors_truncated"]:
+        print("... more errors omitted")
+    print(f"Imported {report['imported']}, failed {report['failed']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт рецептов")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    main(parser.parse_args())
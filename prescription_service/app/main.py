@@ -1,18 +1,41 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 import asyncio
-from . import models, database
-from .routes import router
-from .rabbitmq import consume_messages
-
-models.Base.metadata.create_all(bind=database.engine)
+from . import rabbitmq, outbox, dedup, metrics, database, retention, replicas
+from .routes import router, read_replicas
 
 app = FastAPI(title="Prescription Service", version="1.0.0")
 app.include_router(router, prefix="/api")
+app.add_middleware(replicas.ConsistencyMiddleware)
+replicas.track_commits(database.async_engine)
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(database.async_engine, "async")
+    metrics.instrument_engine(database.engine, "sync")
+    for index, replica in enumerate(read_replicas.replicas):
+        metrics.instrument_engine(replica.async_engine, f"replica{index}")
+
+background_tasks = []
 
 @app.on_event("startup")
 async def startup_event():
-    """Запуск потребителя RabbitMQ при старте приложения"""
-    asyncio.create_task(consume_messages())
+    """Запуск потребителя RabbitMQ, ретрансляции outbox и фоновой очистки при старте приложения"""
+    await rabbitmq.publisher.start()
+    rabbitmq.cart_cleared_consumer.start()
+    background_tasks.append(asyncio.create_task(outbox.relay.run()))
+    background_tasks.append(asyncio.create_task(dedup.run_cleanup()))
+    background_tasks.append(asyncio.create_task(retention.expired_prescriptions_sweeper.run()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Дообрабатываем полученные сообщения, останавливаем фоновые задачи, досылаем буфер и закрываем соединение"""
+    await rabbitmq.cart_cleared_consumer.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await rabbitmq.publisher.stop()
 
 @app.get("/")
 def read_root():
@@ -20,4 +43,25 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "prescription"}
\ No newline at end of file
+    return {"status": "healthy", "service": "prescription"}
+
+@app.get("/stats/amqp")
+def amqp_stats():
+    return {
+        **rabbitmq.publisher.stats.snapshot(),
+        "consumers": {
+            rabbitmq.cart_cleared_consumer.queue_name: {
+                **rabbitmq.cart_cleared_consumer.stats.snapshot(),
+                "dedup": rabbitmq.cart_cleared_dedup.stats()
+            }
+        }
+    }
+
+@app.get("/stats/sweeper")
+def sweeper_stats():
+    sweeper = retention.expired_prescriptions_sweeper
+    return {sweeper.name: sweeper.stats.snapshot()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
\ No newline at end of file
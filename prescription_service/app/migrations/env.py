@@ -0,0 +1,32 @@
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+# Метаданные моделей и имя таблицы версий передает app.migrate через config.attributes
+config = context.config
+options = {
+    "target_metadata": config.attributes["target_metadata"],
+    "version_table": config.attributes["version_table"],
+    "include_name": config.attributes["include_name"],
+    "transaction_per_migration": True,
+    "render_as_batch": True,
+}
+
+
+def run_migrations_offline():
+    context.configure(url=config.get_main_option("sqlalchemy.url"), literal_binds=True, **options)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = create_engine(config.get_main_option("sqlalchemy.url"), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, **options)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
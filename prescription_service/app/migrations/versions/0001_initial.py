@@ -0,0 +1,39 @@
+"""Исходная схема рецептов (то, что раньше создавал create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "prescriptions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("doctor_name", sa.String(), nullable=False),
+        sa.Column("clinic_name", sa.String(), nullable=False),
+        sa.Column("issue_date", sa.DateTime(), nullable=False),
+        sa.Column("expiry_date", sa.DateTime(), nullable=False),
+        sa.Column("medications", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=False),
+        sa.Column("image_url", sa.String()),
+        sa.Column("status", sa.Enum("PENDING", "APPROVED", "REJECTED", name="prescriptionstatus")),
+        sa.Column("verified_by", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("verified_at", sa.DateTime(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table("prescriptions")
+    sa.Enum(name="prescriptionstatus").drop(op.get_bind(), checkfirst=True)
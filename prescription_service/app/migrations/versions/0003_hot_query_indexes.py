@@ -0,0 +1,30 @@
+"""Индекс для выборок рецептов пользователя по статусу и дате
+
+В Postgres индекс строится CONCURRENTLY вне транзакции, без блокировки записи.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_prescriptions_user_status_created", "prescriptions", ["user_id", "status", "created_at"],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_prescriptions_user_status_created", table_name="prescriptions",
+            postgresql_concurrently=True, if_exists=True
+        )
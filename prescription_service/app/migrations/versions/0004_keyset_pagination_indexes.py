@@ -0,0 +1,38 @@
+"""Индексы для постраничных списков по ключу (created_at, id)
+
+Индекс из 0003 заменяется версией с id в конце, чтобы и при фильтре по статусу
+порядок страницы полностью задавался индексом. Все индексы строятся и
+удаляются CONCURRENTLY.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_prescriptions_user_status_created_id", ["user_id", "status", "created_at", "id"]),
+    ("ix_prescriptions_user_created_id", ["user_id", "created_at", "id"]),
+    ("ix_prescriptions_status_created_id", ["status", "created_at", "id"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "prescriptions", columns, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index("ix_prescriptions_user_status_created", table_name="prescriptions",
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_prescriptions_user_status_created", "prescriptions", ["user_id", "status", "created_at"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="prescriptions", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,26 @@
+"""Аренда рецептов в очереди проверки фармацевтов
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("prescriptions") as batch:
+        batch.add_column(sa.Column("claimed_by", postgresql.UUID(as_uuid=True), nullable=True))
+        batch.add_column(sa.Column("claim_expires_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("prescriptions") as batch:
+        batch.drop_column("claim_expires_at")
+        batch.drop_column("claimed_by")
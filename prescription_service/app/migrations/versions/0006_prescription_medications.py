@@ -0,0 +1,74 @@
+"""Нормализованная таблица лекарств для поиска покрытия товаров рецептами
+
+Существующие рецепты переносятся из JSONB: в Postgres одним INSERT ... SELECT
+через jsonb_array_elements, в остальных СУБД построчно.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+import uuid
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    medications = op.create_table(
+        "prescription_medications",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("prescription_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("prescriptions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("product_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("status", postgresql.ENUM("PENDING", "APPROVED", "REJECTED", name="prescriptionstatus",
+                                            create_type=False), nullable=False),
+        sa.Column("expiry_date", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_prescription_medications_coverage", "prescription_medications",
+                    ["user_id", "product_id", "status", "expiry_date"])
+    op.create_index("ix_prescription_medications_prescription_id", "prescription_medications", ["prescription_id"])
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            "INSERT INTO prescription_medications (prescription_id, user_id, product_id, quantity, status, expiry_date) "
+            "SELECT p.id, p.user_id, (m->>'product_id')::uuid, (m->>'quantity')::int, p.status, p.expiry_date "
+            "FROM prescriptions p CROSS JOIN LATERAL jsonb_array_elements(p.medications) AS m"
+        )
+        return
+
+    prescriptions = sa.table(
+        "prescriptions",
+        sa.column("id", postgresql.UUID(as_uuid=True)),
+        sa.column("user_id", postgresql.UUID(as_uuid=True)),
+        sa.column("medications", sa.JSON()),
+        sa.column("status", sa.String()),
+        sa.column("expiry_date", sa.DateTime()),
+    )
+    rows = [
+        {
+            "prescription_id": row.id,
+            "user_id": row.user_id,
+            "product_id": uuid.UUID(med["product_id"]),
+            "quantity": med["quantity"],
+            "status": row.status,
+            "expiry_date": row.expiry_date,
+        }
+        for row in bind.execute(sa.select(prescriptions))
+        for med in row.medications
+    ]
+    if rows:
+        op.bulk_insert(medications, rows)
+
+
+def downgrade():
+    op.drop_index("ix_prescription_medications_prescription_id", table_name="prescription_medications")
+    op.drop_index("ix_prescription_medications_coverage", table_name="prescription_medications")
+    op.drop_table("prescription_medications")
@@ -0,0 +1,29 @@
+"""Таблица обработанных сообщений для дедупликации потребителей
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "prescription_processed_messages",
+        sa.Column("consumer", sa.String(64), primary_key=True),
+        sa.Column("message_id", sa.String(128), primary_key=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_prescription_processed_messages_processed_at", "prescription_processed_messages",
+                    ["processed_at"])
+
+
+def downgrade():
+    op.drop_index("ix_prescription_processed_messages_processed_at", table_name="prescription_processed_messages")
+    op.drop_table("prescription_processed_messages")
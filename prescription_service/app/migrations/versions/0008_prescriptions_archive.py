@@ -0,0 +1,47 @@
+"""Архив просроченных рецептов и индекс для их поиска
+
+Индекс (status, expiry_date) строится CONCURRENTLY, без блокировки записи.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "prescriptions_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("doctor_name", sa.String(), nullable=False),
+        sa.Column("clinic_name", sa.String(), nullable=False),
+        sa.Column("issue_date", sa.DateTime(), nullable=False),
+        sa.Column("expiry_date", sa.DateTime(), nullable=False),
+        sa.Column("medications", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=False),
+        sa.Column("image_url", sa.String()),
+        sa.Column("status", postgresql.ENUM("PENDING", "APPROVED", "REJECTED", name="prescriptionstatus",
+                                            create_type=False), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_prescriptions_archive_user_id", "prescriptions_archive", ["user_id"])
+    with op.get_context().autocommit_block():
+        op.create_index("ix_prescriptions_status_expiry", "prescriptions", ["status", "expiry_date"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_prescriptions_status_expiry", table_name="prescriptions",
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_index("ix_prescriptions_archive_user_id", table_name="prescriptions_archive")
+    op.drop_table("prescriptions_archive")
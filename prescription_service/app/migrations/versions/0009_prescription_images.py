@@ -0,0 +1,31 @@
+"""Сканы рецептов в хранилище с адресацией по содержимому
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+TABLES = ("prescriptions", "prescriptions_archive")
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(sa.Column("image_digest", sa.String(64), nullable=True))
+            batch.add_column(sa.Column("image_size", sa.BigInteger(), nullable=True))
+            batch.add_column(sa.Column("image_content_type", sa.String(), nullable=True))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("image_content_type")
+            batch.drop_column("image_size")
+            batch.drop_column("image_digest")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, BigInteger, DateTime, Enum, ForeignKey, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
@@ -15,6 +15,14 @@ class PrescriptionStatus(str, enum.Enum):
 
 class Prescription(Base):
     __tablename__ = "prescriptions"
+    __table_args__ = (
+        # Ключ пагинации (created_at, id) в конце каждого индекса: страницы читаются диапазоном индекса
+        Index("ix_prescriptions_user_status_created_id", "user_id", "status", "created_at", "id"),
+        Index("ix_prescriptions_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_prescriptions_status_created_id", "status", "created_at", "id"),
+        # Поиск просроченных рецептов на проверке фоновой очисткой
+        Index("ix_prescriptions_status_expiry", "status", "expiry_date"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False)
@@ -22,11 +30,82 @@ class Prescription(Base):
     clinic_name = Column(String, nullable=False)
     issue_date = Column(DateTime, nullable=False)
     expiry_date = Column(DateTime, nullable=False)
-    medications = Column(JSONB, nullable=False)  # Храним массив medications как JSON
+    medications = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)  # Храним массив medications как JSON
     image_url = Column(String)
+    # Скан, загруженный в хранилище: SHA-256 содержимого - имя объекта (app.storage)
+    image_digest = Column(String(64), nullable=True)
+    image_size = Column(BigInteger, nullable=True)
+    image_content_type = Column(String, nullable=True)
     status = Column(Enum(PrescriptionStatus), default=PrescriptionStatus.PENDING)
     verified_by = Column(UUID(as_uuid=True), nullable=True)
     verified_at = Column(DateTime, nullable=True)
     notes = Column(Text, nullable=True)
+    # Аренда рецепта фармацевтом в очереди проверки; истекшая аренда освобождает рецепт
+    claimed_by = Column(UUID(as_uuid=True), nullable=True)
+    claim_expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PrescriptionArchive(Base):
+    """Рецепт, вынесенный из горячей таблицы: просрочен, так и не пройдя проверку"""
+    __tablename__ = "prescriptions_archive"
+    __table_args__ = (
+        Index("ix_prescriptions_archive_user_id", "user_id"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    doctor_name = Column(String, nullable=False)
+    clinic_name = Column(String, nullable=False)
+    issue_date = Column(DateTime, nullable=False)
+    expiry_date = Column(DateTime, nullable=False)
+    medications = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    image_url = Column(String)
+    image_digest = Column(String(64))
+    image_size = Column(BigInteger)
+    image_content_type = Column(String)
+    status = Column(Enum(PrescriptionStatus), nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PrescriptionMedication(Base):
+    """Лекарство из рецепта отдельной строкой: поиск покрытия товара идет по индексу, а не по JSONB.
+    Статус и срок действия копируются из рецепта и обновляются при загрузке и проверке"""
+    __tablename__ = "prescription_medications"
+    __table_args__ = (
+        Index("ix_prescription_medications_coverage", "user_id", "product_id", "status", "expiry_date"),
+        Index("ix_prescription_medications_prescription_id", "prescription_id"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    prescription_id = Column(UUID(as_uuid=True), ForeignKey("prescriptions.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    product_id = Column(UUID(as_uuid=True), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(Enum(PrescriptionStatus), nullable=False)
+    expiry_date = Column(DateTime, nullable=False)
+
+
+class OutboxEvent(Base):
+    """Событие, записанное в одной транзакции с бизнес-изменением и ожидающее отправки в RabbitMQ"""
+    __tablename__ = "prescription_outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    routing_key = Column(String, nullable=False)
+    payload = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ProcessedMessage(Base):
+    """Id уже обработанных сообщений для отсечения повторных доставок; строки старше TTL удаляются"""
+    __tablename__ = "prescription_processed_messages"
+    __table_args__ = (
+        Index("ix_prescription_processed_messages_processed_at", "processed_at"),
+    )
+
+    consumer = Column(String(64), primary_key=True)
+    message_id = Column(String(128), primary_key=True)
+    processed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
\ No newline at end of file
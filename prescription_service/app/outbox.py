@@ -0,0 +1,98 @@
+import asyncio
+import os
+from sqlalchemy import select, insert, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, database, rabbitmq
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+
+
+def add_event(db: AsyncSession, routing_key: str, payload: dict):
+    """Записать событие в outbox в текущей транзакции (commit делает вызывающий код)"""
+    db.add(models.OutboxEvent(routing_key=routing_key, payload=payload))
+
+
+async def add_events(db: AsyncSession, routing_key: str, payloads: list):
+    """Записать пачку событий одним multi-row INSERT в текущей транзакции (массовый импорт)"""
+    if payloads:
+        await db.execute(insert(models.OutboxEvent.__table__), [
+            {"routing_key": routing_key, "payload": payload} for payload in payloads
+        ])
+
+
+async def _claim_batch(db: AsyncSession, batch_size: int) -> list:
+    """Забрать пачку событий; SKIP LOCKED позволяет нескольким репликам делить работу"""
+    result = await db.execute(
+        select(models.OutboxEvent)
+        .order_by(models.OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    return result.scalars().all()
+
+
+def message_id(event: models.OutboxEvent) -> str:
+    """Стабильный id сообщения: повторная отправка неподтвержденного события получит тот же id"""
+    return f"{models.OutboxEvent.__tablename__}:{event.id}"
+
+
+class OutboxRelay:
+    """Фоновая ретрансляция outbox в RabbitMQ пачками"""
+
+    def __init__(self, publisher, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL, session_factory=None):
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory or database.AsyncSessionLocal
+        self._wakeup = None
+
+    def notify(self):
+        """Разбудить ретранслятор сразу после commit, не дожидаясь интервала опроса"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def relay_batch(self) -> int:
+        """Отправить одну пачку событий и удалить подтвержденные брокером. Возвращает число подтвержденных"""
+        async with self.session_factory() as db:
+            # Блокировки строк держатся до commit, пока ждем подтверждений брокера
+            events = await _claim_batch(db, self.batch_size)
+            if not events:
+                await db.rollback()
+                return 0
+
+            results = await asyncio.gather(
+                *(self.publisher.publish(event.routing_key, event.payload, message_id=message_id(event))
+                  for event in events),
+                return_exceptions=True
+            )
+            confirmed = [event.id for event, result in zip(events, results)
+                         if not isinstance(result, BaseException)]
+            if len(confirmed) < len(events):
+                print(f"Outbox relay: {len(events) - len(confirmed)} events not confirmed, will retry")
+
+            if confirmed:
+                await db.execute(delete(models.OutboxEvent).where(models.OutboxEvent.id.in_(confirmed)))
+            await db.commit()
+            return len(confirmed)
+
+    async def run(self):
+        """Цикл ретрансляции: полные пачки подряд, иначе ждем notify или интервал опроса"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                relayed = await self.relay_batch()
+            except Exception as e:
+                print(f"Outbox relay error: {e}")
+                relayed = 0
+
+            if relayed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+
+relay = OutboxRelay(rabbitmq.publisher)
@@ -0,0 +1,41 @@
+import base64
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import tuple_
+from . import models
+
+
+def encode_cursor(created_at: datetime, prescription_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{prescription_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Разбор курсора; ValueError, если курсор поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, prescription_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(prescription_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+def keyset_page(query, cursor: Optional[str], limit: int, descending: bool):
+    """Страница по ключу (created_at, id): условие по курсору вместо OFFSET, берем limit + 1 строку"""
+    key = tuple_(models.Prescription.created_at, models.Prescription.id)
+    if cursor:
+        position = decode_cursor(cursor)
+        query = query.where(key < position if descending else key > position)
+    if descending:
+        query = query.order_by(models.Prescription.created_at.desc(), models.Prescription.id.desc())
+    else:
+        query = query.order_by(models.Prescription.created_at, models.Prescription.id)
+    return query.limit(limit + 1)
+
+
+def next_cursor(rows: list, limit: int) -> Optional[str]:
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(last.created_at, last.id)
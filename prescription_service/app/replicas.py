@@ -0,0 +1,154 @@
+"""Чтение с реплик и гарантия read-your-writes.
+
+GET-маршруты читают через ReplicaSet.session: реплика выбирается по кругу
+(REPLICA_POLICY=round_robin) или по наименьшему числу открытых сессий
+(least_connections), запись всегда идет в основную базу.
+
+После commit в основной базе ConsistencyMiddleware добавляет к ответу токен -
+время commit - в заголовке X-Consistency-Token и в cookie. Пока токен моложе
+READ_YOUR_WRITES_SECONDS (должно быть больше допустимого отставания реплик),
+чтения этого клиента идут в основную базу и видят его собственную запись.
+
+    DATABASE_REPLICA_URLS="postgresql://replica1/...,postgresql://replica2/..."
+"""
+import contextlib
+import contextvars
+import os
+import time
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from . import database, metrics
+
+DATABASE_REPLICA_URLS = os.getenv("DATABASE_REPLICA_URLS", "")
+REPLICA_POLICY = os.getenv("REPLICA_POLICY", "round_robin")
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+CONSISTENCY_HEADER = "x-consistency-token"
+CONSISTENCY_COOKIE = "consistency_token"
+POLICIES = ("round_robin", "least_connections")
+
+
+def parse_urls(value: str) -> list:
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class Replica:
+    """Движок одной реплики и число открытых через него сессий"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.async_engine = create_async_engine(database.to_async_url(url))
+        self.session_factory = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.in_use = 0
+
+
+def is_fresh(token: Optional[float], window: float = READ_YOUR_WRITES_SECONDS) -> bool:
+    """Клиент писал недавно: реплики могли еще не получить его запись"""
+    if token is None:
+        return False
+    # Токен из будущего (расхождение часов между репликами сервиса) тоже считаем свежим, но не дольше окна
+    return abs(time.time() - token) < window
+
+
+def read_token(request) -> Optional[float]:
+    """Токен из заголовка или cookie запроса; некорректный токен игнорируется"""
+    value = request.headers.get(CONSISTENCY_HEADER) or request.cookies.get(CONSISTENCY_COOKIE)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class ReplicaSet:
+    """Основная база и реплики для чтения; без реплик все чтения идут в основную базу"""
+
+    def __init__(self, primary_session_factory, urls=(), policy: str = REPLICA_POLICY,
+                 window: float = READ_YOUR_WRITES_SECONDS):
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика выбора реплики: {policy}")
+        self.primary_session_factory = primary_session_factory
+        self.replicas = [Replica(url) for url in urls]
+        self.policy = policy
+        self.window = window
+        self._next = 0
+
+    def choose(self) -> Replica:
+        if self.policy == "least_connections":
+            return min(self.replicas, key=lambda replica: replica.in_use)
+        replica = self.replicas[self._next % len(self.replicas)]
+        self._next += 1
+        return replica
+
+    @contextlib.asynccontextmanager
+    async def session(self, token: Optional[float] = None):
+        """Сессия для чтения. db.info["primary"] сообщает, видит ли она все зафиксированные записи"""
+        if not self.replicas or is_fresh(token, self.window):
+            metrics.DB_READ_SESSIONS.labels("primary" if not self.replicas else "primary_after_write").inc()
+            async with self.primary_session_factory() as db:
+                db.info["primary"] = True
+                yield db
+            return
+
+        replica = self.choose()
+        metrics.DB_READ_SESSIONS.labels("replica").inc()
+        replica.in_use += 1
+        try:
+            async with replica.session_factory() as db:
+                db.info["primary"] = False
+                yield db
+        finally:
+            replica.in_use -= 1
+
+
+class _RequestWrites:
+    __slots__ = ("committed_at",)
+
+    def __init__(self):
+        self.committed_at = None
+
+
+_request_writes = contextvars.ContextVar("request_writes", default=None)
+
+
+def track_commits(engine):
+    """Отмечать commit в основной базе во время запроса; вызывается для каждого основного движка"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "commit")
+    def on_commit(conn):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.committed_at = time.time()
+
+
+class ConsistencyMiddleware:
+    """ASGI-middleware: к ответу на запрос, который сделал commit, добавляется токен read-your-writes"""
+
+    def __init__(self, app, window: float = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = _RequestWrites()
+        token = _request_writes.set(writes)
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and writes.committed_at is not None:
+                value = f"{writes.committed_at:.6f}"
+                cookie = f"{CONSISTENCY_COOKIE}={value}; Max-Age={int(self.window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (CONSISTENCY_HEADER.encode(), value.encode()),
+                    (b"set-cookie", cookie.encode()),
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_token)
+        finally:
+            _request_writes.reset(token)
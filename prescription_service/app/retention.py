@@ -0,0 +1,58 @@
+"""Архивирование рецептов, просроченных до проверки.
+
+Рецепт в статусе PENDING с истекшим сроком уже нельзя подтвердить (check_expiry),
+но он остается в горячей таблице и замедляет выборки по статусу. Каждая пачка -
+одна короткая транзакция: блокировка рецептов (SKIP LOCKED, чтобы не ждать
+рецепты, которые сейчас проверяет фармацевт), копия в prescriptions_archive,
+удаление строк лекарств и рецептов и одно событие prescriptions_expired на пачку.
+"""
+from datetime import datetime
+from sqlalchemy import select, insert, delete, literal, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, outbox
+from .sweeper import Sweeper
+
+ARCHIVED_COLUMNS = ("id", "user_id", "doctor_name", "clinic_name", "issue_date", "expiry_date",
+                    "medications", "image_url", "image_digest", "image_size", "image_content_type",
+                    "status", "created_at", "updated_at")
+
+
+async def archive_expired_prescriptions(db: AsyncSession, batch_size: int, now: datetime) -> int:
+    """Перенести в архив одну пачку просроченных рецептов на проверке; вернуть число перенесенных"""
+    # Рецепт действует до конца дня expiry_date, как и в check_expiry
+    today = datetime.combine(now.date(), datetime.min.time())
+    prescription = models.Prescription
+    prescription_ids = (await db.execute(
+        select(prescription.id)
+        .where(prescription.status == models.PrescriptionStatus.PENDING, prescription.expiry_date < today)
+        .order_by(prescription.expiry_date)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    if not prescription_ids:
+        await db.rollback()
+        return 0
+
+    await db.execute(
+        insert(models.PrescriptionArchive).from_select(
+            ARCHIVED_COLUMNS + ("archived_at",),
+            select(*(getattr(prescription, column) for column in ARCHIVED_COLUMNS), literal(now, DateTime()))
+            .where(prescription.id.in_(prescription_ids))
+        )
+    )
+    await db.execute(
+        delete(models.PrescriptionMedication).where(models.PrescriptionMedication.prescription_id.in_(prescription_ids))
+    )
+    archived = (await db.execute(
+        delete(prescription).where(prescription.id.in_(prescription_ids)).returning(prescription.id, prescription.user_id)
+    )).all()
+    outbox.add_event(db, "prescriptions_expired", {
+        "prescriptions": [{"prescription_id": str(row.id), "user_id": str(row.user_id)} for row in archived],
+        "archived_at": now.isoformat()
+    })
+    await db.commit()
+    outbox.relay.notify()
+    return len(archived)
+
+
+expired_prescriptions_sweeper = Sweeper("expired_prescriptions", archive_expired_prescriptions)
@@ -1,58 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select, insert, update, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from datetime import datetime
-import asyncio
-from . import models, schemas, database, rabbitmq
+from datetime import datetime, timedelta
+from typing import List, Optional
+import os
+from . import models, schemas, database, outbox, pagination, replicas, storage, validation, importer, exporter
+from .serialization import respond
 
 router = APIRouter()
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Сколько рецепт остается за фармацевтом после claim
+CLAIM_LEASE_SECONDS = int(os.getenv("CLAIM_LEASE_SECONDS", "900"))
 
-def get_db():
-    db = database.SessionLocal()
-    try:
+# Компактная проекция для списков: без JSONB medications, если его не запросили
+SUMMARY_COLUMNS = (
+    models.Prescription.id,
+    models.Prescription.user_id,
+    models.Prescription.doctor_name,
+    models.Prescription.clinic_name,
+    models.Prescription.issue_date,
+    models.Prescription.expiry_date,
+    models.Prescription.status,
+    models.Prescription.created_at,
+)
+
+
+read_replicas = replicas.ReplicaSet(database.AsyncSessionLocal, replicas.parse_urls(replicas.DATABASE_REPLICA_URLS))
+
+
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def get_read_db(request: Request):
+    """Сессия для чтения: реплика, если клиент не писал в последние READ_YOUR_WRITES_SECONDS"""
+    async with read_replicas.session(replicas.read_token(request)) as db:
+        yield db
+
+
+class ClaimConflict(ValueError):
+    pass
+
+
+# Проверки перед подтверждением/отклонением, общие для одиночной и пакетной проверки
+def validate_prescription_status(current_status):
+    """Проверка текущего статуса рецепта"""
+    if current_status != models.PrescriptionStatus.PENDING:
+        raise ValueError("Рецепт уже был проверен")
+
+
+def check_expiry(expiry_date):
+    """Проверка срока действия"""
+    if expiry_date.date() < datetime.now().date():
+        raise ValueError("Рецепт просрочен и не может быть подтвержден")
+
+
+def validate_verifier(verified_by):
+    """Валидация проверяющего (в реальной системе проверялись бы права)"""
+    if not verified_by:
+        raise ValueError("Не указан проверяющий")
+
+
+def check_claim(prescription: models.Prescription, verified_by: UUID, now: datetime):
+    """Рецепт, взятый в работу другим фармацевтом, нельзя проверить до истечения аренды"""
+    if (prescription.claimed_by is not None and prescription.claimed_by != verified_by
+            and prescription.claim_expires_at is not None and prescription.claim_expires_at > now):
+        raise ClaimConflict("Рецепт взят в работу другим фармацевтом")
+
+
+def medication_rows(prescription: models.Prescription) -> list:
+    """Строки prescription_medications для нового рецепта"""
+    return [
+        {
+            "prescription_id": prescription.id,
+            "user_id": prescription.user_id,
+            "product_id": UUID(med["product_id"]),
+            "quantity": med["quantity"],
+            "status": prescription.status,
+            "expiry_date": prescription.expiry_date,
+        }
+        for med in prescription.medications
+    ]
+
+
+def summary_content(row, include_medications: bool) -> dict:
+    """Строка списка в форме schemas.PrescriptionSummary.
+
+    medications уже лежат в базе в форме MedicationResponse (model_dump при загрузке),
+    поэтому отдаются как есть, без повторной валидации каждого лекарства
+    """
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "doctor_name": row.doctor_name,
+        "clinic_name": row.clinic_name,
+        "issue_date": row.issue_date,
+        "expiry_date": row.expiry_date,
+        "status": row.status,
+        "created_at": row.created_at,
+        "medications": row.medications if include_medications else None
+    }
+
+
+def verified_event(prescription: models.Prescription, status: models.PrescriptionStatus, verified_at: datetime) -> dict:
+    """Событие prescription_verified: по нему cart_service ведет свою проекцию допуска к рецептурным товарам"""
+    return {
+        "prescription_id": str(prescription.id),
+        "user_id": str(prescription.user_id),
+        "status": status.value,
+        "expiry_date": prescription.expiry_date.isoformat(),
+        "verified_at": verified_at.isoformat(),
+        "medications": [
+            {"product_id": med["product_id"], "quantity": med["quantity"]} for med in prescription.medications
+        ]
+    }
+
+
+async def sync_medication_status(db: AsyncSession, prescription_ids: list, status: models.PrescriptionStatus):
+    """Перенести новый статус рецептов в prescription_medications в той же транзакции"""
+    await db.execute(
+        update(models.PrescriptionMedication)
+        .where(models.PrescriptionMedication.prescription_id.in_(prescription_ids))
+        .values(status=status)
+    )
 
 
 @router.post("/prescriptions", response_model=schemas.PrescriptionUploadResponse)
-async def upload_prescription(prescription: schemas.PrescriptionCreate, db: Session = Depends(get_db)):
+async def upload_prescription(prescription: schemas.PrescriptionCreate, db: AsyncSession = Depends(get_db)):
     """Загрузить рецепт"""
-
-    # Вложенные функции для валидации
-    def validate_dates(issue_date, expiry_date):
-        """Валидация дат рецепта"""
-        if issue_date > datetime.now().date():
-            raise ValueError("Дата выписки не может быть в будущем")
-        if expiry_date <= issue_date:
-            raise ValueError("Срок действия должен быть после даты выписки")
-        if expiry_date < datetime.now().date():
-            raise ValueError("Рецепт уже просрочен")
-
-    def validate_medications(medications):
-        """Валидация списка лекарств"""
-        if not medications:
-            raise ValueError("Рецепт должен содержать хотя бы одно лекарство")
-
-        for med in medications:
-            if med.quantity <= 0:
-                raise ValueError("Количество лекарства должно быть положительным")
-            if not med.product_name.strip():
-                raise ValueError("Название лекарства не может быть пустым")
-
-    def validate_doctor_info(doctor_name, clinic_name):
-        """Валидация информации о враче"""
-        if not doctor_name.strip():
-            raise ValueError("ФИО врача не может быть пустым")
-        if not clinic_name.strip():
-            raise ValueError("Название клиники не может быть пустым")
-
-    # Применяем валидацию
     try:
-        validate_dates(prescription.issue_date, prescription.expiry_date)
-        validate_medications(prescription.medications)
-        validate_doctor_info(prescription.doctor_name, prescription.clinic_name)
+        validation.validate_prescription(prescription)
 
         # Создаем рецепт
         new_prescription = models.Prescription(
@@ -61,21 +143,25 @@ async def upload_prescription(prescription: schemas.PrescriptionCreate, db: Sess
             clinic_name=prescription.clinic_name,
             issue_date=prescription.issue_date,
             expiry_date=prescription.expiry_date,
-            medications=[med.dict() for med in prescription.medications],
-            image_url=prescription.image_url
+            medications=[med.model_dump(mode="json") for med in prescription.medications],
+            image_url=prescription.image_url,
+            status=models.PrescriptionStatus.PENDING
         )
 
         db.add(new_prescription)
-        db.commit()
-        db.refresh(new_prescription)
+        await db.flush()
+        # Core executemany без RETURNING: один запрос на все лекарства, а не INSERT на строку
+        await db.execute(insert(models.PrescriptionMedication), medication_rows(new_prescription))
 
-        # Отправляем сообщение о загрузке рецепта
-        asyncio.create_task(rabbitmq.send_prescription_uploaded_message({
+        # Событие о загрузке рецепта пишем в outbox в той же транзакции
+        outbox.add_event(db, "prescription_uploaded", {
             "prescription_id": str(new_prescription.id),
             "user_id": str(prescription.user_id),
             "doctor_name": prescription.doctor_name,
             "uploaded_at": new_prescription.created_at.isoformat()
-        }))
+        })
+        await db.commit()
+        outbox.relay.notify()
 
         return schemas.PrescriptionUploadResponse(
             id=new_prescription.id,
@@ -85,39 +171,142 @@ async def upload_prescription(prescription: schemas.PrescriptionCreate, db: Sess
         )
 
     except ValueError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/prescriptions/import", response_model=schemas.PrescriptionImportReport)
+async def import_prescriptions(request: Request, format: Optional[str] = Query(None)):
+    """Массовый импорт рецептов потоком NDJSON или CSV (формат по Content-Type или параметру format)"""
+    try:
+        fmt = format or importer.format_from_content_type(request.headers.get("content-type"))
+        report = await importer.import_prescriptions(request.stream(), fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return respond(report)
+
+
+@router.post("/prescriptions/claim", response_model=schemas.PrescriptionClaimResponse)
+async def claim_prescriptions(pharmacist_id: UUID = Query(...), limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                              db: AsyncSession = Depends(get_db)):
+    """Взять в работу следующие рецепты из очереди на срок аренды"""
+    now = datetime.utcnow()
+    lease_expires_at = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+
+    # SKIP LOCKED: параллельные запросы разбирают разные строки, не дожидаясь друг друга
+    available = (
+        select(models.Prescription.id)
+        .where(
+            models.Prescription.status == models.PrescriptionStatus.PENDING,
+            or_(models.Prescription.claim_expires_at.is_(None), models.Prescription.claim_expires_at <= now)
+        )
+        .order_by(models.Prescription.created_at, models.Prescription.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = (await db.execute(
+        update(models.Prescription)
+        .where(models.Prescription.id.in_(available.scalar_subquery()))
+        .values(claimed_by=pharmacist_id, claim_expires_at=lease_expires_at)
+        .returning(*SUMMARY_COLUMNS, models.Prescription.medications)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+
+    rows.sort(key=lambda row: (row.created_at, row.id))
+    return respond({
+        "items": [summary_content(row, include_medications=True) for row in rows],
+        "claimed_by": pharmacist_id,
+        "lease_expires_at": lease_expires_at
+    })
+
+
+@router.patch("/prescriptions/verify:batch", response_model=schemas.PrescriptionBatchVerifyResponse)
+async def batch_verify_prescriptions(batch: schemas.PrescriptionBatchVerify, db: AsyncSession = Depends(get_db)):
+    """Применить решения по многим рецептам в одной транзакции"""
+    now = datetime.utcnow()
+    prescription_ids = [decision.prescription_id for decision in batch.decisions]
+    if len(set(prescription_ids)) != len(prescription_ids):
+        raise HTTPException(status_code=400, detail="Рецепт указан в пачке несколько раз")
+
+    # Блокируем все строки пачки одним запросом в порядке id, чтобы пачки не взаимоблокировались
+    prescriptions = {
+        prescription.id: prescription
+        for prescription in (await db.execute(
+            select(models.Prescription)
+            .where(models.Prescription.id.in_(prescription_ids))
+            .order_by(models.Prescription.id)
+            .with_for_update()
+        )).scalars()
+    }
+
+    results = []
+    updates = []
+    for decision in batch.decisions:
+        prescription = prescriptions.get(decision.prescription_id)
+        try:
+            if prescription is None:
+                raise ValueError("Рецепт не найден")
+            validate_prescription_status(prescription.status)
+            check_expiry(prescription.expiry_date)
+            validate_verifier(batch.verified_by)
+            check_claim(prescription, batch.verified_by, now)
+        except ValueError as e:
+            results.append(schemas.PrescriptionDecisionResult(
+                prescription_id=decision.prescription_id, status=decision.status, applied=False, error=str(e)
+            ))
+            continue
+
+        updates.append({
+            "id": decision.prescription_id,
+            "status": models.PrescriptionStatus(decision.status.value),
+            "verified_by": batch.verified_by,
+            "verified_at": now,
+            "notes": decision.notes,
+            "updated_at": now,
+            "claimed_by": None,
+            "claim_expires_at": None,
+        })
+        results.append(schemas.PrescriptionDecisionResult(
+            prescription_id=decision.prescription_id, status=decision.status, applied=True
+        ))
+
+    if updates:
+        # Пакетный UPDATE по первичному ключу (executemany)
+        await db.execute(update(models.Prescription), updates)
+        for status in {row["status"] for row in updates}:
+            await sync_medication_status(db, [row["id"] for row in updates if row["status"] == status], status)
+        await outbox.add_events(db, "prescription_verified", [
+            verified_event(prescriptions[row["id"]], row["status"], now) for row in updates
+        ])
+    await db.commit()
+    if updates:
+        outbox.relay.notify()
+
+    return schemas.PrescriptionBatchVerifyResponse(
+        applied=len(updates),
+        failed=len(results) - len(updates),
+        results=results
+    )
+
+
 @router.patch("/prescriptions/{prescription_id}/verify", response_model=schemas.PrescriptionVerifyResponse)
-def verify_prescription(prescription_id: UUID, verify_data: schemas.PrescriptionVerify, db: Session = Depends(get_db)):
+async def verify_prescription(prescription_id: UUID, verify_data: schemas.PrescriptionVerify, db: AsyncSession = Depends(get_db)):
     """Проверить рецепт (подтвердить/отклонить)"""
 
-    prescription = db.query(models.Prescription).filter(models.Prescription.id == prescription_id).first()
+    # Блокируем строку: параллельная проверка того же рецепта дождется commit и увидит новый статус
+    prescription = (await db.execute(
+        select(models.Prescription).where(models.Prescription.id == prescription_id).with_for_update()
+    )).scalars().first()
     if not prescription:
         raise HTTPException(status_code=404, detail="Рецепт не найден")
 
-    # Вложенные функции для бизнес-логики проверки
-    def validate_prescription_status(current_status):
-        """Проверка текущего статуса рецепта"""
-        if current_status != models.PrescriptionStatus.PENDING:
-            raise ValueError("Рецепт уже был проверен")
-
-    def check_expiry(expiry_date):
-        """Проверка срока действия"""
-        if expiry_date < datetime.now().date():
-            raise ValueError("Рецепт просрочен и не может быть подтвержден")
-
-    def validate_verifier(verified_by):
-        """Валидация проверяющего (в реальной системе проверялись бы права)"""
-        if not verified_by:
-            raise ValueError("Не указан проверяющий")
-
     # Применяем бизнес-логику
     try:
         validate_prescription_status(prescription.status)
         check_expiry(prescription.expiry_date)
         validate_verifier(verify_data.verified_by)
+        check_claim(prescription, verify_data.verified_by, datetime.utcnow())
 
         # Обновляем рецепт
         prescription.status = verify_data.status
@@ -125,9 +314,15 @@ def verify_prescription(prescription_id: UUID, verify_data: schemas.Prescription
         prescription.verified_at = datetime.utcnow()
         prescription.notes = verify_data.notes
         prescription.updated_at = datetime.utcnow()
+        prescription.claimed_by = None
+        prescription.claim_expires_at = None
+        status = models.PrescriptionStatus(verify_data.status.value)
+        await sync_medication_status(db, [prescription.id], status)
+        outbox.add_event(db, "prescription_verified", verified_event(prescription, status, prescription.verified_at))
 
-        db.commit()
-        db.refresh(prescription)
+        # expire_on_commit=False: атрибуты уже актуальны, повторный SELECT не нужен
+        await db.commit()
+        outbox.relay.notify()
 
         message = "Рецепт подтвержден" if verify_data.status == models.PrescriptionStatus.APPROVED else "Рецепт отклонен"
 
@@ -140,35 +335,211 @@ def verify_prescription(prescription_id: UUID, verify_data: schemas.Prescription
             message=message
         )
 
+    except ClaimConflict as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def list_page(db: AsyncSession, query_filter, cursor: Optional[str], limit: int,
+                    include_medications: bool, descending: bool):
+    """Выборка одной страницы списка рецептов по курсору"""
+    columns = SUMMARY_COLUMNS + ((models.Prescription.medications,) if include_medications else ())
+    try:
+        query = pagination.keyset_page(select(*columns).where(*query_filter), cursor, limit, descending)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = (await db.execute(query)).all()
+    return respond({
+        "items": [summary_content(row, include_medications) for row in rows[:limit]],
+        "next_cursor": pagination.next_cursor(rows, limit)
+    })
+
+
+@router.get("/prescriptions", response_model=schemas.PrescriptionPage)
+async def list_prescriptions(user_id: UUID = Query(...), status: Optional[schemas.PrescriptionStatus] = None,
+                             cursor: Optional[str] = None, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             include_medications: bool = False, db: AsyncSession = Depends(get_read_db)):
+    """Рецепты пользователя, новые первыми"""
+    query_filter = [models.Prescription.user_id == user_id]
+    if status is not None:
+        query_filter.append(models.Prescription.status == models.PrescriptionStatus(status.value))
+    return await list_page(db, query_filter, cursor, limit, include_medications, descending=True)
+
+
+@router.get("/prescriptions/pending", response_model=schemas.PrescriptionPage)
+async def list_pending_prescriptions(cursor: Optional[str] = None,
+                                     limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                     include_medications: bool = False, db: AsyncSession = Depends(get_read_db)):
+    """Очередь фармацевта: рецепты на проверке, старые первыми"""
+    query_filter = [models.Prescription.status == models.PrescriptionStatus.PENDING]
+    return await list_page(db, query_filter, cursor, limit, include_medications, descending=False)
+
+
+@router.get("/prescriptions/export", response_class=StreamingResponse)
+async def export_prescriptions(request: Request, date_from: Optional[datetime] = Query(None, alias="from"),
+                               date_to: Optional[datetime] = Query(None, alias="to"),
+                               status: Optional[schemas.PrescriptionStatus] = None,
+                               format: str = "ndjson", gzip: bool = False):
+    """Выгрузка рецептов, загруженных за период [from, to), потоком NDJSON или CSV"""
+    if format not in exporter.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый формат выгрузки: {format}")
+    if date_from is not None and date_to is not None and date_to <= date_from:
+        raise HTTPException(status_code=400, detail="Конец периода должен быть позже начала")
+    model_status = models.PrescriptionStatus(status.value) if status is not None else None
+    token = replicas.read_token(request)
+
+    async def body():
+        # Сессия открывается в генераторе тела: курсор живет, пока ответ отдается клиенту
+        async with read_replicas.session(token) as db:
+            async for chunk in exporter.export_prescriptions(db, format, date_from, date_to, model_status, gzip):
+                yield chunk
+
+    filename = f"prescriptions.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else exporter.MEDIA_TYPES[format],
+        headers={"content-disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/prescriptions/coverage", response_model=schemas.CoverageResponse)
+async def get_coverage(user_id: UUID = Query(...), product_ids: List[str] = Query(...),
+                       db: AsyncSession = Depends(get_read_db)):
+    """Какие товары покрыты подтвержденными действующими рецептами пользователя"""
+    try:
+        # Принимаем и повторяющийся параметр, и список через запятую
+        requested = list(dict.fromkeys(
+            UUID(value.strip()) for values in product_ids for value in values.split(",") if value.strip()
+        ))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный идентификатор товара")
+    if not requested or len(requested) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"Нужно от 1 до {MAX_PAGE_SIZE} товаров")
+
+    # Рецепт действует до конца дня expiry_date, как и в check_expiry
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    medication = models.PrescriptionMedication
+    rows = (await db.execute(
+        select(
+            medication.product_id,
+            func.sum(medication.quantity).label("quantity"),
+            func.max(medication.expiry_date).label("expires_at")
+        )
+        .where(
+            medication.user_id == user_id,
+            medication.product_id.in_(requested),
+            medication.status == models.PrescriptionStatus.APPROVED,
+            medication.expiry_date >= today
+        )
+        .group_by(medication.product_id)
+    )).all()
+    covered = {row.product_id: row for row in rows}
+
+    return respond({
+        "user_id": user_id,
+        "products": [
+            {
+                "product_id": product_id,
+                "covered": product_id in covered,
+                "quantity": covered[product_id].quantity if product_id in covered else 0,
+                "expires_at": covered[product_id].expires_at if product_id in covered else None
+            }
+            for product_id in requested
+        ]
+    })
+
+
 @router.get("/prescriptions/{prescription_id}", response_model=schemas.PrescriptionResponse)
-def get_prescription(prescription_id: UUID, db: Session = Depends(get_db)):
+async def get_prescription(prescription_id: UUID, db: AsyncSession = Depends(get_read_db)):
     """Получить рецепт по ID"""
-    prescription = db.query(models.Prescription).filter(models.Prescription.id == prescription_id).first()
+    prescription = (await db.execute(
+        select(models.Prescription).where(models.Prescription.id == prescription_id)
+    )).scalars().first()
     if not prescription:
         raise HTTPException(status_code=404, detail="Рецепт не найден")
 
-    # Преобразуем JSON medications в список объектов
-    medications = [
-        schemas.MedicationResponse(**med) for med in prescription.medications
-    ]
+    return respond({
+        "id": prescription.id,
+        "user_id": prescription.user_id,
+        "doctor_name": prescription.doctor_name,
+        "clinic_name": prescription.clinic_name,
+        "issue_date": prescription.issue_date,
+        "expiry_date": prescription.expiry_date,
+        "medications": prescription.medications,
+        "image_url": prescription.image_url,
+        "status": prescription.status,
+        "verified_by": prescription.verified_by,
+        "verified_at": prescription.verified_at,
+        "notes": prescription.notes,
+        "created_at": prescription.created_at
+    })
+
+
+@router.post("/prescriptions/{prescription_id}/image", response_model=schemas.PrescriptionImageResponse)
+async def upload_prescription_image(prescription_id: UUID, request: Request, db: AsyncSession = Depends(get_db)):
+    """Загрузить скан рецепта (multipart/form-data, поле file) потоком в хранилище"""
+    found = (await db.execute(
+        select(models.Prescription.id).where(models.Prescription.id == prescription_id)
+    )).scalar()
+    if found is None:
+        raise HTTPException(status_code=404, detail="Рецепт не найден")
+    # Транзакцию не держим открытой, пока клиент передает файл
+    await db.rollback()
+
+    try:
+        stored, content_type = await storage.save_multipart_file(request, storage.image_store)
+    except storage.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    image_url = request.app.url_path_for("get_prescription_image", prescription_id=str(prescription_id))
+    updated = (await db.execute(
+        update(models.Prescription)
+        .where(models.Prescription.id == prescription_id)
+        .values(image_url=image_url, image_digest=stored.digest, image_size=stored.size,
+                image_content_type=content_type)
+        .returning(models.Prescription.id)
+    )).scalar()
+    if updated is None:
+        # Рецепт архивировали во время загрузки; объект в хранилище остается для других ссылок
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Рецепт не найден")
+    await db.commit()
+
+    return respond({
+        "prescription_id": prescription_id,
+        "image_url": image_url,
+        "digest": stored.digest,
+        "size": stored.size,
+        "content_type": content_type,
+        "deduplicated": stored.deduplicated
+    })
+
+
+@router.get("/prescriptions/{prescription_id}/image", response_class=FileResponse)
+async def get_prescription_image(prescription_id: UUID, db: AsyncSession = Depends(get_read_db)):
+    """Скан рецепта. FileResponse поддерживает Range и отдает файл через расширение
+    ASGI pathsend (sendfile), если сервер его поддерживает"""
+    row = (await db.execute(
+        select(models.Prescription.image_digest, models.Prescription.image_content_type)
+        .where(models.Prescription.id == prescription_id)
+    )).first()
+    if row is None or row.image_digest is None:
+        raise HTTPException(status_code=404, detail="Скан рецепта не найден")
+
+    path = storage.image_store.path(row.image_digest)
+    if not os.path.exists(path):
+        print(f"Image object {row.image_digest} of prescription {prescription_id} is missing in the store")
+        raise HTTPException(status_code=404, detail="Файл скана рецепта не найден")
 
-    return schemas.PrescriptionResponse(
-        id=prescription.id,
-        user_id=prescription.user_id,
-        doctor_name=prescription.doctor_name,
-        clinic_name=prescription.clinic_name,
-        issue_date=prescription.issue_date,
-        expiry_date=prescription.expiry_date,
-        medications=medications,
-        image_url=prescription.image_url,
-        status=prescription.status,
-        verified_by=prescription.verified_by,
-        verified_at=prescription.verified_at,
-        notes=prescription.notes,
-        created_at=prescription.created_at
-    )
\ No newline at end of file
+    # Содержимое объекта не меняется: ETag - хеш, кэшировать можно бессрочно
+    return FileResponse(
+        path,
+        media_type=row.image_content_type,
+        headers={"etag": f'"{row.image_digest}"', "cache-control": "private, max-age=31536000, immutable"}
+    )
@@ -77,4 +77,84 @@ class PrescriptionVerifyResponse(BaseModel):
     verified_by: UUID
     verified_at: datetime
     notes: Optional[str]
-    message: str
\ No newline at end of file
+    message: str
+
+
+class PrescriptionSummary(BaseModel):
+    id: UUID
+    user_id: UUID
+    doctor_name: str
+    clinic_name: str
+    issue_date: datetime
+    expiry_date: datetime
+    status: PrescriptionStatus
+    created_at: datetime
+    medications: Optional[List[MedicationResponse]] = None
+
+
+class PrescriptionPage(BaseModel):
+    items: List[PrescriptionSummary]
+    next_cursor: Optional[str] = None
+
+
+class PrescriptionClaimResponse(BaseModel):
+    items: List[PrescriptionSummary]
+    claimed_by: UUID
+    lease_expires_at: datetime
+
+
+class PrescriptionDecision(BaseModel):
+    prescription_id: UUID
+    status: PrescriptionStatus
+    notes: Optional[str] = None
+
+
+class PrescriptionBatchVerify(BaseModel):
+    verified_by: UUID
+    decisions: List[PrescriptionDecision]
+
+
+class PrescriptionDecisionResult(BaseModel):
+    prescription_id: UUID
+    status: PrescriptionStatus
+    applied: bool
+    error: Optional[str] = None
+
+
+class PrescriptionBatchVerifyResponse(BaseModel):
+    applied: int
+    failed: int
+    results: List[PrescriptionDecisionResult]
+
+
+class ProductCoverage(BaseModel):
+    product_id: UUID
+    covered: bool
+    quantity: int
+    expires_at: Optional[datetime] = None
+
+
+class CoverageResponse(BaseModel):
+    user_id: UUID
+    products: List[ProductCoverage]
+
+class PrescriptionImageResponse(BaseModel):
+    prescription_id: UUID
+    image_url: str
+    digest: str
+    size: int
+    content_type: str
+    deduplicated: bool
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class PrescriptionImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    # Ошибок больше IMPORT_MAX_ERRORS: в отчете только первые
+    errors_truncated: bool = False
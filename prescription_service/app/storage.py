@@ -0,0 +1,213 @@
+"""Хранилище сканов рецептов с адресацией по содержимому.
+
+Тело multipart-запроса разбирается потоком: куски файла по мере получения
+хешируются (SHA-256) и пишутся во временный файл хранилища, поэтому память на
+загрузку не зависит от размера скана. Имя объекта - хеш содержимого: одинаковые
+сканы хранятся один раз, повторная загрузка только удаляет временный файл.
+
+    IMAGE_STORE_PATH=/data/prescription-images   # каталог локального хранилища
+    IMAGE_MAX_BYTES=20971520                      # предельный размер скана
+"""
+import asyncio
+import contextlib
+import hashlib
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+IMAGE_STORE_PATH = os.getenv("IMAGE_STORE_PATH", "/data/prescription-images")
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+IMAGE_CONTENT_TYPES = ("image/jpeg", "image/png", "image/webp", "image/tiff", "application/pdf")
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class StoredObject(NamedTuple):
+    digest: str
+    size: int
+    # Такой объект уже был в хранилище: новая копия не записана
+    deduplicated: bool
+
+
+class ObjectWriter(ABC):
+    """Потоковая запись одного объекта; имя объекта известно только после commit"""
+
+    @abstractmethod
+    async def write(self, chunk: bytes):
+        ...
+
+    @abstractmethod
+    async def commit(self) -> StoredObject:
+        ...
+
+    @abstractmethod
+    async def abort(self):
+        ...
+
+
+class ObjectStore(ABC):
+    """Интерфейс хранилища объектов по SHA-256 содержимого"""
+
+    @abstractmethod
+    def writer(self) -> ObjectWriter:
+        ...
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        ...
+
+    @abstractmethod
+    def path(self, digest: str) -> str:
+        """Путь к файлу объекта на локальном диске: ответ отдает его через FileResponse"""
+        ...
+
+
+class _LocalWriter(ObjectWriter):
+    def __init__(self, store: "LocalObjectStore"):
+        self._store = store
+        self._hash = hashlib.sha256()
+        self._size = 0
+        self._path = os.path.join(store.root, "tmp", uuid.uuid4().hex)
+        self._file = None
+
+    def _write(self, chunk: bytes):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._file = open(self._path, "wb")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    async def write(self, chunk: bytes):
+        self._size += len(chunk)
+        # Диск и хеш - в пуле потоков, чтобы большая загрузка не блокировала event loop
+        await asyncio.to_thread(self._write, chunk)
+
+    def _commit(self) -> StoredObject:
+        if self._file is None:
+            self._write(b"")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self._store.path(digest)
+        if os.path.exists(path):
+            os.remove(self._path)
+            return StoredObject(digest, self._size, True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Переименование атомарно: читатель никогда не увидит недописанный объект
+        os.replace(self._path, path)
+        return StoredObject(digest, self._size, False)
+
+    async def commit(self) -> StoredObject:
+        return await asyncio.to_thread(self._commit)
+
+    def _abort(self):
+        if self._file is not None:
+            self._file.close()
+            # commit мог упасть уже после переименования или удаления временного файла
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path)
+
+    async def abort(self):
+        await asyncio.to_thread(self._abort)
+
+
+class LocalObjectStore(ObjectStore):
+    """Объекты в каталоге root/<2 символа хеша>/<хеш>, временные файлы в root/tmp"""
+
+    def __init__(self, root: str = IMAGE_STORE_PATH):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def writer(self) -> ObjectWriter:
+        return _LocalWriter(self)
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self.path(digest))
+
+
+class _MultipartFile:
+    """Разбор multipart: куски нужного поля копятся в pending до записи в хранилище"""
+
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.found = False
+        self.content_type = None
+        self.pending = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_file = not self.found and disposition.get(b"name") == self.field
+        if self._in_file:
+            content_type, _ = parse_options_header(self._headers.get(b"content-type", b""))
+            self.content_type = content_type.decode("latin-1")
+            if self.content_type not in IMAGE_CONTENT_TYPES:
+                raise ValueError(f"Неподдерживаемый тип файла: {self.content_type or 'не указан'}")
+            self.found = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        self._in_file = False
+
+
+async def save_multipart_file(request, store: ObjectStore, field: str = "file", max_bytes: Optional[int] = None):
+    """Записать файл из поля field multipart-запроса в хранилище; вернуть (StoredObject, content_type)"""
+    max_bytes = IMAGE_MAX_BYTES if max_bytes is None else max_bytes
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise ValueError("Ожидается multipart/form-data")
+
+    state = _MultipartFile(field)
+    parser = MultipartParser(params[b"boundary"], {
+        name: getattr(state, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end"
+        )
+    })
+    writer = store.writer()
+    written = 0
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for data in state.pending:
+                written += len(data)
+                if written > max_bytes:
+                    raise ImageTooLarge(f"Файл больше {max_bytes} байт")
+                await writer.write(data)
+            state.pending.clear()
+        parser.finalize()
+        if not state.found:
+            raise ValueError(f"В запросе нет файла в поле {field}")
+        return await writer.commit(), state.content_type
+    except BaseException:
+        await writer.abort()
+        raise
+
+
+image_store = LocalObjectStore()
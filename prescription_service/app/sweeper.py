@@ -0,0 +1,119 @@
+"""Фоновая очистка устаревших строк пачками с ограничением скорости.
+
+Работу над одной пачкой делает sweep_batch(db, batch_size, now) конкретного
+сервиса: выбрать строки с блокировкой (SKIP LOCKED), удалить или перенести в
+архив, записать одно событие на всю пачку в outbox и сделать commit. Пачки
+маленькие, поэтому блокировки держатся недолго. Между пачками Sweeper
+выдерживает паузу так, чтобы не превышать SWEEP_MAX_ROWS_PER_SECOND, а
+SWEEP_WINDOW (часы UTC, например "1-6") ограничивает работу ночным окном.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+from . import database, metrics
+
+SWEEP_INTERVAL = float(os.getenv("SWEEP_INTERVAL", "600"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "500"))
+SWEEP_MAX_ROWS_PER_SECOND = float(os.getenv("SWEEP_MAX_ROWS_PER_SECOND", "1000"))
+SWEEP_WINDOW = os.getenv("SWEEP_WINDOW", "")
+
+
+def parse_window(value: str) -> Optional[Tuple[int, int]]:
+    """'1-6' -> (1, 6): работать с 01:00 до 06:00 UTC; окно может переходить через полночь ('22-4')"""
+    if not value.strip():
+        return None
+    start, end = (int(part) for part in value.split("-"))
+    if not (0 <= start < 24 and 0 <= end <= 24) or start == end:
+        raise ValueError(f"Некорректное окно очистки: {value}")
+    return start, end
+
+
+def in_window(window: Optional[Tuple[int, int]], now: datetime) -> bool:
+    if window is None:
+        return True
+    start, end = window
+    if start < end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+class SweeperStats:
+    """Счетчики очистки: прогоны, пачки, обработанные строки и ошибки"""
+
+    def __init__(self):
+        self.runs = 0
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.last_run_at = None
+
+    def snapshot(self) -> dict:
+        return {
+            "runs": self.runs,
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+class Sweeper:
+    """Периодическая очистка: пачки подряд до исчерпания, с паузами по лимиту скорости"""
+
+    def __init__(self, name: str, sweep_batch, interval: float = SWEEP_INTERVAL,
+                 batch_size: int = SWEEP_BATCH_SIZE, max_rows_per_second: float = SWEEP_MAX_ROWS_PER_SECOND,
+                 window: str = SWEEP_WINDOW, session_factory=None, clock=datetime.utcnow):
+        self.name = name
+        self.sweep_batch = sweep_batch
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_rows_per_second = max_rows_per_second
+        self.window = parse_window(window)
+        self.session_factory = session_factory or database.AsyncSessionLocal
+        self.clock = clock
+        self.stats = SweeperStats()
+
+    async def _throttle(self, rows: int, elapsed: float):
+        """Пауза, после которой средняя скорость не выше max_rows_per_second"""
+        if self.max_rows_per_second <= 0:
+            return
+        delay = rows / self.max_rows_per_second - elapsed
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def sweep_once(self) -> int:
+        """Один прогон: пачки, пока очередная не окажется неполной или не закончится окно"""
+        self.stats.runs += 1
+        self.stats.last_run_at = self.clock()
+        rows_total = metrics.SWEEPER_ROWS.labels(self.name)
+        batch_seconds = metrics.SWEEPER_BATCH_SECONDS.labels(self.name)
+        total = 0
+        while in_window(self.window, self.clock()):
+            started = time.perf_counter()
+            async with self.session_factory() as db:
+                rows = await self.sweep_batch(db, self.batch_size, self.clock())
+            elapsed = time.perf_counter() - started
+            batch_seconds.observe(elapsed)
+            rows_total.inc(rows)
+            self.stats.batches += 1
+            self.stats.rows += rows
+            total += rows
+            if rows < self.batch_size:
+                break
+            await self._throttle(rows, elapsed)
+        return total
+
+    async def run(self):
+        """Фоновый цикл: прогон раз в interval внутри окна"""
+        while True:
+            try:
+                if in_window(self.window, self.clock()):
+                    swept = await self.sweep_once()
+                    if swept:
+                        print(f"Sweeper {self.name}: {swept} rows")
+            except Exception as e:
+                self.stats.errors += 1
+                print(f"Sweeper {self.name} error: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,61 @@
+"""Проверки нового рецепта: общие для POST /api/prescriptions и массового импорта (app.importer).
+
+Каждая проверка бросает ValueError с текстом для клиента. validate_batch
+прогоняет пачку рецептов через все проверки с одной датой "сегодня" и
+раскладывает их на прошедшие и ошибки, не прерываясь на первой ошибке.
+"""
+from datetime import date, datetime
+from typing import Optional
+from . import schemas
+
+
+def validate_dates(issue_date: date, expiry_date: date, today: Optional[date] = None):
+    """Валидация дат рецепта"""
+    today = today or datetime.now().date()
+    if issue_date > today:
+        raise ValueError("Дата выписки не может быть в будущем")
+    if expiry_date <= issue_date:
+        raise ValueError("Срок действия должен быть после даты выписки")
+    if expiry_date < today:
+        raise ValueError("Рецепт уже просрочен")
+
+
+def validate_medications(medications):
+    """Валидация списка лекарств"""
+    if not medications:
+        raise ValueError("Рецепт должен содержать хотя бы одно лекарство")
+
+    for med in medications:
+        if med.quantity <= 0:
+            raise ValueError("Количество лекарства должно быть положительным")
+        if not med.product_name.strip():
+            raise ValueError("Название лекарства не может быть пустым")
+
+
+def validate_doctor_info(doctor_name: str, clinic_name: str):
+    """Валидация информации о враче"""
+    if not doctor_name.strip():
+        raise ValueError("ФИО врача не может быть пустым")
+    if not clinic_name.strip():
+        raise ValueError("Название клиники не может быть пустым")
+
+
+def validate_prescription(prescription: schemas.PrescriptionCreate, today: Optional[date] = None):
+    """Все проверки нового рецепта"""
+    validate_dates(prescription.issue_date, prescription.expiry_date, today)
+    validate_medications(prescription.medications)
+    validate_doctor_info(prescription.doctor_name, prescription.clinic_name)
+
+
+def validate_batch(prescriptions, today: Optional[date] = None):
+    """[(ключ, рецепт)] -> ([(ключ, рецепт)] прошедших, [(ключ, текст ошибки)])"""
+    today = today or datetime.now().date()
+    valid, errors = [], []
+    for key, prescription in prescriptions:
+        try:
+            validate_prescription(prescription, today)
+        except ValueError as e:
+            errors.append((key, str(e)))
+        else:
+            valid.append((key, prescription))
+    return valid, errors
@@ -0,0 +1,63 @@
+import asyncio
+import contextlib
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "prescription_test.db"))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from prescription_service.app import database, models, replicas
+
+
+@pytest.fixture
+def db_session():
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    yield db
+    db.close()
+    models.Base.metadata.drop_all(bind=database.engine)
+
+
+@pytest.fixture
+def client(db_session):
+    from prescription_service.app.main import app
+    # Без контекстного менеджера: события startup (подключение к RabbitMQ) не запускаются
+    return TestClient(app)
+
+
+@pytest.fixture
+def lagging_replica(tmp_path, monkeypatch):
+    """Реплика с пустой базой: изменения основной базы до нее не доходят"""
+    from prescription_service.app import routes
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    read_replicas = replicas.ReplicaSet(database.AsyncSessionLocal, [url])
+    monkeypatch.setattr(routes, "read_replicas", read_replicas)
+    yield read_replicas
+    for replica in read_replicas.replicas:
+        asyncio.run(replica.async_engine.dispose())
+
+
+@pytest.fixture
+def count_queries():
+    """Контекстный менеджер, собирающий SQL-запросы асинхронного движка (которым пользуются маршруты)"""
+
+    @contextlib.contextmanager
+    def recorder():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        sync_engine = database.async_engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    return recorder
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from benchmarks.amqp_stub import StubBroker
+from prescription_service.app.consumer import Consumer, AckTracker
+
+
+def make_consumer(broker, handler, **kwargs):
+    kwargs.setdefault("reconnect_min", 0.001)
+    kwargs.setdefault("reconnect_max", 0.01)
+    return Consumer("test_queue", handler, connect=broker.connect, **kwargs)
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.001)
+
+
+class FakeMessage:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+def test_ack_tracker_acks_only_contiguous_prefix():
+    tracker = AckTracker()
+    messages = [FakeMessage(tag) for tag in range(1, 6)]
+    for message in messages:
+        tracker.received(message)
+
+    assert tracker.settle([messages[1], messages[2]]) is None
+    assert tracker.settle([messages[0]]) is messages[2]
+    tracker.discard(messages[3])
+    assert tracker.settle([messages[4]]) is messages[4]
+
+
+def test_concurrent_handlers_respect_prefetch_and_beat_sequential_throughput():
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        queue = broker.queue("test_queue")
+        active = peak = 0
+
+        async def handler(message):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        consumer = make_consumer(broker, handler, prefetch=16, concurrency=8)
+        consumer.start()
+        for i in range(200):
+            queue.put(str(i).encode())
+        started = time.perf_counter()
+        await wait_until(lambda: broker.acked == 200)
+        elapsed = time.perf_counter() - started
+        await consumer.stop()
+        return elapsed, peak, consumer.stats.snapshot()
+
+    elapsed, peak, stats = asyncio.run(scenario())
+    # Последовательно 200 x 10 мс = 2 с
+    assert elapsed < 1.0
+    assert peak == 8
+    assert stats["processed"] == 200 and stats["in_flight"] == 0
+
+
+def test_batches_are_acked_with_multiple():
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        queue = broker.queue("test_queue")
+        batches = []
+
+        async def handler(messages):
+            batches.append([message.body for message in messages])
+
+        consumer = make_consumer(broker, handler, batch_size=10, prefetch=50, concurrency=2)
+        consumer.start()
+        await wait_until(lambda: consumer.connected)
+        for i in range(100):
+            queue.put(str(i).encode())
+        await wait_until(lambda: broker.acked == 100)
+        await consumer.stop()
+        return batches, consumer.stats.snapshot()
+
+    batches, stats = asyncio.run(scenario())
+    assert sorted(int(body) for batch in batches for body in batch) == list(range(100))
+    assert max(len(batch) for batch in batches) == 10
+    assert stats["batches"] == len(batches) < 100
+
+
+def test_failed_message_is_retried_once_then_dropped():
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        attempts = []
+
+        async def handler(message):
+            attempts.append(message.redelivered)
+            if message.body == b"poison":
+                raise ValueError("bad message")
+
+        consumer = make_consumer(broker, handler)
+        consumer.start()
+        broker.queue("test_queue").put(b"poison")
+        broker.queue("test_queue").put(b"ok")
+        await wait_until(lambda: broker.dead_lettered and broker.acked == 1)
+        await consumer.stop()
+        return attempts, broker
+
+    attempts, broker = asyncio.run(scenario())
+    assert broker.dead_lettered == [b"poison"]
+    assert sorted(attempts) == [False, False, True]
+
+
+def test_reconnects_with_backoff_and_redelivers_unacked():
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        broker.refuse_connections = 3
+        queue = broker.queue("test_queue")
+        seen = []
+        release = asyncio.Event()
+
+        async def handler(message):
+            seen.append(message.body)
+            await release.wait()
+
+        consumer = make_consumer(broker, handler, prefetch=5, concurrency=5)
+        consumer.start()
+        for i in range(5):
+            queue.put(str(i).encode())
+        await wait_until(lambda: len(seen) == 5)
+        broker.drop_connections()
+        await wait_until(lambda: broker.connections == 2 and len(seen) == 10)
+        release.set()
+        await wait_until(lambda: broker.acked == 5)
+        await consumer.stop()
+        return consumer.stats.snapshot()
+
+    stats = asyncio.run(scenario())
+    assert stats["reconnects"] == 4
+
+
+def test_stop_drains_messages_already_received():
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        queue = broker.queue("test_queue")
+        done = []
+
+        async def handler(message):
+            await asyncio.sleep(0.05)
+            done.append(message.body)
+
+        consumer = make_consumer(broker, handler, prefetch=4, concurrency=4)
+        consumer.start()
+        for i in range(10):
+            queue.put(str(i).encode())
+        await wait_until(lambda: consumer.stats.received == 4)
+        await consumer.stop()
+        return done, broker, queue
+
+    done, broker, queue = asyncio.run(scenario())
+    assert len(done) == broker.acked == 4
+    assert len(queue.ready) == 6
+
+
+def test_consumer_reports_lag_and_handler_metrics():
+    from prescription_service.app import metrics
+    from prescription_service.app.rabbitmq import Publisher
+
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        broker.queue("metrics_queue")
+        publisher = Publisher(flush_interval=0.001, connect=broker.connect)
+        consumer = Consumer("metrics_queue", lambda message: asyncio.sleep(0), connect=broker.connect)
+        await publisher.start()
+        consumer.start()
+        await wait_until(lambda: consumer.connected)
+        await asyncio.gather(*(publisher.publish("metrics_queue", {"n": i}) for i in range(5)))
+        await wait_until(lambda: broker.acked == 5)
+        await consumer.stop()
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    sample = metrics.REGISTRY.get_sample_value
+    assert sample("amqp_consumer_lag_seconds_count", {"queue": "metrics_queue"}) == 5
+    assert sample("amqp_consumer_handler_duration_seconds_count", {"queue": "metrics_queue"}) == 5
+    assert sample("amqp_consumed_total", {"queue": "metrics_queue", "outcome": "ok"}) == 5
+    assert sample("amqp_consumer_in_flight", {"queue": "metrics_queue"}) == 0
+    assert sample("amqp_published_total", {"routing_key": "metrics_queue", "outcome": "ok"}) == 5
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.amqp_stub import StubBroker
+from prescription_service.app import database, dedup, models
+from prescription_service.app.consumer import Consumer
+from prescription_service.tests.unit.test_consumer import wait_until
+
+
+def deliver_all(deduplicator, deliveries, handler, batch_size=1):
+    """Прогнать сообщения (body, message_id) через Consumer со стаб-брокером"""
+
+    async def scenario():
+        broker = StubBroker(handshake_delay=0, confirm_delay=0)
+        queue = broker.queue("cart_cleared")
+        consumer = Consumer("cart_cleared", deduplicator.wrap(handler), batch_size=batch_size,
+                            connect=broker.connect, reconnect_min=0.001)
+        consumer.start()
+        for body, message_id in deliveries:
+            queue.put(body, message_id)
+        await wait_until(lambda: broker.acked + len(broker.dead_lettered) == len(deliveries))
+        await consumer.stop()
+        return broker
+
+    return asyncio.run(scenario())
+
+
+def test_duplicates_are_acked_without_running_handler(db_session):
+    seen = []
+
+    async def handler(message):
+        seen.append(message.body)
+
+    deduplicator = dedup.Deduplicator("cart_cleared")
+    broker = deliver_all(deduplicator, [(b"a", "m1"), (b"b", "m2"), (b"a", "m1"), (b"c", None), (b"c", None)], handler)
+
+    assert sorted(seen) == [b"a", b"b", b"c", b"c"]
+    assert broker.acked == 5
+    assert deduplicator.duplicates_memory + deduplicator.duplicates_db == 1
+
+    # После перезапуска LRU пуст, дубль ловит таблица
+    restarted = dedup.Deduplicator("cart_cleared")
+    deliver_all(restarted, [(b"a", "m1"), (b"d", "m3")], handler)
+    assert seen[-1] == b"d"
+    assert restarted.duplicates_db == 1
+
+
+def test_batch_handler_receives_each_message_once(db_session):
+    batches = []
+
+    async def handler(messages):
+        batches.append([message.message_id for message in messages])
+
+    deliveries = [(b"x", f"m{i % 5}") for i in range(20)]
+    deliver_all(dedup.Deduplicator("cart_cleared"), deliveries, handler, batch_size=10)
+
+    handled = [message_id for batch in batches for message_id in batch]
+    assert sorted(handled) == [f"m{i}" for i in range(5)]
+
+
+def test_failed_handler_does_not_mark_message_processed(db_session):
+    attempts = []
+
+    async def handler(message):
+        attempts.append(message.redelivered)
+        if not message.redelivered:
+            raise RuntimeError("temporary failure")
+
+    deliver_all(dedup.Deduplicator("cart_cleared"), [(b"a", "m1")], handler)
+    assert attempts == [False, True]
+
+
+def test_memory_front_is_bounded(db_session):
+    async def handler(message):
+        pass
+
+    deduplicator = dedup.Deduplicator("cart_cleared", cache_size=10)
+    deliver_all(deduplicator, [(b"x", f"m{i}") for i in range(50)], handler)
+    assert deduplicator.stats()["cache_size"] == 10
+
+
+@pytest.mark.parametrize("batch_size", [1, 1000])
+def test_delete_expired_removes_only_old_marks(db_session, batch_size):
+    now = datetime.utcnow()
+    db_session.add_all([
+        models.ProcessedMessage(consumer="cart_cleared", message_id=f"old{i}", processed_at=now - timedelta(days=2))
+        for i in range(3)
+    ] + [models.ProcessedMessage(consumer="cart_cleared", message_id="new", processed_at=now)])
+    db_session.commit()
+
+    async def cleanup():
+        async with database.AsyncSessionLocal() as db:
+            deleted = 0
+            while True:
+                count = await dedup.delete_expired(db, ttl=24 * 3600, batch_size=batch_size)
+                deleted += count
+                if count < batch_size:
+                    return deleted
+
+    assert asyncio.run(cleanup()) == 3
+    db_session.expire_all()
+    assert [row.message_id for row in db_session.query(models.ProcessedMessage)] == ["new"]
@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime
+from alembic import command
+from sqlalchemy import create_engine, inspect, select
+from prescription_service.app import migrate, models
+
+
+def test_models_match_migrations(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url)
+    assert migrate.check(url) == []
+
+
+def test_downgrade_and_upgrade_again(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url)
+    command.downgrade(migrate.get_config(url), "base")
+    assert inspect(create_engine(url)).get_table_names() == [migrate.VERSION_TABLE]
+    migrate.upgrade(url)
+    assert migrate.check(url) == []
+
+
+def test_database_created_before_migrations_is_adopted(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url, migrate.BASELINE_REVISION)
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP TABLE {migrate.VERSION_TABLE}")
+
+    migrate.upgrade(url)
+    assert migrate.check(url) == []
+
+
+def test_medications_are_backfilled_from_json(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    migrate.upgrade(url, "0005")
+    engine = create_engine(url)
+    product_id = uuid.uuid4()
+    with engine.begin() as connection:
+        connection.execute(models.Prescription.__table__.insert().values(
+            id=uuid.uuid4(), user_id=uuid.uuid4(), doctor_name="Доктор", clinic_name="Клиника",
+            issue_date=datetime(2026, 1, 1), expiry_date=datetime(2026, 12, 31),
+            medications=[{"product_id": str(product_id), "product_name": "Аспирин", "dosage": "500 мг", "quantity": 2}],
+            status=models.PrescriptionStatus.APPROVED
+        ))
+
+    migrate.upgrade(url)
+    with engine.connect() as connection:
+        rows = connection.execute(select(models.PrescriptionMedication.__table__)).all()
+    assert [(row.product_id, row.quantity, row.status) for row in rows] == [
+        (product_id, 2, models.PrescriptionStatus.APPROVED)
+    ]
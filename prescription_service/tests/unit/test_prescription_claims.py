@@ -0,0 +1,72 @@
+import uuid
+from datetime import datetime, timedelta
+from prescription_service.app import models
+from prescription_service.tests.unit.test_prescription_listing import add_prescriptions
+
+
+def fresh_prescriptions(db, count, **kwargs):
+    return add_prescriptions(db, uuid.uuid4(), count, start=datetime.utcnow() - timedelta(days=1), **kwargs)
+
+
+def test_claims_do_not_overlap_and_expired_lease_is_reclaimable(client, db_session):
+    rows = fresh_prescriptions(db_session, 5)
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    claimed_first = client.post(f"/api/prescriptions/claim?pharmacist_id={first}&limit=3").json()
+    claimed_second = client.post(f"/api/prescriptions/claim?pharmacist_id={second}&limit=3").json()
+
+    first_ids = [item["id"] for item in claimed_first["items"]]
+    second_ids = [item["id"] for item in claimed_second["items"]]
+    assert first_ids == [str(row.id) for row in sorted(rows, key=lambda r: (r.created_at, str(r.id).replace("-", "")))][:3]
+    assert len(second_ids) == 2 and not set(first_ids) & set(second_ids)
+    assert claimed_first["items"][0]["medications"]
+
+    # Аренда истекла: рецепт снова доступен
+    db_session.query(models.Prescription).filter(models.Prescription.claimed_by == first).update(
+        {"claim_expires_at": datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False
+    )
+    db_session.commit()
+    reclaimed = client.post(f"/api/prescriptions/claim?pharmacist_id={second}&limit=10").json()
+    assert sorted(item["id"] for item in reclaimed["items"]) == sorted(first_ids)
+
+
+def test_verify_rejects_prescription_claimed_by_other_pharmacist(client, db_session):
+    row = fresh_prescriptions(db_session, 1)[0]
+    owner, other = uuid.uuid4(), uuid.uuid4()
+    client.post(f"/api/prescriptions/claim?pharmacist_id={owner}")
+
+    response = client.patch(f"/api/prescriptions/{row.id}/verify", json={"status": "approved", "verified_by": str(other)})
+    assert response.status_code == 409
+
+    response = client.patch(f"/api/prescriptions/{row.id}/verify", json={"status": "approved", "verified_by": str(owner)})
+    assert response.status_code == 200
+    assert response.json()["status"] == "approved"
+
+
+def test_batch_verify_reports_per_item_results(client, db_session):
+    pending = fresh_prescriptions(db_session, 3)
+    approved = fresh_prescriptions(db_session, 1, status=models.PrescriptionStatus.APPROVED)[0]
+    pharmacist = uuid.uuid4()
+    missing = uuid.uuid4()
+
+    response = client.patch("/api/prescriptions/verify:batch", json={
+        "verified_by": str(pharmacist),
+        "decisions": [
+            {"prescription_id": str(pending[0].id), "status": "approved"},
+            {"prescription_id": str(pending[1].id), "status": "rejected", "notes": "Нечитаемая подпись"},
+            {"prescription_id": str(approved.id), "status": "approved"},
+            {"prescription_id": str(missing), "status": "approved"},
+        ]
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["applied"] == 2 and data["failed"] == 2
+    assert [item["applied"] for item in data["results"]] == [True, True, False, False]
+    assert data["results"][3]["error"] == "Рецепт не найден"
+
+    db_session.expire_all()
+    statuses = {row.id: db_session.get(models.Prescription, row.id).status for row in pending}
+    assert statuses[pending[0].id] == models.PrescriptionStatus.APPROVED
+    assert statuses[pending[1].id] == models.PrescriptionStatus.REJECTED
+    assert statuses[pending[2].id] == models.PrescriptionStatus.PENDING
+    assert db_session.get(models.Prescription, pending[1].id).verified_by == pharmacist
@@ -0,0 +1,55 @@
+from uuid import uuid4
+from prescription_service.tests.unit.test_prescription_routes import prescription_payload
+
+ASPIRIN = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+IBUPROFEN = "c3d4e5f6-a7b8-49c0-8d1e-3f4a5b6c7d8e"
+
+
+def upload(client, user_id, quantity):
+    payload = prescription_payload(user_id)
+    payload["medications"][0]["quantity"] = quantity
+    return client.post("/api/prescriptions", json=payload).json()["id"]
+
+
+def verify(client, prescription_id, status):
+    response = client.patch(f"/api/prescriptions/{prescription_id}/verify",
+                            json={"status": status, "verified_by": str(uuid4())})
+    assert response.status_code == 200
+
+
+def coverage(client, user_id, *product_ids):
+    response = client.get(f"/api/prescriptions/coverage?user_id={user_id}&product_ids={','.join(product_ids)}")
+    assert response.status_code == 200
+    return {item["product_id"]: item for item in response.json()["products"]}
+
+
+def test_only_approved_prescriptions_cover_products(client, db_session):
+    user_id = uuid4()
+    pending = upload(client, user_id, 2)
+    assert coverage(client, user_id, ASPIRIN)[ASPIRIN]["covered"] is False
+
+    verify(client, pending, "approved")
+    rejected = upload(client, user_id, 5)
+    verify(client, rejected, "rejected")
+    verify(client, upload(client, user_id, 3), "approved")
+    verify(client, upload(client, uuid4(), 7), "approved")
+
+    result = coverage(client, user_id, ASPIRIN, IBUPROFEN)
+    assert result[ASPIRIN]["covered"] is True
+    assert result[ASPIRIN]["quantity"] == 5
+    assert result[IBUPROFEN] == {"product_id": IBUPROFEN, "covered": False, "quantity": 0, "expires_at": None}
+
+
+def test_batch_verify_updates_coverage(client, db_session):
+    user_id = uuid4()
+    prescription_id = upload(client, user_id, 4)
+    client.patch("/api/prescriptions/verify:batch", json={
+        "verified_by": str(uuid4()),
+        "decisions": [{"prescription_id": prescription_id, "status": "approved"}]
+    })
+    assert coverage(client, user_id, ASPIRIN)[ASPIRIN]["quantity"] == 4
+
+
+def test_coverage_rejects_bad_product_ids(client):
+    response = client.get(f"/api/prescriptions/coverage?user_id={uuid4()}&product_ids=not-a-uuid")
+    assert response.status_code == 400
@@ -0,0 +1,88 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from prescription_service.app import database, exporter, models, replicas
+
+START = datetime(2026, 1, 1)
+STATUSES = (models.PrescriptionStatus.PENDING, models.PrescriptionStatus.APPROVED)
+
+
+def populate(rows: int):
+    """Рецепт на каждый час с START, статусы по очереди; возвращает id в порядке created_at"""
+    ids = [uuid.uuid4() for _ in range(rows)]
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.Prescription), [
+            {
+                "id": prescription_id, "user_id": uuid.uuid4(), "doctor_name": "Доктор Иванов",
+                "clinic_name": "Городская поликлиника", "issue_date": START, "expiry_date": START + timedelta(days=90),
+                "medications": [{"product_id": str(uuid.uuid4()), "product_name": "Аспирин", "dosage": "500 мг",
+                                 "quantity": 1}],
+                "status": STATUSES[i % 2], "created_at": START + timedelta(hours=i)
+            }
+            for i, prescription_id in enumerate(ids)
+        ])
+    return ids
+
+
+def test_export_filters_by_period_and_status_in_every_format(client, db_session):
+    ids = populate(10)
+    params = {"from": (START + timedelta(hours=2)).isoformat(), "to": (START + timedelta(hours=8)).isoformat(),
+              "status": "approved"}
+
+    response = client.get("/api/prescriptions/export", params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [str(ids[i]) for i in (3, 5, 7)]
+    assert rows[0]["status"] == "approved"
+    assert rows[0]["medications"][0]["product_name"] == "Аспирин"
+
+    response = client.get("/api/prescriptions/export", params={**params, "format": "csv"})
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    assert [record["id"] for record in records] == [str(ids[i]) for i in (3, 5, 7)]
+    assert json.loads(records[0]["medications"])[0]["dosage"] == "500 мг"
+    assert records[0]["verified_by"] == ""
+
+    response = client.get("/api/prescriptions/export", params={**params, "format": "csv", "gzip": "true"})
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="prescriptions.csv.gz"' in response.headers["content-disposition"]
+    assert list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode()))) == records
+
+    assert client.get("/api/prescriptions/export", params={"format": "xml"}).status_code == 400
+    assert client.get("/api/prescriptions/export", params={"from": params["to"], "to": params["from"]}).status_code == 400
+
+
+def test_export_reads_from_replica(client, db_session, lagging_replica):
+    populate(3)
+    assert client.get("/api/prescriptions/export").text == ""
+    token = f"{datetime.now().timestamp():.6f}"
+    response = client.get("/api/prescriptions/export", headers={replicas.CONSISTENCY_HEADER: token})
+    assert len(response.text.splitlines()) == 3
+
+
+def test_export_memory_does_not_grow_with_row_count(db_session):
+    populate(10000)
+
+    def peak_bytes(date_to):
+        async def consume():
+            async with database.AsyncSessionLocal() as db:
+                size = 0
+                async for chunk in exporter.export_prescriptions(db, "ndjson", date_to=date_to, compress=True,
+                                                                 batch_size=500):
+                    size += len(chunk)
+                return size
+
+        tracemalloc.start()
+        assert asyncio.run(consume()) > 0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    small, large = peak_bytes(START + timedelta(hours=1000)), peak_bytes(None)
+    assert large < small * 1.5
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import os
+import tracemalloc
+from uuid import UUID
+import pytest
+from prescription_service.app import models, storage
+from prescription_service.tests.unit.test_prescription_routes import prescription_payload
+
+BOUNDARY = "scan-boundary"
+
+
+@pytest.fixture
+def image_store(tmp_path, monkeypatch):
+    store = storage.LocalObjectStore(str(tmp_path / "images"))
+    monkeypatch.setattr(storage, "image_store", store)
+    return store
+
+
+def stored_files(store):
+    return sorted(name for _, _, names in os.walk(store.root) for name in names)
+
+
+def upload(client, prescription_id, data, content_type="image/png"):
+    return client.post(f"/api/prescriptions/{prescription_id}/image",
+                       files={"file": ("scan.png", data, content_type)})
+
+
+def test_upload_deduplicates_and_serves_ranges(client, db_session, image_store):
+    scan = os.urandom(100_000)
+    first = client.post("/api/prescriptions", json=prescription_payload()).json()["id"]
+    second = client.post("/api/prescriptions", json=prescription_payload()).json()["id"]
+
+    response = upload(client, first, scan)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["digest"] == hashlib.sha256(scan).hexdigest()
+    assert body["size"] == len(scan)
+    assert body["deduplicated"] is False
+    assert upload(client, second, scan).json()["deduplicated"] is True
+    assert stored_files(image_store) == [body["digest"]]
+
+    prescription = db_session.get(models.Prescription, UUID(first))
+    assert prescription.image_url == f"/api/prescriptions/{first}/image"
+    assert client.get(f"/api/prescriptions/{first}").json()["image_url"] == prescription.image_url
+
+    response = client.get(f"/api/prescriptions/{second}/image")
+    assert response.status_code == 200
+    assert response.content == scan
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"] == f'"{body["digest"]}"'
+
+    response = client.get(f"/api/prescriptions/{second}/image", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == scan[10:20]
+
+
+def test_rejected_uploads_leave_no_files(client, image_store, monkeypatch):
+    prescription_id = client.post("/api/prescriptions", json=prescription_payload()).json()["id"]
+
+    assert upload(client, prescription_id, b"MZ...", content_type="application/x-msdownload").status_code == 400
+    assert client.post(f"/api/prescriptions/{prescription_id}/image",
+                       files={"other": ("scan.png", b"x", "image/png")}).status_code == 400
+    monkeypatch.setattr(storage, "IMAGE_MAX_BYTES", 1000)
+    assert upload(client, prescription_id, b"x" * 1001).status_code == 413
+    assert stored_files(image_store) == []
+
+    assert client.get(f"/api/prescriptions/{prescription_id}/image").status_code == 404
+    assert upload(client, "00000000-0000-0000-0000-000000000000", b"x").status_code == 404
+
+
+def test_commit_error_after_rename_is_not_hidden_by_abort(image_store, monkeypatch):
+    replace = os.replace
+
+    def replace_then_fail(source, target):
+        replace(source, target)
+        raise OSError("fsync каталога не удался")
+
+    monkeypatch.setattr(storage.os, "replace", replace_then_fail)
+    with pytest.raises(OSError, match="fsync"):
+        asyncio.run(storage.save_multipart_file(StreamingRequest(1024, chunk_size=1024), image_store))
+
+
+def test_missing_image_file_returns_404(client, image_store):
+    prescription_id = client.post("/api/prescriptions", json=prescription_payload()).json()["id"]
+    digest = upload(client, prescription_id, b"scan").json()["digest"]
+    os.remove(image_store.path(digest))
+
+    response = client.get(f"/api/prescriptions/{prescription_id}/image")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Файл скана рецепта не найден"
+
+
+class StreamingRequest:
+    """Запрос, тело которого приходит кусками и нигде не лежит целиком"""
+
+    def __init__(self, size: int, chunk_size: int = 64 * 1024):
+        self.headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+        self.size = size
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"scan.tif\"\r\n"
+               f"Content-Type: image/tiff\r\n\r\n").encode()
+        chunk = b"\x42" * self.chunk_size
+        for _ in range(self.size // self.chunk_size):
+            yield chunk
+        yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def test_upload_memory_does_not_grow_with_file_size(image_store):
+    def peak_bytes(size):
+        tracemalloc.start()
+        stored, content_type = asyncio.run(
+            storage.save_multipart_file(StreamingRequest(size), image_store, max_bytes=size)
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert stored.size == size and content_type == "image/tiff"
+        return peak
+
+    small, large = peak_bytes(1024 * 1024), peak_bytes(16 * 1024 * 1024)
+    assert large < small + 512 * 1024
+    assert large < 4 * 1024 * 1024
@@ -0,0 +1,105 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import date, timedelta
+from prescription_service.app import importer, models
+from prescription_service.tests.unit.test_prescription_routes import prescription_payload
+
+
+def ndjson(*rows) -> bytes:
+    return b"\n".join(row if isinstance(row, bytes) else json.dumps(row).encode() for row in rows)
+
+
+def test_ndjson_import_reports_row_errors_without_aborting(client, db_session):
+    expired = prescription_payload()
+    expired["expiry_date"] = str(date.today() - timedelta(days=1))
+    expired["issue_date"] = str(date.today() - timedelta(days=30))
+    no_doctor = prescription_payload()
+    no_doctor["doctor_name"] = " "
+    body = ndjson(prescription_payload(), b"{not json", expired, b"", prescription_payload(), no_doctor,
+                  {"user_id": "x"})
+
+    response = client.post("/api/prescriptions/import", content=body,
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["imported"], report["failed"]) == (2, 4)
+    assert [error["line"] for error in report["errors"]] == [2, 3, 6, 7]
+    assert report["errors"][1]["error"] == "Рецепт уже просрочен"
+    assert report["errors"][2]["error"] == "ФИО врача не может быть пустым"
+
+    prescriptions = db_session.query(models.Prescription).all()
+    assert len(prescriptions) == 2
+    assert {prescription.status for prescription in prescriptions} == {models.PrescriptionStatus.PENDING}
+    assert db_session.query(models.PrescriptionMedication).count() == 2
+    events = db_session.query(models.OutboxEvent).all()
+    assert [event.routing_key for event in events] == ["prescription_uploaded"] * 2
+    assert {event.payload["prescription_id"] for event in events} == {str(p.id) for p in prescriptions}
+
+    # Импортированный рецепт неотличим от загруженного по одному
+    response = client.get(f"/api/prescriptions/{prescriptions[0].id}")
+    assert response.json()["medications"][0]["product_name"] == "Аспирин"
+
+
+def test_csv_import_in_chunks_split_mid_line(db_session):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(importer.CSV_COLUMNS + ("image_url",))
+    for index in range(5):
+        payload = prescription_payload()
+        if index == 3:
+            payload["medications"][0]["quantity"] = 0
+        writer.writerow([payload[column] if column != "medications" else json.dumps(payload[column])
+                         for column in importer.CSV_COLUMNS] + [""])
+    writer.writerow(["только", "две"])
+    data = output.getvalue().encode()
+
+    async def chunks():
+        for start in range(0, len(data), 37):
+            yield data[start:start + 37]
+
+    report = asyncio.run(importer.import_prescriptions(chunks(), "csv", chunk_size=2))
+    assert (report["imported"], report["failed"]) == (4, 2)
+    assert report["errors"] == [
+        {"line": 5, "error": "Количество лекарства должно быть положительным"},
+        {"line": 7, "error": "Ожидается 7 колонок, получено 2"},
+    ]
+    assert db_session.query(models.Prescription).count() == 4
+    assert db_session.query(models.Prescription).filter(models.Prescription.image_url.is_(None)).count() == 4
+
+
+def test_csv_quoted_newlines_and_invalid_utf8(client, db_session):
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\r\n")
+    writer.writerow(importer.CSV_COLUMNS)
+    for clinic_name in ("Клиника\n№1", "Клиника\r\n\r\n№2", "Клиника №3"):
+        payload = prescription_payload()
+        payload["clinic_name"] = clinic_name
+        writer.writerow([payload[column] if column != "medications" else json.dumps(payload[column])
+                         for column in importer.CSV_COLUMNS])
+    # Третья запись (строка 7) с байтами не из UTF-8
+    head, _, last = output.getvalue().encode().rpartition("Клиника".encode())
+    body = head + b"\xff\xfe" + last
+
+    response = client.post("/api/prescriptions/import?format=csv", content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["imported"], report["failed"]) == (2, 1)
+    assert report["errors"] == [{"line": 7, "error": "Строка не в кодировке UTF-8"}]
+    assert {prescription.clinic_name for prescription in db_session.query(models.Prescription)} == {
+        "Клиника\n№1", "Клиника\r\n\r\n№2"
+    }
+
+    response = client.post("/api/prescriptions/import?format=csv", content=b"user_id,\xff\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Заголовок CSV не в кодировке UTF-8"
+
+
+def test_import_rejects_unknown_format_and_bad_header(client, db_session):
+    assert client.post("/api/prescriptions/import", content=b"a,b",
+                       headers={"content-type": "text/plain"}).status_code == 400
+    response = client.post("/api/prescriptions/import?format=csv", content=b"user_id,doctor_name\n1,2")
+    assert response.status_code == 400
+    assert "clinic_name" in response.json()["detail"]
+    assert db_session.query(models.Prescription).count() == 0
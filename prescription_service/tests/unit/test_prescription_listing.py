@@ -0,0 +1,78 @@
+import uuid
+from datetime import datetime, timedelta
+from prescription_service.app import models
+
+
+def add_prescriptions(db, user_id, count, status=models.PrescriptionStatus.PENDING, start=None):
+    start = start or datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append(models.Prescription(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            doctor_name="Доктор Иванов",
+            clinic_name="Городская поликлиника",
+            issue_date=start,
+            expiry_date=start + timedelta(days=90),
+            medications=[{"product_id": str(uuid.uuid4()), "product_name": "Аспирин", "dosage": "500 мг", "quantity": 1}],
+            status=status,
+            # Каждые три рецепта с одинаковым created_at: проверяем разрешение равенства по id
+            created_at=start + timedelta(minutes=i // 3)
+        ))
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def walk(client, url):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        data = response.json()
+        ids.extend(item["id"] for item in data["items"])
+        pages += 1
+        cursor = data["next_cursor"]
+        if not cursor:
+            return ids, pages
+
+
+def test_user_listing_walks_every_row_once_newest_first(client, db_session):
+    user_id = uuid.uuid4()
+    rows = add_prescriptions(db_session, user_id, 23)
+    add_prescriptions(db_session, uuid.uuid4(), 5)
+
+    ids, pages = walk(client, f"/api/prescriptions?user_id={user_id}&limit=5")
+
+    assert pages == 5
+    assert len(ids) == len(set(ids)) == 23
+    expected = sorted(rows, key=lambda row: (row.created_at, str(row.id).replace("-", "")), reverse=True)
+    assert ids == [str(row.id) for row in expected]
+
+
+def test_user_listing_filters_by_status_and_omits_medications(client, db_session):
+    user_id = uuid.uuid4()
+    add_prescriptions(db_session, user_id, 4)
+    approved = add_prescriptions(db_session, user_id, 2, status=models.PrescriptionStatus.APPROVED)
+
+    data = client.get(f"/api/prescriptions?user_id={user_id}&status=approved").json()
+    assert {item["id"] for item in data["items"]} == {str(row.id) for row in approved}
+    assert all(item["medications"] is None for item in data["items"])
+
+    data = client.get(f"/api/prescriptions?user_id={user_id}&status=approved&include_medications=true").json()
+    assert data["items"][0]["medications"][0]["product_name"] == "Аспирин"
+
+
+def test_pending_queue_is_oldest_first(client, db_session):
+    pending = add_prescriptions(db_session, uuid.uuid4(), 7)
+    add_prescriptions(db_session, uuid.uuid4(), 3, status=models.PrescriptionStatus.REJECTED)
+
+    ids, _ = walk(client, "/api/prescriptions/pending?limit=3")
+
+    expected = sorted(pending, key=lambda row: (row.created_at, str(row.id).replace("-", "")))
+    assert ids == [str(row.id) for row in expected]
+
+
+def test_invalid_cursor_is_rejected(client, db_session):
+    response = client.get(f"/api/prescriptions?user_id={uuid.uuid4()}&cursor=not-a-cursor")
+    assert response.status_code == 400
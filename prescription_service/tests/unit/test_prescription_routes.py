@@ -0,0 +1,69 @@
+from uuid import uuid4
+from datetime import date, timedelta
+from prescription_service.app import models
+
+
+def prescription_payload(user_id=None):
+    return {
+        "user_id": str(user_id or uuid4()),
+        "doctor_name": "Доктор Иванов",
+        "clinic_name": "Городская поликлиника",
+        "issue_date": str(date.today()),
+        "expiry_date": str(date.today() + timedelta(days=90)),
+        "medications": [
+            {
+                "product_id": "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0",
+                "product_name": "Аспирин",
+                "dosage": "500 мг",
+                "quantity": 1
+            }
+        ],
+        "image_url": "https://example.com/prescription.jpg"
+    }
+
+
+def test_upload_and_get_prescription(client, db_session):
+    payload = prescription_payload()
+    response = client.post("/api/prescriptions", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "pending"
+
+    response = client.get(f"/api/prescriptions/{data['id']}")
+    assert response.status_code == 200
+    assert response.json()["medications"][0]["product_name"] == "Аспирин"
+
+    events = db_session.query(models.OutboxEvent).all()
+    assert [event.routing_key for event in events] == ["prescription_uploaded"]
+    assert events[0].payload["prescription_id"] == data["id"]
+
+
+def test_upload_rejects_invalid_prescription(client, db_session):
+    payload = prescription_payload()
+    payload["medications"] = []
+    assert client.post("/api/prescriptions", json=payload).status_code == 400
+    assert db_session.query(models.Prescription).count() == 0
+    assert db_session.query(models.OutboxEvent).count() == 0
+
+
+def test_get_missing_prescription(client):
+    assert client.get(f"/api/prescriptions/{uuid4()}").status_code == 404
+
+
+def test_verification_publishes_prescription_verified(client, db_session):
+    user_id = uuid4()
+    single = client.post("/api/prescriptions", json=prescription_payload(user_id)).json()["id"]
+    batch = [client.post("/api/prescriptions", json=prescription_payload(user_id)).json()["id"] for _ in range(2)]
+
+    client.patch(f"/api/prescriptions/{single}/verify", json={"status": "approved", "verified_by": str(uuid4())})
+    client.patch("/api/prescriptions/verify:batch", json={"verified_by": str(uuid4()), "decisions": [
+        {"prescription_id": batch[0], "status": "approved"},
+        {"prescription_id": batch[1], "status": "rejected"},
+    ]})
+
+    events = db_session.query(models.OutboxEvent).filter_by(routing_key="prescription_verified").all()
+    assert [(event.payload["prescription_id"], event.payload["status"]) for event in events] == [
+        (single, "approved"), (batch[0], "approved"), (batch[1], "rejected")
+    ]
+    assert events[0].payload["user_id"] == str(user_id)
+    assert events[0].payload["medications"] == [{"product_id": "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0", "quantity": 1}]
@@ -0,0 +1,64 @@
+from uuid import uuid4
+from prescription_service.tests.unit.test_prescription_routes import prescription_payload
+
+ASPIRIN = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+# Допустимое число SQL-запросов на эндпоинт. Рост числа запросов - регрессия (N+1),
+# бюджет поднимается только осознанно вместе с изменением маршрута
+QUERY_BUDGETS = {
+    "GET /api/prescriptions/{prescription_id}": 1,
+    "GET /api/prescriptions": 1,
+    "GET /api/prescriptions/pending": 1,
+    "GET /api/prescriptions/coverage": 1,
+    # Рецепт, строки лекарств одним INSERT, событие в outbox
+    "POST /api/prescriptions": 3,
+    # Чтение с блокировкой, обновление рецепта, статус лекарств, событие prescription_verified в outbox
+    # (без повторного SELECT после commit)
+    "PATCH /api/prescriptions/{prescription_id}/verify": 4,
+}
+
+
+def assert_budget(endpoint, statements):
+    budget = QUERY_BUDGETS[endpoint]
+    assert len(statements) <= budget, (
+        f"{endpoint}: {len(statements)} SQL statements, budget {budget}:\n" + "\n".join(statements)
+    )
+
+
+def test_endpoints_fit_budget(client, count_queries):
+    user_id = uuid4()
+    payload = prescription_payload(user_id)
+    payload["medications"] *= 5
+    with count_queries() as statements:
+        prescription_id = client.post("/api/prescriptions", json=payload).json()["id"]
+    assert_budget("POST /api/prescriptions", statements)
+
+    with count_queries() as statements:
+        response = client.get(f"/api/prescriptions/{prescription_id}")
+    assert len(response.json()["medications"]) == 5
+    assert_budget("GET /api/prescriptions/{prescription_id}", statements)
+
+    with count_queries() as statements:
+        response = client.patch(f"/api/prescriptions/{prescription_id}/verify",
+                                json={"status": "approved", "verified_by": str(uuid4())})
+    assert response.json()["status"] == "approved"
+    assert_budget("PATCH /api/prescriptions/{prescription_id}/verify", statements)
+
+    with count_queries() as statements:
+        client.get(f"/api/prescriptions/coverage?user_id={user_id}&product_ids={ASPIRIN}")
+    assert_budget("GET /api/prescriptions/coverage", statements)
+
+
+def test_list_reads_do_not_grow_with_page_size(client, count_queries):
+    user_id = uuid4()
+    for _ in range(10):
+        client.post("/api/prescriptions", json=prescription_payload(user_id))
+
+    with count_queries() as statements:
+        page = client.get(f"/api/prescriptions?user_id={user_id}").json()
+    assert len(page["items"]) == 10
+    assert_budget("GET /api/prescriptions", statements)
+
+    with count_queries() as statements:
+        client.get("/api/prescriptions/pending")
+    assert_budget("GET /api/prescriptions/pending", statements)
@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+from prescription_service.app import database, replicas
+from prescription_service.tests.unit.test_prescription_routes import prescription_payload
+
+
+def test_client_reads_its_own_write_despite_replica_lag(client, lagging_replica):
+    response = client.post("/api/prescriptions", json=prescription_payload())
+    assert response.status_code == 200
+    token = response.headers[replicas.CONSISTENCY_HEADER]
+    assert replicas.CONSISTENCY_COOKIE in response.headers["set-cookie"]
+    path = f"/api/prescriptions/{response.json()['id']}"
+
+    # TestClient хранит cookie: следующее чтение идет в основную базу
+    assert client.get(path).status_code == 200
+    client.cookies.clear()
+    assert client.get(path, headers={replicas.CONSISTENCY_HEADER: token}).status_code == 200
+
+    # Без токена чтение уходит на реплику, которая записи еще не видела
+    response = client.get(path)
+    assert response.status_code == 404
+    assert replicas.CONSISTENCY_HEADER not in response.headers
+    stale = f"{time.time() - replicas.READ_YOUR_WRITES_SECONDS - 1:.6f}"
+    assert client.get(path, headers={replicas.CONSISTENCY_HEADER: stale}).status_code == 404
+
+
+def test_round_robin_and_least_connections(tmp_path):
+    urls = [f"sqlite:///{tmp_path / name}.db" for name in ("r0", "r1")]
+    round_robin = replicas.ReplicaSet(database.AsyncSessionLocal, urls)
+    assert [round_robin.choose().url for _ in range(4)] == urls * 2
+
+    least = replicas.ReplicaSet(database.AsyncSessionLocal, urls, policy="least_connections")
+    least.replicas[0].in_use = 2
+    assert least.choose().url == urls[1]
+
+    async def hold_session():
+        async with least.session() as db:
+            assert db.info["primary"] is False
+            assert least.replicas[1].in_use == 1
+        assert least.replicas[1].in_use == 0
+
+    asyncio.run(hold_session())
+    for replica_set in (round_robin, least):
+        for replica in replica_set.replicas:
+            asyncio.run(replica.async_engine.dispose())
+    with pytest.raises(ValueError):
+        replicas.ReplicaSet(database.AsyncSessionLocal, urls, policy="random")
+
+
+def test_read_token_ignores_garbage():
+    class FakeRequest:
+        headers = {replicas.CONSISTENCY_HEADER: "not-a-number"}
+        cookies = {}
+
+    assert replicas.read_token(FakeRequest()) is None
+    assert replicas.is_fresh(None) is False
+    assert replicas.is_fresh(time.time()) is True
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+from uuid import uuid4
+from prescription_service.app import models, retention, sweeper
+
+NOW = datetime(2026, 10, 18, 3, 0)
+
+
+def add_prescription(db_session, expiry_date, status=models.PrescriptionStatus.PENDING):
+    prescription = models.Prescription(
+        user_id=uuid4(), doctor_name="Доктор Иванов", clinic_name="Городская поликлиника",
+        issue_date=expiry_date - timedelta(days=90), expiry_date=expiry_date,
+        medications=[{"product_id": str(uuid4()), "product_name": "Аспирин", "dosage": "500 мг", "quantity": 1}],
+        status=status
+    )
+    db_session.add(prescription)
+    db_session.flush()
+    db_session.add(models.PrescriptionMedication(
+        prescription_id=prescription.id, user_id=prescription.user_id, product_id=uuid4(), quantity=1,
+        status=status, expiry_date=expiry_date
+    ))
+    db_session.commit()
+    return prescription.id
+
+
+def test_expired_pending_prescriptions_are_archived(db_session):
+    expired = {add_prescription(db_session, NOW - timedelta(days=2 + i)) for i in range(3)}
+    kept = {
+        # Действует до конца дня expiry_date
+        add_prescription(db_session, NOW.replace(hour=0)),
+        add_prescription(db_session, NOW + timedelta(days=30)),
+        # Проверенные рецепты остаются в истории пользователя
+        add_prescription(db_session, NOW - timedelta(days=2), models.PrescriptionStatus.APPROVED),
+    }
+
+    instance = sweeper.Sweeper("expired_prescriptions", retention.archive_expired_prescriptions,
+                               batch_size=2, max_rows_per_second=0, clock=lambda: NOW)
+    assert asyncio.run(instance.sweep_once()) == 3
+
+    db_session.expire_all()
+    assert {row.id for row in db_session.query(models.Prescription)} == kept
+    assert db_session.query(models.PrescriptionMedication).count() == 3
+    archived = db_session.query(models.PrescriptionArchive).all()
+    assert {row.id for row in archived} == expired
+    assert all(row.archived_at == NOW and row.medications[0]["product_name"] == "Аспирин" for row in archived)
+
+    events = db_session.query(models.OutboxEvent).all()
+    assert [event.routing_key for event in events] == ["prescriptions_expired"] * 2
+    assert {item["prescription_id"] for event in events for item in event.payload["prescriptions"]} == {
+        str(prescription_id) for prescription_id in expired
+    }
@@ -0,0 +1,40 @@
+from uuid import uuid4
+from prescription_service.app import schemas, serialization
+from prescription_service.tests.unit.test_prescription_routes import prescription_payload
+
+ASPIRIN = "5d0b0c9e-7aa9-4b15-84a9-20111a597ad0"
+
+
+def responses(client):
+    """Ответы быстрых маршрутов рецептов вместе с их схемами"""
+    user_id = uuid4()
+    payload = prescription_payload(user_id)
+    payload["medications"] *= 50
+    prescription_id = client.post("/api/prescriptions", json=payload).json()["id"]
+    approved_id = client.post("/api/prescriptions", json=prescription_payload(user_id)).json()["id"]
+    client.patch(f"/api/prescriptions/{approved_id}/verify", json={"status": "approved", "verified_by": str(uuid4())})
+    return [
+        (schemas.PrescriptionResponse, client.get(f"/api/prescriptions/{prescription_id}")),
+        (schemas.PrescriptionResponse, client.get(f"/api/prescriptions/{approved_id}")),
+        (schemas.PrescriptionPage, client.get(f"/api/prescriptions?user_id={user_id}&include_medications=true")),
+        (schemas.PrescriptionPage, client.get(f"/api/prescriptions?user_id={user_id}&limit=1")),
+        (schemas.CoverageResponse, client.get(f"/api/prescriptions/coverage?user_id={user_id}"
+                                              f"&product_ids={ASPIRIN},{uuid4()}")),
+        (schemas.PrescriptionClaimResponse, client.post(f"/api/prescriptions/claim?pharmacist_id={uuid4()}")),
+    ]
+
+
+def test_fast_responses_match_schema(client):
+    for schema, response in responses(client):
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        body = response.json()
+        assert schema.model_validate(body).model_dump(mode="json") == body
+
+
+def test_validated_path_is_still_available(client, monkeypatch):
+    monkeypatch.setattr(serialization, "FAST_SERIALIZATION", False)
+    for schema, response in responses(client):
+        assert response.status_code == 200
+        body = response.json()
+        assert schema.model_validate(body).model_dump(mode="json") == body